@@ -38,6 +38,10 @@ HEADER_SAVE_ERROR_3 = SAVE_TEXT_ERROR_3
 IMAGE_CORRUPTED_ERROR_1 = 'Skipped corrupted image file from the message titled "'
 IMAGE_CORRUPTED_ERROR_2 = SAVE_IMAGE_2
 IMAGE_CORRUPTED_ERROR_3 = ATTACHMENT_DISCARDED_3
+PAGE_CORRUPTED_ERROR_1 = 'Skipped corrupted page '
+PAGE_CORRUPTED_ERROR_2 = ' of the image file from the message titled "'
+PAGE_CORRUPTED_ERROR_3 = SAVE_IMAGE_2
+PAGE_CORRUPTED_ERROR_4 = ATTACHMENT_DISCARDED_3
 NOTHING_TO_FAX_I_1 = 'There was nothing to fax from message titled "'
 NOTHING_TO_FAX_I_2 = SAVE_IMAGE_2
 NOTHING_TO_FAX_I_3 = ATTACHMENT_DISCARDED_3
@@ -63,3 +67,35 @@ ROUTE_NO_SETTINGS_3 = ")"
 USING_TIMEZONE = "Using timezone: "
 USING_DATE_FORMAT = "Using date format: "
 LOGGING_MESSAGE_FAILED = "Logging message to file failed!"
+DAEMON_STARTED = "Relay daemon listening on "
+DAEMON_STOPPED = "Relay daemon stopped"
+DAEMON_REQUEST_FAILED = "Processing message received by the relay daemon failed: "
+DAEMON_UNREACHABLE = "Relay daemon unreachable, processing message in-process: "
+CACHE_OVERRIDEN = "Conversion cache setting overriden for "
+CACHE_STATISTICS_1 = "Conversion cache: memory hits "
+CACHE_STATISTICS_2 = ", disk hits "
+CACHE_STATISTICS_3 = ", misses "
+LOG_TO_FILE_OVERRIDEN = "Logging message to a file setting overriden for "
+LOG_FILE_OVERRIDEN = "Message log file setting overriden for "
+TRIGGER_DUPLICATED_1 = 'Subject trigger "'
+TRIGGER_DUPLICATED_2 = '" used by '
+TRIGGER_DUPLICATED_3 = ', ignoring it for dispatching in '
+DISPATCH_DEFERRED = "No section parameter, section will be chosen by the message subject"
+DISPATCHED_BY_SUBJECT = "Section chosen by the message subject: "
+DISPATCH_NO_MATCH = "No subject trigger matches the message subject"
+DISPATCH_REJECTED = "Message rejected, it's not meant for any fax"
+METRICS_EXPORT_FAILED = "Exporting metrics failed: "
+BATCH_STARTED_1 = "Batch processing of "
+BATCH_STARTED_2 = " started, concurrency: "
+TRACE_MEMORY_DISABLED = "Peak memory is not measured, it's not possible with messages processed concurrently"
+BATCH_FINISHED_1 = "Batch processing finished, processed: "
+BATCH_FINISHED_2 = ", failed: "
+BATCH_FINISHED_3 = ", skipped (already done): "
+UNKNOWN_SPOOL_BACKEND = "Unknown spool backend: "
+BLANK_PAGE_OVERRIDEN = "Blank page coverage setting overriden for "
+PACKING_OVERRIDEN = "Packing small images setting overriden for "
+BLANK_PAGES_REMOVED_1 = "Removed "
+BLANK_PAGES_REMOVED_2 = ' blank page(s) from message "'
+BLANK_PAGES_REMOVED_3 = SAVE_IMAGE_2
+BLANK_PAGES_REMOVED_4 = '" (estimated transmission time saved: '
+BLANK_PAGES_REMOVED_5 = " s)"
@@ -2,15 +2,20 @@
 
 # Additional tools and classes
 #
-# by Magnetic-Fox, 13.07.2024 - 26.02.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
+import collections
+import contextvars
+import concurrent.futures
+
 
 # Settings class (with default settings applied)
 class Settings:
 	SETTINGS_FILE = "settings.ini"
 	SETTINGS_RELOADED = False
+	DISPATCH_PENDING = False
 	NO_DATA = "(no data)"
 	SENDER = "Sender:  "
 	SUBJECT = "Subject: "
@@ -31,15 +36,83 @@ class Settings:
 	STRIP_BE_NLS = True
 	STRIP_INTEXT_NLS = True
 	DEFAULT_LOGGER_ADDRESS = "/dev/log"
+	LOGGER_LEVEL = "notice"
 	ROUTE_TO_FAX = ""
 	TEXT_FONT_NAME = "Monospace"
 	TEXT_FONT_SIZE = 10
 	TEXT_TOP_MARGIN = 6
+	TEXT_RENDERER = "native"
+	TILE_TALL_IMAGES = True
+	TALL_IMAGE_MIN_PAGES = 2
+	TILE_OVERLAP = 100
+	HALFTONE_METHOD = "auto"
+	HALFTONE_PHOTO_METHOD = "floyd-steinberg"
+	PACK_SMALL_IMAGES = False
+	PACK_MIN_SCALE = 0.5
+	PACK_MAX_FRACTION = 0.5
 	DATE_TIMEZONE = ""      # will be interpreted as local timezone
 	DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 	LOG_MESSAGE_TO_FILE = True
 	MESSAGE_LOG_FILE = "/var/log/Mail2Fax/mails.gz"
 	UNPACK_MULTI_TIFF = True
+	DAEMON_SOCKET = "/run/Mail2Fax/relay.sock"
+	DAEMON_MAX_CHILDREN = 4
+	CONVERSION_WORKERS = 1
+	SPOOL_THRESHOLD = 1048576
+	BLANK_PAGE_COVERAGE = 0      # percent of the page (0.01 is a good start); 0 - blank pages are not removed
+	FAX_LINE_SPEED = 9600
+	CACHE_ENABLED = True
+	CACHE_MEMORY_SIZE = 33554432
+	CACHE_DIRECTORY = "/var/cache/Mail2Fax"
+	CACHE_DISK_SIZE = 268435456
+	DISPATCH_BY_SUBJECT = False
+	ARCHIVE_ROTATION = "none"
+	ARCHIVE_MAX_SIZE = 104857600
+	ARCHIVE_COMPRESSION_LEVEL = 6
+	ARCHIVE_BACKGROUND = True
+	METRICS_ENABLED = False
+	METRICS_FORMAT = "prometheus"
+	METRICS_FILE = "/var/lib/Mail2Fax/metrics.prom"
+	METRICS_TRACE_MEMORY = False
+	BATCH_CONCURRENCY = 4
+	BATCH_STATE_FILE = ""
+	SPOOL_BACKEND = "faxspool"
+	SPOOL_QUEUE_DIRECTORY = "/var/spool/fax/outgoing"
+
+
+# Function for calling a function on every item using worker threads (results are returned in the items order)
+def mapInOrder(function, items, workers = 1):
+	if (workers <= 1) or (len(items) <= 1):
+		return [function(item) for item in items]
+
+	# Worker threads get context of the calling thread (for logging)
+	context = contextvars.copy_context()
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers = min(workers, len(items))) as executor:
+		return list(executor.map(lambda item: context.copy().run(function, item), items))
+
+# Function for calling a function on every item produced by an iterator using worker threads (results are in order)
+# Items are submitted as soon as they're produced, but no more than twice the number of workers are pending at once
+def mapIterator(function, iterator, workers = 1):
+	if workers <= 1:
+		return [function(item) for item in iterator]
+
+	results = []
+	pending = collections.deque()
+	context = contextvars.copy_context()
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+		for item in iterator:
+			pending.append(executor.submit(context.copy().run, function, item))
+
+			if len(pending) >= 2 * workers:
+				results += [pending.popleft().result()]
+
+		while len(pending) > 0:
+			results += [pending.popleft().result()]
+
+	return results
+
 
 
 # Old codes to be removed in future:
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+# Message archive tools (indexed, rotating and lock-safe GZIP archive with background writer)
+#
+# Every message is stored as a separate GZIP member (so the archive is still readable with zcat)
+# and described in the sidecar index file (archive name + ".idx", one JSON object per line):
+#   {"message_id": ..., "date": ..., "destination": ..., "offset": ..., "length": ..., "archived": ...}
+# where offset and length point to the compressed member, so one message can be fetched without
+# decompressing the whole archive. Archive and its index are written under an exclusive lock,
+# so many relays (procmail runs, daemon children) can share them.
+#
+# Raw message is spooled to the archive directory while being read, then compressed and appended
+# by the background writer (flush() has to be called before exiting the process).
+#
+# Usage: archiveTools.py archiveFile [Message-ID]
+# (lists the index or writes chosen message to the standard output)
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import json
+import time
+import zlib
+import fcntl
+import queue
+import shutil
+import tempfile
+import threading
+
+
+# Index file suffix
+INDEX_SUFFIX = ".idx"
+
+# Chunk size for compressing spooled messages
+CHUNK_SIZE = 65536
+
+
+# Function for getting archive file name for chosen time (rotated by date if chosen)
+def archiveFileName(baseName, rotation = "none", timestamp = None):
+	if timestamp == None:
+		timestamp = time.time()
+
+	if rotation == "daily":
+		suffix = time.strftime("%Y-%m-%d", time.localtime(timestamp))
+	elif rotation == "monthly":
+		suffix = time.strftime("%Y-%m", time.localtime(timestamp))
+	else:
+		return baseName
+
+	root, extension = os.path.splitext(baseName)
+
+	return root + "-" + suffix + extension
+
+# Function for opening archive file locked (archive replaced by rotation in the meantime is opened again)
+def openLocked(fileName):
+	while True:
+		archive = open(fileName, "ab")
+		fcntl.flock(archive, fcntl.LOCK_EX)
+
+		try:
+			if os.fstat(archive.fileno()).st_ino == os.stat(fileName).st_ino:
+				return archive
+
+		except FileNotFoundError:
+			pass
+
+		archive.close()
+
+# Procedure for rotating archive by size (archive has to be locked)
+def rotateBySize(fileName, archive, maxSize):
+	if (maxSize <= 0) or (os.fstat(archive.fileno()).st_size < maxSize):
+		return archive
+
+	root, extension = os.path.splitext(fileName)
+	rotatedName = root + "-" + time.strftime("%Y%m%d-%H%M%S") + extension
+	number = 1
+
+	while os.path.exists(rotatedName):
+		rotatedName = root + "-" + time.strftime("%Y%m%d-%H%M%S") + "-" + str(number) + extension
+		number += 1
+
+	if os.path.exists(fileName + INDEX_SUFFIX):
+		os.rename(fileName + INDEX_SUFFIX, rotatedName + INDEX_SUFFIX)
+
+	os.rename(fileName, rotatedName)
+
+	# Others waiting for the lock will notice that file was replaced
+	archive.close()
+
+	return openLocked(fileName)
+
+# Function for compressing spooled message to one GZIP member (written to the file next to the spool, returns its name)
+def compressSpool(spoolFile, level = 6):
+	compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+	memberFile = spoolFile + ".gz"
+
+	inFile = open(spoolFile, "rb")
+	outFile = open(memberFile, "wb")
+
+	try:
+		while True:
+			chunk = inFile.read(CHUNK_SIZE)
+			if chunk == b"":
+				break
+			outFile.write(compressor.compress(chunk))
+
+		# New line at the end keeps the old archive format
+		outFile.write(compressor.compress(b"\n"))
+		outFile.write(compressor.flush())
+
+	finally:
+		inFile.close()
+		outFile.close()
+
+	return memberFile
+
+# Procedure for appending compressed message (copied from the member file) and its index entry to the archive
+def appendToArchive(fileName, memberFile, entry, maxSize = 0):
+	archive = openLocked(fileName)
+
+	try:
+		archive = rotateBySize(fileName, archive, maxSize)
+		archive.seek(0, os.SEEK_END)
+		entry["offset"] = archive.tell()
+
+		member = open(memberFile, "rb")
+
+		try:
+			shutil.copyfileobj(member, archive, CHUNK_SIZE)
+		finally:
+			member.close()
+
+		entry["length"] = archive.tell() - entry["offset"]
+		archive.flush()
+
+		index = open(fileName + INDEX_SUFFIX, "a")
+		index.write(json.dumps(entry) + "\n")
+		index.close()
+
+	finally:
+		archive.close()
+
+	return
+
+# Archive job class (spooled message waiting to be archived)
+class ArchiveJob:
+	def __init__(self, spoolFile, fileName, entry, level = 6, maxSize = 0, onError = None):
+		self.spoolFile = spoolFile
+		self.fileName = fileName
+		self.entry = entry
+		self.level = level
+		self.maxSize = maxSize
+		self.onError = onError
+		return
+
+	# Procedure for doing the job (spool and member files are always removed)
+	def run(self):
+		try:
+			appendToArchive(self.fileName, compressSpool(self.spoolFile, self.level), self.entry, self.maxSize)
+
+		except Exception as e:
+			if self.onError != None:
+				self.onError(str(e))
+
+		finally:
+			for fileName in [self.spoolFile, self.spoolFile + ".gz"]:
+				try:
+					os.remove(fileName)
+				except OSError:
+					pass
+
+		return
+
+# Background writer class
+class ArchiveWriter:
+	def __init__(self):
+		self.jobs = queue.Queue()
+		self.thread = None
+		self.lock = threading.Lock()
+		return
+
+	# Procedure for processing jobs (in the writer thread)
+	def work(self):
+		while True:
+			job = self.jobs.get()
+
+			try:
+				job.run()
+			finally:
+				self.jobs.task_done()
+
+	# Procedure for adding job (writer thread is started if needed)
+	def put(self, job):
+		with self.lock:
+			if self.thread == None:
+				self.thread = threading.Thread(target = self.work, daemon = True)
+				self.thread.start()
+
+		self.jobs.put(job)
+		return
+
+	# Procedure for waiting until all the jobs are done
+	def flush(self):
+		self.jobs.join()
+		return
+
+# Writer shared by the whole process (forked child gets a new one, as threads don't survive fork)
+writer = ArchiveWriter()
+
+def resetWriter():
+	global writer
+	writer = ArchiveWriter()
+	return
+
+os.register_at_fork(after_in_child = resetWriter)
+
+
+# Message spool class (raw message written while it's being read)
+class MessageSpool:
+	def __init__(self, directory):
+		descriptor, self.fileName = tempfile.mkstemp(prefix = ".spool-", dir = directory)
+		self.file = os.fdopen(descriptor, "wb")
+		return
+
+	def write(self, data):
+		self.file.write(data)
+		return
+
+	def close(self):
+		self.file.close()
+		return
+
+	# Procedure for dropping spooled message (if it's not going to be archived)
+	def discard(self):
+		self.file.close()
+
+		try:
+			os.remove(self.fileName)
+		except OSError:
+			pass
+
+		return
+
+# Function for opening message spool in the archive directory (the same file system, created if needed)
+def openSpool(archiveFile):
+	directory = os.path.dirname(os.path.abspath(archiveFile))
+	os.makedirs(directory, exist_ok = True)
+	return MessageSpool(directory)
+
+# Procedure for archiving spooled message (in background if chosen)
+def archiveMessage(spool, archiveFile, messageId = "", date = "", destination = "", rotation = "none", maxSize = 0, level = 6, background = True, onError = None):
+	spool.close()
+
+	archived = time.time()
+	entry = {"message_id": messageId, "date": date, "destination": destination, "archived": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(archived))}
+
+	if rotation != "size":
+		maxSize = 0
+
+	job = ArchiveJob(spool.fileName, archiveFileName(archiveFile, rotation, archived), entry, level, maxSize, onError)
+
+	if background:
+		writer.put(job)
+	else:
+		job.run()
+
+	return
+
+# Procedure for waiting for the background writer (to be called before exiting)
+def flush():
+	writer.flush()
+	return
+
+
+# Function for reading archive index (list of entries)
+def readIndex(archiveFile):
+	entries = []
+	index = open(archiveFile + INDEX_SUFFIX, "r")
+
+	for line in index:
+		if line.strip() != "":
+			entries += [json.loads(line)]
+
+	index.close()
+
+	return entries
+
+# Function for fetching messages with chosen Message-ID (list of raw messages; only chosen members are decompressed)
+def fetchMessages(archiveFile, messageId):
+	messages = []
+	archive = open(archiveFile, "rb")
+
+	try:
+		for entry in readIndex(archiveFile):
+			if entry["message_id"] == messageId:
+				archive.seek(entry["offset"])
+				messages += [zlib.decompress(archive.read(entry["length"]), 31)]
+
+	finally:
+		archive.close()
+
+	return messages
+
+
+# Autorun part
+if __name__ == "__main__":
+	exitCode = 0
+
+	try:
+		if len(sys.argv) == 2:
+			for entry in readIndex(sys.argv[1]):
+				print(entry["archived"] + "\t" + entry["destination"] + "\t" + entry["message_id"] + "\t" + entry["date"])
+
+		elif len(sys.argv) == 3:
+			messages = fetchMessages(sys.argv[1], sys.argv[2])
+
+			if messages == []:
+				exitCode = 1
+
+			for message in messages:
+				sys.stdout.buffer.write(message)
+
+		else:
+			print("Usage: archiveTools.py archiveFile [Message-ID]")
+			exitCode = 1
+
+	except Exception as e:
+		print(str(e))
+		exitCode = 1
+
+	exit(exitCode)
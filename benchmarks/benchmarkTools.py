@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+# Shared benchmark tools (hermetic environment for running the relay and generated message corpus)
+#
+# Environment is a temporary directory with its own settings file (no message archive, no cache,
+# metrics written as JSON lines and the stub spool backend, which collects pages in memory).
+#
+# Corpus is generated from the fixed seed, so every run gets exactly the same messages:
+#   text  - plain text mails (some long enough for many pages),
+#   html  - huge HTML newsletters,
+#   jpegs - mails with many photo-like JPEGs,
+#   tiffs - mails with multipage (scanned document-like) TIFFs,
+#   mixed - mixed mails with triggers, alternative parts, transparent PNGs and discarded attachments
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import threading
+import email.mime.text
+import email.mime.image
+import email.mime.multipart
+import email.mime.application
+import PIL.Image
+import PIL.ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import relay
+import spoolTools
+import additionalTools
+import htmlBenchmark
+
+
+# Message kinds in the corpus
+KINDS = ["text", "html", "jpegs", "tiffs", "mixed"]
+
+# Seed of the corpus generator
+SEED = 1997
+
+# Phone number used in the benchmark settings
+PHONE_NUMBER = "0123456789"
+
+# Settings file of the benchmark environment (conversion workers, text renderer, metrics file and phone number)
+SETTINGS = """[default]
+default_settings=		"FAX"
+log_message_to_file=		False
+conversion_workers=		%d
+
+[rendering]
+text_renderer=			"%s"
+
+[cache]
+enabled=			False
+
+[metrics]
+enabled=			True
+format=				"jsonl"
+file=				"%s"
+
+[spool]
+backend=			"stub"
+
+[logger]
+level=				"error"
+
+[FAX]
+phone_number=			"%s"
+subject_trigger=		"[FAX] "
+"""
+
+# Words for generated texts
+WORDS = (	"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore "
+		"magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo "
+		"consequat fax modem page line paper tone relay mail message invoice order delivery").split()
+
+
+# Benchmark environment class (temporary directory with settings file)
+class Environment:
+	def __init__(self, renderer = "native", workers = 1):
+		self.directory = tempfile.mkdtemp(prefix = "mail2fax-benchmark-")
+		self.metricsFile = os.path.join(self.directory, "metrics.jsonl")
+		self.settingsFile = os.path.join(self.directory, "settings.ini")
+		self.jobs = {}
+		self.lock = threading.Lock()
+
+		settingsFile = open(self.settingsFile, "w")
+		settingsFile.write(SETTINGS % (workers, renderer, self.metricsFile, PHONE_NUMBER))
+		settingsFile.close()
+
+		# Jobs left by someone else are not ours
+		spoolTools.stubBackend.takeJobs()
+		return
+
+	# Function for processing one message by the relay (with fresh settings object, as the daemon does)
+	# Spooled jobs are collected (by Message-ID), so they don't pile up in the stub backend
+	def process(self, data):
+		settings = additionalTools.Settings()
+		relay.loadSettings(whichFax = "FAX", settingsFile = self.settingsFile, settings = settings)
+		everythingOK = relay.getAndProcess(passBuffer = data, whichFax = "FAX", settings = settings)
+
+		with self.lock:
+			for job in spoolTools.stubBackend.takeJobs():
+				self.jobs[job.messageId] = job
+
+		return everythingOK
+
+	# Function for taking spooled job of the message (StubJob object or None if nothing was spooled)
+	def takeJob(self, messageId):
+		with self.lock:
+			return self.jobs.pop(messageId, None)
+
+	# Function for reading metrics of processed messages (list of records)
+	def metrics(self):
+		records = []
+
+		if os.path.exists(self.metricsFile):
+			metricsFile = open(self.metricsFile, "r")
+			records = [json.loads(line) for line in metricsFile if line.strip() != ""]
+			metricsFile.close()
+
+		return records
+
+	# Procedure for removing environment
+	def close(self):
+		shutil.rmtree(self.directory, ignore_errors = True)
+		return
+
+
+# Function for generating text of chosen (approximate) size
+def randomText(rng, size):
+	lines = []
+	used = 0
+
+	while used < size:
+		line = " ".join(rng.choice(WORDS) for word in range(rng.randint(3, 14)))
+
+		# Some tabs, empty lines and paragraphs as in real mails
+		if rng.random() < 0.1:
+			line = "\t" + line
+		if rng.random() < 0.15:
+			line += "\n"
+
+		lines += [line]
+		used += len(line) + 1
+
+	return "\n".join(lines) + "\n"
+
+# Function for generating photo-like image (gradient, shapes and noise)
+def photoImage(rng, width, height):
+	img = PIL.Image.linear_gradient("L").resize((width, height)).convert("RGB")
+	draw = PIL.ImageDraw.Draw(img)
+
+	for shape in range(40):
+		x = rng.randint(0, width)
+		y = rng.randint(0, height)
+		size = rng.randint(width // 20, width // 3)
+		color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+
+		if rng.random() < 0.5:
+			draw.ellipse((x, y, x + size, y + size), fill = color)
+		else:
+			draw.rectangle((x, y, x + size, y + size // 2), fill = color)
+
+	# Noise is generated small and scaled up (cheap, but still hard to compress)
+	noise = PIL.Image.frombytes("L", (width // 4, height // 4), rng.randbytes((width // 4) * (height // 4)))
+	noise = noise.resize((width, height)).convert("RGB")
+
+	return PIL.Image.blend(img, noise, 0.2)
+
+# Function for generating scanned document-like page (black text lines on white)
+def documentPage(rng, width = 1728, height = 2200):
+	img = PIL.Image.new("1", (width, height), 1)
+	draw = PIL.ImageDraw.Draw(img)
+	y = 120
+
+	while y < height - 150:
+		x = 100
+
+		while x < width - 200:
+			wordWidth = rng.randint(30, 160)
+			draw.rectangle((x, y, x + wordWidth, y + 18), fill = 0)
+			x += wordWidth + rng.randint(15, 30)
+
+		y += rng.choice([40, 40, 40, 90])
+
+	return img
+
+# Function for encoding image to the chosen format (data)
+def encodeImage(img, imageFormat, **options):
+	output = io.BytesIO()
+	img.save(output, format = imageFormat, **options)
+	return output.getvalue()
+
+# Function for getting Message-ID of the generated message (by its name in the corpus)
+def messageId(name):
+	return "<" + name + "@benchmark.example.com>"
+
+# Function for preparing message (main headers are fixed, so the same corpus gives the same pages)
+def newMessage(kind, number, subject, parts):
+	if len(parts) == 1:
+		message = parts[0]
+	else:
+		message = email.mime.multipart.MIMEMultipart()
+
+		for part in parts:
+			message.attach(part)
+
+	message["From"] = "Benchmark <benchmark@example.com>"
+	message["Subject"] = subject
+	message["Date"] = "Sun, 18 Oct 2026 12:00:00 +0200"
+	message["Message-ID"] = messageId(kind + "-" + str(number))
+
+	return message.as_bytes()
+
+# Function for generating one message of the chosen kind
+def generateMessage(rng, kind, number):
+	if kind == "text":
+		text = randomText(rng, rng.choice([1500, 6000, 20000]))
+		return newMessage(kind, number, "[FAX] Text " + str(number), [email.mime.text.MIMEText(text, "plain", "utf-8")])
+
+	elif kind == "html":
+		document = htmlBenchmark.buildDocument(rng.choice([128, 256]) * 1024)
+		return newMessage(kind, number, "[FAX] Newsletter " + str(number), [email.mime.text.MIMEText(document, "html", "utf-8")])
+
+	elif kind == "jpegs":
+		parts = [email.mime.text.MIMEText(randomText(rng, 400), "plain", "utf-8")]
+
+		for image in range(rng.randint(4, 8)):
+			width, height = rng.choice([(1200, 1600), (1600, 1200), (2400, 3200)])
+			parts += [email.mime.image.MIMEImage(encodeImage(photoImage(rng, width, height), "JPEG", quality = 85), "jpeg")]
+
+		return newMessage(kind, number, "[FAX] Photos " + str(number), parts)
+
+	elif kind == "tiffs":
+		pages = [documentPage(rng) for page in range(rng.randint(3, 6))]
+		tiffData = encodeImage(pages[0], "TIFF", compression = "group4", save_all = True, append_images = pages[1:], dpi = (200, 200))
+		parts = [email.mime.text.MIMEText(randomText(rng, 300), "plain", "utf-8"), email.mime.image.MIMEImage(tiffData, "tiff")]
+		return newMessage(kind, number, "[FAX] Scan " + str(number), parts)
+
+	# Mixed message (triggers, alternative part, transparent PNG, JPEG and attachment to discard)
+	trigger = rng.choice(["!STANDARD!\n", "", "!DISCARD!\n"])
+	alternative = email.mime.multipart.MIMEMultipart("alternative")
+	text = trigger + randomText(rng, 3000)
+	alternative.attach(email.mime.text.MIMEText(text, "plain", "utf-8"))
+	alternative.attach(email.mime.text.MIMEText("<html><body><p>" + text.replace("\n", "<br>") + "</p></body></html>", "html", "utf-8"))
+
+	logo = PIL.Image.new("RGBA", (600, 200), (0, 0, 0, 0))
+	PIL.ImageDraw.Draw(logo).ellipse((10, 10, 590, 190), fill = (200, 30, 30, 255))
+
+	parts = [	alternative,
+			email.mime.image.MIMEImage(encodeImage(logo, "PNG"), "png"),
+			email.mime.image.MIMEImage(encodeImage(photoImage(rng, 1024, 768), "JPEG", quality = 80), "jpeg"),
+			email.mime.application.MIMEApplication(rng.randbytes(20000), "octet-stream")	]
+
+	return newMessage(kind, number, "[FAX] Mixed " + str(number), parts)
+
+# Function for generating corpus (list of (name, message data) tuples; kinds are interleaved)
+def generateCorpus(messagesPerKind = 3, kinds = KINDS, seed = SEED):
+	rng = random.Random(seed)
+	corpus = []
+
+	for number in range(messagesPerKind):
+		for kind in kinds:
+			corpus += [(kind + "-" + str(number), generateMessage(rng, kind, number))]
+
+	return corpus
+
+# Procedure for writing corpus to the directory (as .eml files, for running them through procmail or relay.py)
+def writeCorpus(corpus, directory):
+	os.makedirs(directory, exist_ok = True)
+
+	for name, data in corpus:
+		messageFile = open(os.path.join(directory, name + ".eml"), "wb")
+		messageFile.write(data)
+		messageFile.close()
+
+	return
+
+# Function for getting percentile of sorted values (nearest rank)
+def percentile(values, fraction):
+	if values == []:
+		return 0
+
+	return values[min(len(values) - 1, max(0, int(fraction * len(values) + 0.5) - 1))]
+
+
+# Autorun part (writes corpus to the directory)
+if __name__ == "__main__":
+	if len(sys.argv) not in (2, 3):
+		print("Usage: benchmarkTools.py outputDirectory [messagesPerKind]")
+		exit(1)
+
+	messagesPerKind = 3
+
+	if len(sys.argv) == 3:
+		messagesPerKind = int(sys.argv[2])
+
+	writeCorpus(generateCorpus(messagesPerKind), sys.argv[1])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# HTML to text conversion benchmark (newsletter-like bodies of growing size)
+#
+# Prints conversion times of the current and legacy converters. Time per kilobyte
+# of the current converter should stay flat as the body grows (linear scaling).
+#
+# Usage: htmlBenchmark.py [maxSizeInKB] [repeats] [--no-legacy]
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import htmlTools
+
+
+# One block of newsletter-like HTML (tables, styled breaks, paragraphs and entities; %d is a row number)
+BLOCK = (	'<table width="100%%" cellpadding="0" cellspacing="0"><tr><td class="content" style="padding: 8px">'
+		'<p style="margin: 0">Dear customer,<br class="mobile-hide" data-row="%d">our new offer is here &amp; it&#39;s great!</p>'
+		'<div><a href="https://example.com/offer?id=12345">See the offer</a><br /></div>'
+		'<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.<BR>'
+		'Ut enim ad minim veniam, quis nostrud exercitation &ndash; ullamco laboris.</p>'
+		'</td></tr></table>\n'	)
+
+# Document beginning (with style and script which shouldn't get to the text)
+HEAD = (	'<!DOCTYPE html><html><head><title>Newsletter</title>'
+		'<style>td { font-family: Arial; } .mobile-hide { display: none; }</style>'
+		'<script>var tracking = "<b>" + 1;</script></head><body>\n'	)
+
+TAIL = '</body></html>\n'
+
+
+# Function for building HTML document of (at least) chosen size (every block is a bit different, as in real newsletters)
+def buildDocument(size):
+	blocks = []
+	used = 0
+
+	while used < size:
+		blocks += [BLOCK % len(blocks)]
+		used += len(blocks[-1])
+
+	return HEAD + "".join(blocks) + TAIL
+
+# Function for measuring the best time of the conversion
+def measure(converter, document, repeats):
+	best = None
+
+	for repeat in range(repeats):
+		start = time.perf_counter()
+		converter(document)
+		elapsed = time.perf_counter() - start
+
+		if (best == None) or (elapsed < best):
+			best = elapsed
+
+	return best
+
+# Main benchmark procedure
+def run(maxSize = 2048, repeats = 3, legacy = True):
+	header = "%10s %12s %12s" % ("size [KB]", "new [ms]", "new [ms/KB]")
+
+	if legacy:
+		header += " %12s %12s" % ("legacy [ms]", "leg. [ms/KB]")
+
+	print(header)
+
+	size = 128
+
+	while size <= maxSize:
+		document = buildDocument(size * 1024)
+		newTime = measure(htmlTools.HTMLToText, document, repeats)
+		line = "%10d %12.1f %12.3f" % (size, newTime * 1000, newTime * 1000 / size)
+
+		if legacy:
+			legacyTime = measure(htmlTools.HTMLToTextLegacy, document, 1)
+			line += " %12.1f %12.3f" % (legacyTime * 1000, legacyTime * 1000 / size)
+
+		print(line)
+		size *= 2
+
+	return
+
+
+# Autorun part
+if __name__ == "__main__":
+	arguments = sys.argv[1:]
+	legacy = True
+
+	if "--no-legacy" in arguments:
+		arguments.remove("--no-legacy")
+		legacy = False
+
+	if len(arguments) > 2:
+		print("Usage: htmlBenchmark.py [maxSizeInKB] [repeats] [--no-legacy]")
+		exit(1)
+
+	maxSize = 2048
+	repeats = 3
+
+	if len(arguments) >= 1:
+		maxSize = int(arguments[0])
+
+	if len(arguments) == 2:
+		repeats = int(arguments[1])
+
+	run(maxSize, repeats, legacy)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Micro-benchmarks of the tiffTools, halftoneTools, cutter, htmlTools (and text processing) functions
+#
+# Every function is called on the fixed input (generated from the benchmark corpus seed) and
+# the best and mean times are printed. Functions depending on external tools (paps, gs, convert,
+# netpbm) are skipped if those tools are not installed.
+#
+# Usage: microBenchmark.py [repeats] [nameFilter]
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import benchmarkTools
+import htmlBenchmark
+import cutter
+import tiffTools
+import halftoneTools
+import htmlTools
+import textTools
+import textRenderer
+import dataTools
+
+
+# Fixture class (inputs shared by the benchmarks; generated once)
+class Fixtures:
+	def __init__(self, directory):
+		rng = random.Random(benchmarkTools.SEED)
+
+		self.directory = directory
+		self.photo = benchmarkTools.photoImage(rng, 2400, 3200)
+		self.jpeg = benchmarkTools.encodeImage(self.photo, "JPEG", quality = 85)
+		self.document = benchmarkTools.documentPage(rng)
+		self.multipage = benchmarkTools.encodeImage(self.document, "TIFF", compression = "group4", save_all = True, append_images = [benchmarkTools.documentPage(rng) for page in range(4)])
+		self.page = tiffTools.imageToPage(self.photo)
+		self.documentPage = tiffTools.imageToPage(self.document.convert("L"))
+		self.text = benchmarkTools.randomText(rng, 20000)
+		self.spacedText = self.text.replace(" ", "   ").replace("\n", "\r\n").replace("fax", "&amp;fax")
+		self.textPage = textRenderer.renderText(self.text)[0]
+		self.html = htmlBenchmark.buildDocument(65536)
+		return
+
+	# Function for getting file name in the fixtures directory
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+# Function for getting list of benchmarks: (name, function, required external tools)
+def benchmarks(fixtures):
+	return [
+		("tiffTools.imageDataToPage (JPEG 2400x3200)", lambda: tiffTools.imageDataToPage(fixtures.jpeg), []),
+		("tiffTools.imageToPage (2400x3200)", lambda: tiffTools.imageToPage(fixtures.photo), []),
+		("tiffTools.flattenImage (2400x3200)", lambda: tiffTools.flattenImage(fixtures.photo), []),
+		("tiffTools.saveG3TIFF (photo page)", lambda: tiffTools.saveG3TIFF(fixtures.page, fixtures.path("page.tiff")), []),
+		("halftoneTools.chooseMethod (photo page)", lambda: halftoneTools.chooseMethod(fixtures.page), []),
+		("halftoneTools.thresholdImage (document page)", lambda: halftoneTools.thresholdImage(fixtures.documentPage), []),
+		("halftoneTools.adaptiveThreshold (document page)", lambda: halftoneTools.adaptiveThreshold(fixtures.documentPage), []),
+		("halftoneTools.bayerDither (photo page)", lambda: halftoneTools.bayerDither(fixtures.page), []),
+		("halftoneTools.floydSteinbergDither (photo page)", lambda: halftoneTools.floydSteinbergDither(fixtures.page), []),
+		("tiffTools.imageToG3TIFF (JPEG 2400x3200)", lambda: tiffTools.imageToG3TIFF(fixtures.jpeg, fixtures.path("image.tiff")), []),
+		("tiffTools.encodeFrame (document, group4)", lambda: tiffTools.encodeFrame(fixtures.document, "group4"), []),
+		("tiffTools.iterateTIFFPages (5 pages)", lambda: list(tiffTools.iterateTIFFPages(fixtures.multipage)), []),
+		("tiffTools.iterateTIFFPages (5 pages, encoded)", lambda: list(tiffTools.iterateTIFFPages(fixtures.multipage, True)), []),
+		("tiffTools.iterateTIFFPages (first page)", lambda: next(tiffTools.iterateTIFFPages(fixtures.multipage)), []),
+		("tiffTools.textToTIFF (20 KB text)", lambda: tiffTools.textToTIFF(fixtures.path("text.tiff"), fixtures.text), ["paps", "gs"]),
+		("tiffTools.imageToG3TIFFLegacy (JPEG 2400x3200)", lambda: tiffTools.imageToG3TIFFLegacy(fixtures.jpeg, fixtures.path("legacy.tiff")), ["convert", "ppmtopgm", "pgmtopbm", "pnmtotiff"]),
+		("cutter.cropImage (text page)", lambda: cutter.cropImage(fixtures.textPage), []),
+		("cutter.bottomEnd (text page)", lambda: cutter.bottomEnd(fixtures.textPage), []),
+		("cutter.calculateCutMargin", lambda: cutter.calculateCutMargin(1), []),
+		("htmlTools.HTMLToText (64 KB)", lambda: htmlTools.HTMLToText(fixtures.html), []),
+		("htmlTools.HTMLToTextLegacy (64 KB)", lambda: htmlTools.HTMLToTextLegacy(fixtures.html), []),
+		("textTools.normalizeText (20 KB)", lambda: textTools.normalizeText(fixtures.spacedText, True, True), []),
+		("textTools.finishText (20 KB)", lambda: textTools.finishText(fixtures.text, True, True), []),
+		("textRenderer.renderText (20 KB)", lambda: textRenderer.renderText(fixtures.text), []),
+		("dataTools.determineMimeType (JPEG)", lambda: dataTools.determineMimeType(fixtures.jpeg), [])
+	]
+
+# Function for measuring function (returns best and mean time)
+def measure(function, repeats):
+	times = []
+
+	for repeat in range(repeats):
+		start = time.perf_counter()
+		function()
+		times += [time.perf_counter() - start]
+
+	return min(times), sum(times) / len(times)
+
+# Main benchmark procedure
+def run(repeats = 5, nameFilter = ""):
+	directory = tempfile.mkdtemp(prefix = "mail2fax-micro-")
+
+	try:
+		fixtures = Fixtures(directory)
+
+		print("%-50s %10s %10s" % ("function", "best [ms]", "mean [ms]"))
+
+		for name, function, tools in benchmarks(fixtures):
+			if nameFilter not in name:
+				continue
+
+			missing = [tool for tool in tools if shutil.which(tool) == None]
+
+			if missing != []:
+				print("%-50s %21s" % (name, "skipped (no " + ", ".join(missing) + ")"))
+				continue
+
+			# First call is not measured (lazy imports, font loading and so on)
+			function()
+			best, mean = measure(function, repeats)
+			print("%-50s %10.2f %10.2f" % (name, best * 1000, mean * 1000))
+
+	finally:
+		shutil.rmtree(directory, ignore_errors = True)
+
+	return
+
+
+# Autorun part
+if __name__ == "__main__":
+	if len(sys.argv) > 3:
+		print("Usage: microBenchmark.py [repeats] [nameFilter]")
+		exit(1)
+
+	repeats = 5
+	nameFilter = ""
+
+	if len(sys.argv) >= 2:
+		repeats = int(sys.argv[1])
+
+	if len(sys.argv) == 3:
+		nameFilter = sys.argv[2]
+
+	run(repeats, nameFilter)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+# Regression check (pages of the generated corpus compared pixel by pixel with a locally recorded baseline)
+#
+# "record" runs the corpus through the relay and stores every spooled page (as 1-bit PNG) with
+# phone number and resolution of the job, "check" runs it again and compares with the recorded ones.
+# No baseline is shipped - it's recorded locally by the tree before a change (with the same Pillow,
+# libtiff and fonts), so checking after the change catches any change of the output (e.g. after
+# optimizing something). It covers the whole relay path of the corpus messages (parsing, triggers,
+# native text rendering, HTML conversion, JPEG and multipage TIFF conversion and halftoning) with the
+# default rendering settings - packing and blank page removal are off by default, so they're not covered.
+#
+# With --reference, the old subprocess chain is used (paps and gs for texts, convert and netpbm
+# for images). In-process rendering, resampling and halftoning are not the same as that chain, so
+# the current implementation checked against such baseline is expected to differ - the check
+# just shows where and how many pixels differ, it's not a proof of identical output.
+#
+# Usage: regressionCheck.py record|check baselineDirectory [messagesPerKind] [--reference]
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import PIL.Image
+import PIL.ImageChops
+import benchmarkTools
+import tiffTools
+import pipeline
+
+
+# Manifest file name (in the baseline directory)
+MANIFEST = "manifest.json"
+
+# External tools needed by the reference chain
+REFERENCE_TOOLS = ["paps", "gs", "convert", "ppmtopgm", "pgmtopbm", "pnmtotiff"]
+
+
+# Image to page files converter using the old subprocess chain (replaces the pipeline's one for the reference run)
+def referenceImageToPageFiles(payload, spoolFile, outputPrefix, settings, pageWorkers = 1):
+	fileList = []
+
+	if spoolFile != "":
+		source = spoolFile
+	else:
+		source = payload
+
+	for pageData in tiffTools.iterateTIFFPages(source, encoded = True, unpack = settings.UNPACK_MULTI_TIFF):
+		fileName = outputPrefix + "-" + str(len(fileList) + 1) + ".tiff"
+		tiffTools.imageToG3TIFFLegacy(pageData, fileName)
+		fileList += [fileName]
+
+	return fileList
+
+# Function for loading page as 1-bit image (with its DPI)
+def loadPage(pageData):
+	img = PIL.Image.open(io.BytesIO(pageData))
+
+	try:
+		page = img.convert("1")
+		dpi = [round(value) for value in img.info.get("dpi", (0, 0))]
+	finally:
+		img.close()
+
+	return page, dpi
+
+# Function for getting page description (size, DPI and hash of the pixels)
+def describePage(page, dpi):
+	return {"size": list(page.size), "dpi": dpi, "sha256": hashlib.sha256(page.tobytes()).hexdigest()}
+
+# Function for running the corpus and gathering spooled jobs (dictionary: message name -> (job description, list of (page, dpi)))
+def runCorpus(messagesPerKind, reference):
+	if reference:
+		missing = [tool for tool in REFERENCE_TOOLS if shutil.which(tool) == None]
+
+		if missing != []:
+			print("Reference chain needs: " + ", ".join(missing))
+			exit(2)
+
+		pipeline.imageToPageFiles = referenceImageToPageFiles
+		environment = benchmarkTools.Environment("paps")
+	else:
+		environment = benchmarkTools.Environment("native")
+
+	results = {}
+
+	try:
+		for name, data in benchmarkTools.generateCorpus(messagesPerKind):
+			if not environment.process(data):
+				print(name + ": processing failed")
+
+			job = environment.takeJob(benchmarkTools.messageId(name))
+
+			if job == None:
+				results[name] = ({}, [])
+			else:
+				results[name] = ({"phone": job.phoneNumber, "standard_resolution": job.standardResolution}, [loadPage(page) for page in job.pages])
+
+	finally:
+		environment.close()
+
+	return results
+
+# Procedure for recording baseline pages
+def record(baselineDirectory, messagesPerKind = 3, reference = False):
+	results = runCorpus(messagesPerKind, reference)
+	manifest = {"seed": benchmarkTools.SEED, "messages_per_kind": messagesPerKind, "reference": reference, "messages": {}}
+
+	os.makedirs(baselineDirectory, exist_ok = True)
+
+	for name in results:
+		job, pages = results[name]
+		directory = os.path.join(baselineDirectory, name)
+		os.makedirs(directory, exist_ok = True)
+
+		for number in range(len(pages)):
+			pages[number][0].save(os.path.join(directory, str(number + 1) + ".png"))
+
+		manifest["messages"][name] = {"job": job, "pages": [describePage(page, dpi) for page, dpi in pages]}
+
+	manifestFile = open(os.path.join(baselineDirectory, MANIFEST), "w")
+	json.dump(manifest, manifestFile, indent = 1)
+	manifestFile.close()
+
+	print("Recorded " + str(sum(len(results[name][1]) for name in results)) + " pages of " + str(len(results)) + " messages")
+
+	return
+
+# Function for describing differences between baseline and current page ("" if they're identical)
+def comparePage(baselineDirectory, name, number, baseline, page, dpi):
+	current = describePage(page, dpi)
+
+	if current["size"] != baseline["size"]:
+		return "size " + "x".join(map(str, current["size"])) + " instead of " + "x".join(map(str, baseline["size"]))
+
+	if current["dpi"] != baseline["dpi"]:
+		return "DPI " + str(current["dpi"]) + " instead of " + str(baseline["dpi"])
+
+	if current["sha256"] == baseline["sha256"]:
+		return ""
+
+	baselinePage = PIL.Image.open(os.path.join(baselineDirectory, name, str(number) + ".png")).convert("L")
+	difference = PIL.ImageChops.difference(baselinePage, page.convert("L"))
+	pixels = difference.width * difference.height - difference.histogram()[0]
+
+	return str(pixels) + " pixels differ (box: " + str(difference.getbbox()) + ")"
+
+# Function for checking pages against the baseline ones (returns True if everything is identical)
+def check(baselineDirectory, reference = False):
+	manifestFile = open(os.path.join(baselineDirectory, MANIFEST), "r")
+	manifest = json.load(manifestFile)
+	manifestFile.close()
+
+	results = runCorpus(manifest["messages_per_kind"], reference)
+	identical = 0
+	problems = 0
+
+	for name in manifest["messages"]:
+		baseline = manifest["messages"][name]
+		job, pages = results.get(name, ({}, []))
+
+		if job != baseline["job"]:
+			print(name + ": spooled as " + str(job) + " instead of " + str(baseline["job"]))
+			problems += 1
+
+		if len(pages) != len(baseline["pages"]):
+			print(name + ": " + str(len(pages)) + " pages instead of " + str(len(baseline["pages"])))
+			problems += 1
+
+		for number in range(min(len(pages), len(baseline["pages"]))):
+			page, dpi = pages[number]
+			difference = comparePage(baselineDirectory, name, number + 1, baseline["pages"][number], page, dpi)
+
+			if difference == "":
+				identical += 1
+			else:
+				print(name + ", page " + str(number + 1) + ": " + difference)
+				problems += 1
+
+	print(str(identical) + " pages identical, " + str(problems) + " differences")
+
+	return problems == 0
+
+
+# Autorun part
+if __name__ == "__main__":
+	arguments = sys.argv[1:]
+	reference = False
+
+	if "--reference" in arguments:
+		arguments.remove("--reference")
+		reference = True
+
+	if (len(arguments) not in (2, 3)) or (arguments[0] not in ("record", "check")):
+		print("Usage: regressionCheck.py record|check baselineDirectory [messagesPerKind] [--reference]")
+		exit(1)
+
+	if arguments[0] == "record":
+		messagesPerKind = 3
+
+		if len(arguments) == 3:
+			messagesPerKind = int(arguments[2])
+
+		record(arguments[1], messagesPerKind, reference)
+
+	elif not check(arguments[1], reference):
+		exit(1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# Relay throughput benchmark (generated corpus processed by relay.getAndProcess with the stub spool backend)
+#
+# Prints messages per second and wall time and per-stage latency percentiles (taken from the relay's
+# metrics) for every message kind and for the whole corpus. Messages can be processed by many threads
+# at once (as the daemon does) and every message can be converted by many workers.
+#
+# Usage: relayBenchmark.py [messagesPerKind] [threads] [conversionWorkers] [--paps]
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import sys
+import time
+import concurrent.futures
+import benchmarkTools
+
+
+# Stages in the processing order (others found in the metrics are printed after them)
+STAGES = ["ingest", "parse", "sniff", "html", "normalize", "render_text", "cut", "split", "convert_image", "halftone", "encode", "blank", "spool"]
+
+
+# Procedure for printing percentiles of the chosen records
+def printPercentiles(title, records):
+	print(title + " (" + str(len(records)) + " messages)")
+	print("  %-14s %10s %10s %10s %10s" % ("stage", "p50 [ms]", "p90 [ms]", "p99 [ms]", "max [ms]"))
+
+	stages = STAGES + sorted(set(stage for record in records for stage in record["stages"]) - set(STAGES))
+	rows = [("wall", [record["wall_seconds"] for record in records])]
+
+	for stage in stages:
+		values = [record["stages"][stage] for record in records if stage in record["stages"]]
+
+		if values != []:
+			rows += [(stage, values)]
+
+	for name, values in rows:
+		values = sorted(values)
+		print("  %-14s %10.1f %10.1f %10.1f %10.1f" % (name, benchmarkTools.percentile(values, 0.5) * 1000, benchmarkTools.percentile(values, 0.9) * 1000, benchmarkTools.percentile(values, 0.99) * 1000, values[-1] * 1000))
+
+	print("  pages: " + str(sum(record["pages"] for record in records)) + ", bytes in: " + str(sum(record["bytes_in"] for record in records)) + ", bytes out: " + str(sum(record["bytes_out"] for record in records)))
+
+	# G3 size of the image pages by the bilevel conversion method
+	methods = sorted(set(method for record in records for method in record.get("halftone", {})))
+
+	for method in methods:
+		pages = sum(record["halftone"][method]["pages"] for record in records if method in record.get("halftone", {}))
+		size = sum(record["halftone"][method]["bytes"] for record in records if method in record.get("halftone", {}))
+		print("  halftone %-16s %4d pages, %10d bytes (%d bytes per page)" % (method, pages, size, size // pages))
+
+	print()
+
+	return
+
+# Main benchmark procedure
+def run(messagesPerKind = 3, threads = 1, workers = 1, renderer = "native"):
+	print("Generating corpus...")
+	corpus = benchmarkTools.generateCorpus(messagesPerKind)
+	environment = benchmarkTools.Environment(renderer, workers)
+
+	try:
+		# Warm up (imports, fonts and so on) with one message of every kind, not measured
+		for name, data in corpus[:len(benchmarkTools.KINDS)]:
+			environment.process(data)
+
+		warmedUp = len(environment.metrics())
+
+		start = time.perf_counter()
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers = threads) as executor:
+			results = list(executor.map(environment.process, [data for name, data in corpus]))
+
+		elapsed = time.perf_counter() - start
+		records = environment.metrics()[warmedUp:]
+
+	finally:
+		environment.close()
+
+	print()
+	print("Messages: " + str(len(corpus)) + " (failed: " + str(results.count(False)) + "), threads: " + str(threads) + ", conversion workers: " + str(workers) + ", renderer: " + renderer)
+	print("Time: %.2f s, throughput: %.2f messages/s" % (elapsed, len(corpus) / elapsed))
+	print()
+
+	# Records are matched to the kinds by Message-ID (threads may finish in any order)
+	for kind in benchmarkTools.KINDS:
+		kindRecords = [record for record in records if record["message_id"].startswith("<" + kind + "-")]
+
+		if kindRecords != []:
+			printPercentiles(kind, kindRecords)
+
+	printPercentiles("all", records)
+
+	return
+
+
+# Autorun part
+if __name__ == "__main__":
+	arguments = sys.argv[1:]
+	renderer = "native"
+
+	if "--paps" in arguments:
+		arguments.remove("--paps")
+		renderer = "paps"
+
+	if len(arguments) > 3:
+		print("Usage: relayBenchmark.py [messagesPerKind] [threads] [conversionWorkers] [--paps]")
+		exit(1)
+
+	values = [3, 1, 1]
+
+	for number in range(len(arguments)):
+		values[number] = int(arguments[number])
+
+	run(values[0], values[1], values[2], renderer)
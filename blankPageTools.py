@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Blank page tools (finding blank and almost blank fax pages before they're spooled)
+#
+# Ink coverage is the number of black pixels (taken from the histogram, so it's counted in C, not in Python)
+# divided by the real page area. Pages shorter than the nominal page height (cut text pages) are scored
+# against their own area, so a short page with just a few words is not taken as blank.
+# Every page of the message is never removed - if all of them are blank, the first one is still sent.
+#
+# Pages are checked as final G3 TIFF files, so every page is checked the same way, no matter if it's
+# a rendered text, converted image, unpacked TIFF page or a page taken from the conversion cache.
+# G3 data of a page can't be much bigger than the blank page's, if there's almost no ink on it,
+# so pages too big for that are not even decoded.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import io
+import os
+import functools
+import PIL.Image
+import tiffTools
+import additionalTools
+
+
+# Upper limit of G3 data bytes one black pixel can add to the page (codes of the split runs and fill bits)
+BYTES_PER_INK_PIXEL = 8
+
+# Allowed difference of the TIFF structure (tags) between pages
+TIFF_SLACK = 256
+
+# Time of the signalling around every page (post-page message and confirmation), in seconds
+PAGE_SIGNALLING_SECONDS = 3
+
+
+# Function for counting black pixels of the page
+def inkPixels(page):
+	if page.mode == "1":
+		return page.histogram()[0]
+
+	return sum(page.convert("L").histogram()[:128])
+
+# Function for calculating ink coverage of the page (fraction of the page area covered by black pixels)
+def inkCoverage(page):
+	return inkPixels(page) / (page.width * page.height)
+
+# Function for getting size of the blank G3 TIFF page of the chosen size (cached; pages are mostly the same size)
+@functools.lru_cache(maxsize = 64)
+def blankPageSize(width, height):
+	output = io.BytesIO()
+	tiffTools.saveG3TIFF(PIL.Image.new("1", (width, height), 1), output)
+	return len(output.getvalue())
+
+# Function for checking if page file is blank (its ink coverage is less than chosen percent of the page)
+def isBlankPage(fileName, minimumCoverage = 0.01):
+	img = PIL.Image.open(fileName)
+
+	try:
+		allowedInk = minimumCoverage / 100 * img.width * img.height
+
+		# Too much data for so little ink - no need to decode the page
+		if os.path.getsize(fileName) > blankPageSize(img.width, img.height) + BYTES_PER_INK_PIXEL * allowedInk + TIFF_SLACK:
+			return False
+
+		return inkPixels(img) < allowedInk
+
+	finally:
+		img.close()
+
+# Function for estimating time of sending the page file (in seconds; line speed in bits per second)
+def sendingTime(fileName, lineSpeed = 9600):
+	return os.path.getsize(fileName) * 8 / max(1, lineSpeed) + PAGE_SIGNALLING_SECONDS
+
+# Function for removing blank pages from the list (pages checked by worker threads if set)
+# If every page is blank, the first one is kept (message is never dropped completely that way).
+# Returns: (pages left, number of removed pages, estimated sending time of removed pages in seconds)
+def removeBlankPages(pageFiles, minimumCoverage = 0.01, lineSpeed = 9600, workers = 1):
+	blank = additionalTools.mapInOrder(lambda fileName: isBlankPage(fileName, minimumCoverage), pageFiles, workers)
+
+	if (blank != []) and all(blank):
+		blank[0] = False
+	pagesLeft = []
+	removed = 0
+	savedTime = 0
+
+	for fileName, isBlank in zip(pageFiles, blank):
+		if isBlank:
+			removed += 1
+			savedTime += sendingTime(fileName, lineSpeed)
+		else:
+			pagesLeft += [fileName]
+
+	return pagesLeft, removed, savedTime
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+# Content-addressed conversion cache (finished G3 TIFF pages of attachments)
+#
+# Keys are SHA-256 hashes of the payload and every conversion parameter (including
+# renderer version), so cached pages never have to be invalidated - they just get
+# evicted. There are two tiers:
+#   memory tier - kept by the (resident) process, bounded by size, LRU eviction,
+#   disk tier - one directory per key (page-1.tiff, page-2.tiff, ...), bounded by size,
+#               LRU eviction based on modification times (updated on every hit).
+# Approximate size of the disk tier is kept in the usage file (shared by all processes using
+# the directory), so the directory is scanned only when it seems to exceed the limit.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextvars
+import collections
+import dataTools
+
+
+# Page file names inside the disk tier entries
+PAGE_PREFIX = "page-"
+PAGE_SUFFIX = ".tiff"
+
+# Approximate size of the disk tier (bytes of the page files)
+USAGE_FILE = ".used"
+
+# Part of the disk tier limit left after eviction (so the full cache isn't scanned on every put)
+TRIM_TARGET = 0.9
+
+
+# Conversion cache class
+class ConversionCache:
+	def __init__(self, memorySize = 0, directory = "", diskSize = 0):
+		self.lock = threading.Lock()
+		self.memory = collections.OrderedDict()
+		self.memoryUsed = 0
+		self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+		self.configure(memorySize, directory, diskSize)
+		return
+
+	# Procedure for (re)configuring cache limits
+	def configure(self, memorySize = 0, directory = "", diskSize = 0):
+		with self.lock:
+			self.memorySize = memorySize
+			self.directory = directory
+			self.diskSize = diskSize
+			self.trimMemory()
+
+		return
+
+	# Procedure for evicting least recently used entries from memory tier (lock must be held)
+	def trimMemory(self):
+		while (self.memoryUsed > self.memorySize) and (len(self.memory) > 0):
+			key, pages = self.memory.popitem(last = False)
+			self.memoryUsed -= sum(len(page) for page in pages)
+
+		return
+
+	# Procedure for putting pages to the memory tier
+	def putMemory(self, key, pages):
+		size = sum(len(page) for page in pages)
+
+		if size > self.memorySize:
+			return
+
+		with self.lock:
+			if key in self.memory:
+				self.memoryUsed -= sum(len(page) for page in self.memory.pop(key))
+
+			self.memory[key] = pages
+			self.memoryUsed += size
+			self.trimMemory()
+
+		return
+
+	# Function for getting pages from the disk tier (returns None if not found)
+	def getDisk(self, key):
+		if (self.directory == "") or (self.diskSize <= 0):
+			return None
+
+		entry = os.path.join(self.directory, key)
+
+		try:
+			pageFiles = sorted((fileName for fileName in os.listdir(entry) if fileName.endswith(PAGE_SUFFIX)), key = lambda fileName: int(fileName[len(PAGE_PREFIX):-len(PAGE_SUFFIX)]))
+			pages = []
+
+			for fileName in pageFiles:
+				pageFile = open(os.path.join(entry, fileName), "rb")
+				pages += [pageFile.read()]
+				pageFile.close()
+
+			# Mark entry as recently used
+			os.utime(entry)
+
+		except (OSError, ValueError):
+			return None
+
+		if pages == []:
+			return None
+
+		return pages
+
+	# Procedure for putting pages to the disk tier (entry is written aside and renamed, so it's never seen half-written)
+	def putDisk(self, key, pages):
+		if (self.directory == "") or (self.diskSize <= 0):
+			return
+
+		try:
+			os.makedirs(self.directory, exist_ok = True)
+			temporary = tempfile.mkdtemp(prefix = ".", dir = self.directory)
+
+			try:
+				pageNumber = 1
+
+				for page in pages:
+					pageFile = open(os.path.join(temporary, PAGE_PREFIX + str(pageNumber) + PAGE_SUFFIX), "wb")
+					pageFile.write(page)
+					pageFile.close()
+					pageNumber += 1
+
+				os.rename(temporary, os.path.join(self.directory, key))
+
+			except OSError:
+				# Entry exists already (probably written by another process)
+				shutil.rmtree(temporary, ignore_errors = True)
+				return
+
+			used = self.addDiskUsage(sum(len(page) for page in pages))
+
+			if (used == None) or (used > self.diskSize):
+				self.trimDisk()
+
+		except OSError:
+			pass
+
+		return
+
+	# Function for adding to the approximate size of the disk tier (returns new size or None if it's not known yet)
+	def addDiskUsage(self, size):
+		usageFile = open(os.path.join(self.directory, USAGE_FILE), "a+")
+
+		try:
+			fcntl.flock(usageFile, fcntl.LOCK_EX)
+			usageFile.seek(0)
+
+			try:
+				used = int(usageFile.read()) + size
+			except ValueError:
+				return None
+
+			usageFile.truncate(0)
+			usageFile.write(str(used))
+
+		finally:
+			usageFile.close()
+
+		return used
+
+	# Procedure for setting the approximate size of the disk tier (after it's been scanned)
+	def setDiskUsage(self, used):
+		usageFile = open(os.path.join(self.directory, USAGE_FILE), "a+")
+
+		try:
+			fcntl.flock(usageFile, fcntl.LOCK_EX)
+			usageFile.truncate(0)
+			usageFile.write(str(used))
+
+		finally:
+			usageFile.close()
+
+		return
+
+	# Procedure for evicting least recently used entries from disk tier (scans the whole directory, evicts below the limit)
+	def trimDisk(self):
+		entries = []
+		used = 0
+
+		for entry in os.scandir(self.directory):
+			if entry.name.startswith(".") or (not entry.is_dir()):
+				continue
+
+			try:
+				size = sum(pageFile.stat().st_size for pageFile in os.scandir(entry.path))
+				entries += [(entry.stat().st_mtime, size, entry.path)]
+				used += size
+
+			except OSError:
+				pass
+
+		if used <= self.diskSize:
+			self.setDiskUsage(used)
+			return
+
+		for modificationTime, size, path in sorted(entries):
+			if used <= self.diskSize * TRIM_TARGET:
+				break
+
+			shutil.rmtree(path, ignore_errors = True)
+			used -= size
+
+		self.setDiskUsage(used)
+
+		return
+
+	# Procedure for counting cache lookup (for the process and for the message processed in the current context)
+	def count(self, name):
+		messageCounters = currentCounters.get()
+
+		with self.lock:
+			self.counters[name] += 1
+
+			if messageCounters != None:
+				messageCounters[name] += 1
+
+		return
+
+	# Function for getting cached pages (list of G3 TIFF files' contents or None if not cached)
+	def get(self, key):
+		with self.lock:
+			pages = self.memory.get(key)
+
+			if pages != None:
+				self.memory.move_to_end(key)
+
+		if pages != None:
+			self.count("memory_hits")
+			return pages
+
+		pages = self.getDisk(key)
+
+		if pages != None:
+			self.count("disk_hits")
+			self.putMemory(key, pages)
+			return pages
+
+		self.count("misses")
+
+		return None
+
+	# Procedure for putting converted pages to the cache (both tiers)
+	def put(self, key, pages):
+		self.putMemory(key, pages)
+		self.putDisk(key, pages)
+		return
+
+	# Function for getting hit/miss counters
+	def statistics(self):
+		with self.lock:
+			return {"memory_hits": self.counters["memory_hits"], "disk_hits": self.counters["disk_hits"], "misses": self.counters["misses"], "memory_entries": len(self.memory), "memory_used": self.memoryUsed}
+
+
+# Function for calculating cache key from payload (in memory or spool file) and conversion parameters
+def cacheKey(payload, spoolFile, parameters):
+	hasher = hashlib.sha256()
+
+	if spoolFile != "":
+		inFile = open(spoolFile, "rb")
+
+		try:
+			while True:
+				chunk = inFile.read(dataTools.CHUNK_SIZE)
+				if chunk == b"":
+					break
+				hasher.update(chunk)
+
+		finally:
+			inFile.close()
+
+	else:
+		hasher.update(payload)
+
+	hasher.update(repr(parameters).encode())
+
+	return hasher.hexdigest()
+
+
+# Hit/miss counters of the message processed in the current context (worker threads get copy of the context)
+currentCounters = contextvars.ContextVar("currentCounters", default = None)
+
+# Cache shared by all the conversions in the process
+sharedCache = ConversionCache()
+
+# Function for starting hit/miss counters of the message processed in the current context (returns them)
+def countMessage():
+	counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+	currentCounters.set(counters)
+	return counters
+
+# Function for getting shared cache configured using chosen settings (returns None if cache is switched off)
+def getCache(settings):
+	if not settings.CACHE_ENABLED:
+		return None
+
+	sharedCache.configure(settings.CACHE_MEMORY_SIZE, settings.CACHE_DIRECTORY, settings.CACHE_DISK_SIZE)
+
+	return sharedCache
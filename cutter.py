@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 
-# Simple bottom cutter for G3 TIFFs utilizing PIL and ImageMagick
+# Simple bottom cutter for G3 TIFFs utilizing PIL
 #
-# by Magnetic-Fox, 02.08.2024 - 22.11.2025
+# by Magnetic-Fox, 02.08.2024 - 18.10.2026
 #
-# (C)2024-2025 Bartłomiej "Magnetic-Fox" Węgrzyn!
+# (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
 import sys
 import math
-import subprocess
 import PIL.Image
 
 
@@ -16,52 +15,89 @@ import PIL.Image
 DEFAULT_LEAVE = 94
 
 
-# Line checker
-def checkLine(image, pixels, lineNumber):
-	for i in range(image.width):
-		if pixels[i, lineNumber] != 255:
-			return False
-	return True
+# Non-white area finder (whole image at once; any pixel different than white counts)
+def inkBox(image):
+	if image.mode != "L":
+		image = image.convert("L")
 
-# Bottom end finder
-def bottomEnd(image, pixels):
-	for i in range(image.height):
-		if not checkLine(image, pixels, image.height - i - 1):
-			return image.height - i - 1
-	return -1
+	return image.point(lambda value: 0 if value == 255 else 255).getbbox()
+
+# Bottom end finder (pixel access object is not needed anymore, but still accepted)
+def bottomEnd(image, pixels = None):
+	box = inkBox(image)
+
+	if box == None:
+		return -1
+
+	return box[3] - 1
 
 # Cutting possible formula
 def cuttingPossibleFormula(botEnd, imgHeight, leave = DEFAULT_LEAVE):
 	return (botEnd != -1) and (botEnd + leave < imgHeight)
 
 # Cutting possible formula on image wrapper
-def cuttingPossible(image, pixels, leave = DEFAULT_LEAVE):
+def cuttingPossible(image, pixels = None, leave = DEFAULT_LEAVE):
 	botEnd = bottomEnd(image, pixels)
 	return cuttingPossibleFormula(botEnd, image.height, leave)
 
 # Bottom cut position finder
-def bottomCutPosition(image, pixels, leave = DEFAULT_LEAVE):
+def bottomCutPosition(image, pixels = None, leave = DEFAULT_LEAVE):
 	botEnd = bottomEnd(image, pixels)
 	if cuttingPossibleFormula(botEnd, image.height, leave):
 		return botEnd + leave
 	else:
 		return None
 
+# Image cropping function (returns cropped image or None if cutting is not possible)
+def cropImage(image, leave = DEFAULT_LEAVE):
+	cuttingPosition = bottomCutPosition(image, None, leave)
+
+	if cuttingPosition != None:
+		return image.crop((0, 0, image.width, cuttingPosition))
+
+	return None
+
 # Load and crop all-in-one solution (which should be named loadAndCutBottom, but...)
 def loadAndCrop(filename, leave = DEFAULT_LEAVE):
-	# PIL part
 	img = PIL.Image.open(filename)
-	pxl = img.load()
-	cuttingPosition = bottomCutPosition(img, pxl, leave)
-	img.close()
 
-	# ImageMagick part
-	if cuttingPosition != None:
-		convertCommand = ["convert", filename, "-crop", "x" + str(cuttingPosition) + "+0+0", filename]
-		return subprocess.run(convertCommand).returncode
+	try:
+		img.load()
+		cropped = cropImage(img, leave)
+
+		# Save over the original file keeping its compression and resolution
+		if cropped != None:
+			saveOptions = {}
+
+			if img.format == "TIFF":
+				saveOptions["compression"] = img.info.get("compression", "raw")
+
+			if "dpi" in img.info:
+				saveOptions["dpi"] = img.info["dpi"]
+
+			imageFormat = img.format
+
+			img.close()
+			cropped.save(filename, format = imageFormat, **saveOptions)
+
+	finally:
+		img.close()
 
 	return 0
 
+# Many files cropping function (one interpreter for all of them; returns 0 or 2 if any of files failed)
+def loadAndCropMany(filenames, leave = DEFAULT_LEAVE):
+	exitCode = 0
+
+	for filename in filenames:
+		try:
+			if loadAndCrop(filename, leave) != 0:
+				exitCode = 2
+		except:
+			exitCode = 2
+
+	return exitCode
+
 # Simple bottom cut calculating function (0 - standard resolution, 1 - fine resolution (default), 2 - super fine resolution)
 def calculateCutMargin(resolution, leave = DEFAULT_LEAVE):
 	if resolution == 0:
@@ -79,15 +115,26 @@ def calculateCutMargin(resolution, leave = DEFAULT_LEAVE):
 # Autorun part (for standalone use)
 if __name__ == "__main__":
 	exitCode = 0
+	arguments = sys.argv[1:]
+	leave = DEFAULT_LEAVE
 
 	try:
-		if len(sys.argv) == 2:
-			exitCode = loadAndCrop(sys.argv[1])
-		elif len(sys.argv) == 3:
-			exitCode = loadAndCrop(sys.argv[1], int(sys.argv[2]))
-		else:
-			print("Usage: cutter.py <filename> [bottomMarginSize]")
+		# Old calling convention: cutter.py <filename> <bottomMarginSize>
+		if (len(arguments) == 2) and arguments[1].isdigit():
+			leave = int(arguments[1])
+			arguments = arguments[:1]
+
+		# New one: cutter.py [-l bottomMarginSize] <filename> [filename...]
+		elif (len(arguments) >= 2) and (arguments[0] == "-l"):
+			leave = int(arguments[1])
+			arguments = arguments[2:]
+
+		if len(arguments) == 0:
+			print("Usage: cutter.py [-l bottomMarginSize] <filename> [filename...]")
+			print("       cutter.py <filename> [bottomMarginSize]")
 			exitCode = 1
+		else:
+			exitCode = loadAndCropMany(arguments, leave)
 	except:
 		exitCode = 2
 
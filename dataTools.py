@@ -2,22 +2,215 @@
 
 # Data tools
 #
-# by Magnetic-Fox, 13.07.2024 - 06.01.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
+import os
+import codecs
+import binascii
 import subprocess
+import email.quoprimime
 
 
-# Function for determining attachment's mime type (using file command)
-def determineMimeType(data):
+# Leading bytes checked by the in-process sniffer
+SNIFF_SIZE = 4096
+
+# Leading bytes passed to the file command (if sniffer can't decide)
+FILE_COMMAND_SIZE = 1048576
+
+# Chunk size for streaming message data
+CHUNK_SIZE = 65536
+
+# Magic signatures table: (list of (offset, signature) pairs, mime type)
+SIGNATURES = [
+	([(0, b"\xff\xd8\xff")], "image/jpeg"),
+	([(0, b"\x89PNG\r\n\x1a\n")], "image/png"),
+	([(0, b"GIF87a")], "image/gif"),
+	([(0, b"GIF89a")], "image/gif"),
+	([(0, b"II*\x00")], "image/tiff"),
+	([(0, b"MM\x00*")], "image/tiff"),
+	([(0, b"BM"), (6, b"\x00\x00\x00\x00")], "image/bmp"),
+	([(0, b"RIFF"), (8, b"WEBP")], "image/webp"),
+	([(0, b"%PDF-")], "application/pdf"),
+	([(0, b"%!PS")], "application/postscript"),
+	([(0, b"PK\x03\x04")], "application/zip"),
+	([(0, b"\x1f\x8b")], "application/gzip"),
+	([(0, b"BZh")], "application/x-bzip2"),
+	([(0, b"\xfd7zXZ\x00")], "application/x-xz"),
+	([(0, b"7z\xbc\xaf\x27\x1c")], "application/x-7z-compressed"),
+	([(0, b"Rar!\x1a\x07")], "application/x-rar")
+]
+
+# Leading tags of HTML documents (checked case-insensitively after white spaces)
+HTML_TAGS = [b"<!doctype html", b"<html", b"<head", b"<body", b"<title", b"<script", b"<style", b"<table"]
+
+# Text beginnings the file command may classify differently (mails, JSON and so on), so let it decide
+AMBIGUOUS_TEXT = [b"<", b"{", b"[", b"From ", b"From:", b"Received:", b"Return-Path:"]
+
+# Control characters allowed in plain text
+TEXT_CONTROLS = b"\t\n\r\f\v\x1b"
+
+
+# Function for checking magic signatures table
+def sniffSignature(head):
+	for signatures, mimeType in SIGNATURES:
+		matching = True
+
+		for offset, signature in signatures:
+			if head[offset:offset + len(signature)] != signature:
+				matching = False
+				break
+
+		if matching:
+			return mimeType
+
+	return None
+
+# Function for checking if data looks like (UTF-8 or ASCII) text, HTML or XML
+def sniffText(head, complete = False):
+	# Skip UTF-8 BOM
+	if head[0:3] == b"\xef\xbb\xbf":
+		head = head[3:]
+
+	# Binary data is not a text
+	if b"\x00" in head:
+		return None
+
+	# Tolerate a multibyte character cut at the end of the sample
+	try:
+		codecs.getincrementaldecoder("utf-8")().decode(head, final = complete)
+
+	except UnicodeDecodeError:
+		return None
+
+	for character in head:
+		if (character < 0x20) and (character not in TEXT_CONTROLS):
+			return None
+
+	stripped = head.lstrip()
+	lowered = stripped[0:32].lower()
+
+	for tag in HTML_TAGS:
+		if lowered.startswith(tag):
+			return "text/html"
+
+	if lowered.startswith(b"<?xml"):
+		return "text/xml"
+
+	for beginning in AMBIGUOUS_TEXT:
+		if stripped.startswith(beginning):
+			return None
+
+	return "text/plain"
+
+# Function for determining mime type from leading bytes (returns None if not possible)
+def sniffMimeType(head, complete = False):
+	mimeType = sniffSignature(head)
+
+	if mimeType == None:
+		mimeType = sniffText(head, complete)
+
+	return mimeType
+
+# Function for determining attachment's mime type using file command
+def fileMimeType(data):
 	fileCommand = ["file", "-b", "--mime-type", "-"]
 	fileProcess = subprocess.Popen(fileCommand, stdin = subprocess.PIPE, stdout = subprocess.PIPE)
 
+	return fileProcess.communicate(data)[0].decode().rstrip()
+
+# Function for determining attachment's mime type (in-process sniffer first, file command if it can't decide)
+def determineMimeType(data):
 	if isinstance(data, str):
 		data = data.encode()
 
-	return fileProcess.communicate(data)[0].decode().rstrip()
+	mimeType = sniffMimeType(data[0:SNIFF_SIZE], len(data) <= SNIFF_SIZE)
+
+	if mimeType == None:
+		mimeType = fileMimeType(data[0:FILE_COMMAND_SIZE])
+
+	return mimeType
+
+# Decoding spool class (Base64 or Quoted-Printable body decoded line by line directly to the file)
+# Only leading decoded bytes are kept in memory (for type checks); close() returns them.
+class DecodingSpool:
+	def __init__(self, fileName, transferEncoding = "base64"):
+		self.fileName = fileName
+		self.base64 = (transferEncoding == "base64")
+		self.outFile = open(fileName, "wb")
+		self.head = b""
+		self.pending = []
+		self.pendingSize = 0
+		self.lineBreak = False
+		return
+
+	# Procedure for writing decoded data to the file (and keeping leading bytes)
+	def output(self, decoded):
+		self.outFile.write(decoded)
+
+		if len(self.head) < SNIFF_SIZE:
+			self.head += decoded[0:SNIFF_SIZE - len(self.head)]
+
+		return
+
+	# Procedure for decoding gathered Base64 lines (only full 4-character groups, unless it's the end of the body)
+	def decodeBase64(self, final = False):
+		chunk = b"".join(self.pending)
+
+		if final:
+			usable = len(chunk)
+		else:
+			usable = len(chunk) - (len(chunk) % 4)
+
+		# Wrong padding at the end raises an error, the same as base64.b64decode does
+		self.output(binascii.a2b_base64(chunk[:usable]))
+		self.pending = [chunk[usable:]]
+		self.pendingSize = len(chunk) - usable
+
+		return
+
+	# Procedure for writing next line of the encoded body
+	def write(self, line):
+		if self.base64:
+			# Get rid of white spaces and decode in chunks
+			line = b"".join(line.split())
+			self.pending += [line]
+			self.pendingSize += len(line)
+
+			if self.pendingSize >= CHUNK_SIZE:
+				self.decodeBase64()
+
+		else:
+			# Lines are joined by new lines, unless previous one ended with a soft line break
+			text = line.rstrip(b"\r\n").decode("latin1")
+
+			if self.lineBreak:
+				self.output(b"\n")
+
+			self.output(email.quoprimime.body_decode(text).encode("latin1"))
+			self.lineBreak = not text.rstrip().endswith("=")
+
+		return
+
+	# Function for finishing decoding (returns leading decoded bytes)
+	def close(self):
+		try:
+			if self.base64 and (self.pendingSize > 0):
+				self.decodeBase64(True)
+
+		finally:
+			self.outFile.close()
+
+		return self.head
+
+# Function for reading (spooled) file back to the memory and removing it
+def readAndRemove(fileName):
+	inFile = open(fileName, "rb")
+	data = inFile.read()
+	inFile.close()
+	os.remove(fileName)
+	return data
 
 # Simple main type extractor from mime type got from file command
 def getMainType(mimeType):
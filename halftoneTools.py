@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Halftoning tools (8-bit grayscale page rasters to bilevel ones, method chosen by the page contents)
+#
+# Methods:
+#   "threshold"       - global threshold chosen by Otsu's method (clean text scans and drawings),
+#   "adaptive"        - threshold following the local mean (scans with shading or colored paper),
+#   "bayer"           - ordered dithering with 8x8 Bayer matrix (photos; fastest, regular pattern without diffusion worms),
+#   "floyd-steinberg" - error diffusion (photos; the same as pgmtopbm and earlier versions of the relay),
+#   "auto"            - threshold, adaptive or chosen photo method, depending on the page histogram
+#
+# Dithered text scans are encoded very poorly by G3 (every dot of the noise costs bits) and take
+# much longer to send, so text-like pages are thresholded and only photos are dithered.
+# Everything is done by Pillow's C operations (point tables, box blur, channel operations),
+# never pixel by pixel in Python.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import functools
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageFilter
+
+
+# Methods (the first ones can be chosen by auto, photo method is chosen in the settings)
+METHODS = ["threshold", "adaptive", "bayer", "floyd-steinberg"]
+PHOTO_METHODS = ["bayer", "floyd-steinberg"]
+
+# Gray levels counted as middle tones (neither paper nor ink)
+MIDDLE_LOW = 48
+MIDDLE_HIGH = 208
+
+# Pages with no more middle tones than that are thresholded globally
+TEXT_MIDDLE_FRACTION = 0.1
+
+# Pages with ink and paper separable at least that well (Otsu's between-class to total variance ratio) are
+# thresholded adaptively (text on shaded or colored paper; photos are much below that, usually 0.4 - 0.7)
+SEPARABILITY = 0.85
+
+# Adaptive threshold: radius of the local mean, how much darker than the mean ink has to be
+# and reduction of the page the mean is calculated on (mean is smooth, so it's much faster that way)
+ADAPTIVE_RADIUS = 16
+ADAPTIVE_OFFSET = 12
+ADAPTIVE_REDUCTION = 4
+
+# 8x8 Bayer matrix (dithering order of the cells)
+BAYER_MATRIX = [	[0, 32, 8, 40, 2, 34, 10, 42],
+			[48, 16, 56, 24, 50, 18, 58, 26],
+			[12, 44, 4, 36, 14, 46, 6, 38],
+			[60, 28, 52, 20, 62, 30, 54, 22],
+			[3, 35, 11, 43, 1, 33, 9, 41],
+			[51, 19, 59, 27, 49, 17, 57, 25],
+			[15, 47, 7, 39, 13, 45, 5, 37],
+			[63, 31, 55, 23, 61, 29, 53, 21]	]
+
+
+# Function for Otsu's method: (threshold level maximizing variance between ink and paper, separability of them from 0 to 1)
+def otsu(histogram):
+	total = sum(histogram)
+	totalSum = sum(level * histogram[level] for level in range(256))
+	darkCount = 0
+	darkSum = 0
+	bestLevel = 127
+	bestVariance = 0
+
+	for level in range(256):
+		darkCount += histogram[level]
+		darkSum += level * histogram[level]
+
+		if darkCount == 0:
+			continue
+
+		lightCount = total - darkCount
+
+		if lightCount == 0:
+			break
+
+		difference = darkSum / darkCount - (totalSum - darkSum) / lightCount
+		variance = darkCount * lightCount * difference * difference
+
+		if variance > bestVariance:
+			bestVariance = variance
+			bestLevel = level
+
+	# Between-class variance divided by the total variance (both multiplied by total squared)
+	mean = totalSum / max(1, total)
+	totalVariance = total * sum(histogram[level] * (level - mean) * (level - mean) for level in range(256))
+
+	if totalVariance == 0:
+		return bestLevel, 0
+
+	return bestLevel, bestVariance / totalVariance
+
+# Function for calculating global threshold by Otsu's method
+def otsuThreshold(histogram):
+	return otsu(histogram)[0]
+
+# Function for getting histogram statistics: (fraction of middle tones, separability of ink and paper)
+def histogramStatistics(histogram):
+	middle = sum(histogram[MIDDLE_LOW:MIDDLE_HIGH + 1]) / max(1, sum(histogram))
+	return middle, otsu(histogram)[1]
+
+# Function for choosing method for the page (only the part of the page that is not white is taken into account)
+def chooseMethod(page, photoMethod = "floyd-steinberg"):
+	box = PIL.ImageChops.invert(page).getbbox()
+
+	# Empty page
+	if box == None:
+		return "threshold"
+
+	middle, separability = histogramStatistics(page.crop(box).histogram())
+
+	if middle <= TEXT_MIDDLE_FRACTION:
+		return "threshold"
+
+	if separability >= SEPARABILITY:
+		return "adaptive"
+
+	return photoMethod
+
+# Function for thresholding page globally (by Otsu's method if level is not given)
+def thresholdImage(page, level = None):
+	if level == None:
+		level = otsuThreshold(page.histogram())
+
+	return page.point(lambda value: 255 if value > level else 0, "1")
+
+# Function for thresholding page by the local mean (pixels darker than their surroundings become black)
+# Pixels darker than the global (Otsu's) threshold are black too, so big areas of ink don't become hollow.
+# Only the part of the page that is not white is thresholded, so the edge of the shaded paper next to
+# the white margin doesn't become a black line.
+def adaptiveThreshold(page, radius = ADAPTIVE_RADIUS, offset = ADAPTIVE_OFFSET):
+	result = PIL.Image.new("1", page.size, 1)
+	box = PIL.ImageChops.invert(page).getbbox()
+
+	if box == None:
+		return result
+
+	content = page.crop(box)
+	reduction = max(1, min(ADAPTIVE_REDUCTION, content.width, content.height, radius))
+	mean = content.reduce(reduction).filter(PIL.ImageFilter.BoxBlur(radius / reduction)).resize(content.size, PIL.Image.Resampling.BILINEAR)
+	level = otsuThreshold(content.histogram())
+
+	# content - mean + offset (clipped at 0): zero means ink
+	local = PIL.ImageChops.subtract(content, mean, 1.0, offset).point(lambda value: 255 if value > 0 else 0, "1")
+	globalInk = content.point(lambda value: 255 if value > level else 0, "1")
+
+	result.paste(PIL.ImageChops.logical_and(local, globalInk), box[:2])
+
+	return result
+
+# Function for getting Bayer threshold map of the chosen size (the matrix tiled over the page; cached, pages are mostly the same size)
+@functools.lru_cache(maxsize = 8)
+def bayerMap(size):
+	cells = PIL.Image.new("L", (8, 8))
+	cells.putdata([int((value + 0.5) * 256 / 64) for row in BAYER_MATRIX for value in row])
+
+	# Tile by doubling (just a few pastes instead of one for every cell)
+	tiled = cells
+
+	while (tiled.width < size[0]) or (tiled.height < size[1]):
+		doubled = PIL.Image.new("L", (tiled.width * 2, tiled.height * 2))
+
+		for position in [(0, 0), (tiled.width, 0), (0, tiled.height), (tiled.width, tiled.height)]:
+			doubled.paste(tiled, position)
+
+		tiled = doubled
+
+	return tiled.crop((0, 0, size[0], size[1]))
+
+# Function for ordered dithering (pixel is white if it's lighter than its cell of the Bayer matrix)
+def bayerDither(page):
+	difference = PIL.ImageChops.subtract(page, bayerMap(page.size))
+	return difference.point(lambda value: 255 if value > 0 else 0, "1")
+
+# Function for error diffusion dithering (Floyd-Steinberg, as pgmtopbm does)
+def floydSteinbergDither(page):
+	return page.convert("1")
+
+# Function for converting page to bilevel by the chosen method (returns bilevel page and method used)
+def halftone(page, method = "auto", photoMethod = "floyd-steinberg"):
+	if page.mode == "1":
+		return page, "threshold"
+
+	if page.mode != "L":
+		page = page.convert("L")
+
+	if method == "auto":
+		method = chooseMethod(page, photoMethod)
+
+	if method == "threshold":
+		return thresholdImage(page), method
+
+	elif method == "adaptive":
+		return adaptiveThreshold(page), method
+
+	elif method == "bayer":
+		return bayerDither(page), method
+
+	return floydSteinbergDither(page), "floyd-steinberg"
@@ -2,22 +2,93 @@
 
 # HTML tools for converting HTML to plain text
 #
-# by Magnetic-Fox, 13.07.2024 - 20.05.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn
 
 import html.parser
 
 
-# Great HTML to text part found on Stack Overflow
+# Tags breaking the line (before and after them)
+BLOCK_TAGS = {	"address", "article", "aside", "blockquote", "center", "dd", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+		"footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "pre",
+		"section", "table", "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul"	}
+
+# Tags which content is not a text
+SKIPPED_TAGS = {"script", "style"}
+
+
+# Single pass HTML to text filter (output is collected in a list and joined once)
 class HTMLFilter(html.parser.HTMLParser):
-	text = ""
+	def __init__(self):
+		super().__init__()
+		self.parts = []
+		self.skipDepth = 0
+		self.lineStart = True
+		return
+
+	# Procedure for breaking the line (force makes it break even if it's broken already)
+	def newLine(self, force = False):
+		if force or (not self.lineStart):
+			self.parts += ["\n"]
+			self.lineStart = True
+
+		return
+
+	def handle_starttag(self, tag, attrs):
+		if tag in SKIPPED_TAGS:
+			self.skipDepth += 1
+		elif tag == "br":
+			self.newLine(True)
+		elif tag in BLOCK_TAGS:
+			self.newLine()
+
+		return
+
+	def handle_endtag(self, tag):
+		if tag in SKIPPED_TAGS:
+			if self.skipDepth > 0:
+				self.skipDepth -= 1
+		elif tag == "p":
+			self.newLine(True)
+		elif tag in BLOCK_TAGS:
+			self.newLine()
+
+		return
 
 	def handle_data(self, data):
-		self.text += data
+		if (self.skipDepth == 0) and (data != ""):
+			self.parts += [data]
+			self.lineStart = data.endswith("\n")
+
+		return
+
+	@property
+	def text(self):
+		return "".join(self.parts)
 
 # Simple HTML to plain text converter
 def HTMLToText(inputData):
+	# Prepare converter and feed it with input data (closing flushes the text after the last tag)
+	converter = HTMLFilter()
+	converter.feed(inputData)
+	converter.close()
+
+	# Return converted text
+	return converter.text
+
+
+# Old (quadratic) converter kept as a reference:
+
+# Great HTML to text part found on Stack Overflow
+class HTMLFilterLegacy(html.parser.HTMLParser):
+	text = ""
+
+	def handle_data(self, data):
+		self.text += data
+
+# Simple HTML to plain text converter (legacy)
+def HTMLToTextLegacy(inputData):
 	# Replace any <br> and <br /> (in all cases) to the new lines, because this simple HTMLFilter can't do this automatically
 	inputData = inputData.replace("<br>", "\n").replace("<br />", "\n")
 	inputData = inputData.replace("<Br>", "\n").replace("<Br />", "\n")
@@ -50,7 +121,7 @@ def HTMLToText(inputData):
 			posStart += 1
 
 	# Prepare converter and feed it with input data
-	converter = HTMLFilter()
+	converter = HTMLFilterLegacy()
 	converter.feed(inputData)
 
 	# Return automatically converted text
@@ -2,10 +2,11 @@
 
 # Simple (and temporary) image tools
 #
-# by Magnetic-Fox, 13.07.2024 - 06.01.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
+import io
 import PIL.Image
 
 
@@ -19,3 +20,13 @@ def quickImageFormat(data):
 # Very quick and simple "if-we-have-an-image" test
 def quickImageTest(data):
 	return quickImageFormat(data) != ""
+
+# Very simple get image format (if possible) utility (file version)
+def quickImageFileFormat(fileName):
+	try:
+		img = PIL.Image.open(fileName)
+		imageFormat = img.format.lower()
+		img.close()
+		return imageFormat
+	except:
+		return ""
@@ -2,22 +2,40 @@
 
 # Logger tools
 #
-# by Magnetic-Fox, 13.07.2024 - 06.01.2026
+# System logger is fed by the queue listener thread, so slow (or missing) syslog socket doesn't
+# stop message processing. Log messages are passed as parts and joined only when the record is
+# really written (and only if its level is enabled). Records carry context of the processed
+# message (message id, destination, processing stage and part number) set by setContext().
+#
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
-import gzip
+import os
+import queue
 import logging
+import threading
+import contextvars
 import logging.handlers
 
 
-# Simple logger preparation function
+# Log levels which can be chosen in the settings
+LEVELS = {"error": logging.ERROR, "warning": logging.WARNING, "notice": logging.INFO, "info": logging.INFO, "debug": logging.DEBUG}
+
+# Context fields (record attribute, label in the log line)
+CONTEXT_FIELDS = [("messageId", "id"), ("destination", "to"), ("stage", "stage"), ("part", "part")]
+
+# Context of the currently processed message (separate for every thread)
+logContext = contextvars.ContextVar("logContext", default = {})
+
+
+# Simple logger preparation function (handler is added only once)
 def prepareLogger(loggerName = __name__, loggerAddress = "/dev/log"):
 	logger = logging.getLogger(loggerName)
-	handler = logging.handlers.SysLogHandler(address = loggerAddress)
-
 	logger.setLevel(logging.INFO)
-	logger.addHandler(handler)
+
+	if logger.handlers == []:
+		logger.addHandler(logging.handlers.SysLogHandler(address = loggerAddress))
 
 	return logger
 
@@ -26,10 +44,129 @@ def logInfo(logger, message, prefix = ""):
 	logger.info(prefix + message)
 	return
 
-# Simple data to GZip logger
-def logToCompressedFile(filename, data):
-	gLogFile = gzip.open(filename, "at")
-	gLogFile.write(data)
-	gLogFile.write("\n")
-	gLogFile.close()
+# Lazy log message class (parts are joined when the record is formatted)
+class LazyMessage:
+	def __init__(self, prefix, parts):
+		self.prefix = prefix
+		self.parts = parts
+		return
+
+	def __str__(self):
+		return self.prefix + "".join(str(part) for part in self.parts)
+
+# Procedure for logging message parts (nothing is built if level is not enabled)
+def logParts(logger, level, prefix, parts):
+	if (logger != None) and logger.isEnabledFor(level):
+		logger.log(level, LazyMessage(prefix, parts))
+
 	return
+
+# Function for setting context fields for records logged by the current thread (returns token for resetContext)
+def setContext(**fields):
+	context = dict(logContext.get())
+	context.update(fields)
+	return logContext.set(context)
+
+# Procedure for restoring context from before setContext call
+def resetContext(token):
+	logContext.reset(token)
+	return
+
+# Filter adding context fields to the records (runs in the logging thread, before queueing)
+class ContextFilter(logging.Filter):
+	def filter(self, record):
+		context = logContext.get()
+
+		for field, label in CONTEXT_FIELDS:
+			setattr(record, field, context.get(field))
+
+		return True
+
+# Formatter adding context fields to the message (only those which are set)
+class ContextFormatter(logging.Formatter):
+	def format(self, record):
+		message = record.getMessage()
+		fields = []
+
+		for field, label in CONTEXT_FIELDS:
+			value = getattr(record, field, None)
+
+			if value != None:
+				fields += [label + "=" + str(value)]
+
+		if fields != []:
+			message += " [" + " ".join(fields) + "]"
+
+		return message
+
+# Queue handler passing records as they are (formatting is left to the listener thread)
+class LazyQueueHandler(logging.handlers.QueueHandler):
+	def prepare(self, record):
+		return record
+
+# Queue logger state class (one per process)
+class QueueLoggerState:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.logger = None
+		self.handler = None
+		self.target = None
+		self.listener = None
+		return
+
+queueLogger = QueueLoggerState()
+
+# Function for preparing logger writing to the system logger through the queue (does it only once)
+def prepareQueueLogger(loggerName = __name__, loggerAddress = "/dev/log", level = logging.INFO):
+	logger = logging.getLogger(loggerName)
+	logger.setLevel(level)
+
+	with queueLogger.lock:
+		if queueLogger.handler == None:
+			records = queue.SimpleQueue()
+
+			queueLogger.target = logging.handlers.SysLogHandler(address = loggerAddress)
+			queueLogger.target.setFormatter(ContextFormatter())
+
+			queueLogger.handler = LazyQueueHandler(records)
+			queueLogger.handler.addFilter(ContextFilter())
+			logger.addHandler(queueLogger.handler)
+			logger.propagate = False
+			queueLogger.logger = logger
+
+			queueLogger.listener = logging.handlers.QueueListener(records, queueLogger.target)
+			queueLogger.listener.start()
+
+	return logger
+
+# Procedure for stopping listener (all queued records are written; to be called before exiting)
+# Queue handler is detached too, so records are not left in the queue nobody reads and the next
+# prepareQueueLogger call starts everything again.
+def stopQueueLogger():
+	with queueLogger.lock:
+		if queueLogger.listener != None:
+			queueLogger.listener.stop()
+			queueLogger.listener = None
+
+		if queueLogger.handler != None:
+			queueLogger.logger.removeHandler(queueLogger.handler)
+			queueLogger.logger.propagate = True
+			queueLogger.target.close()
+			queueLogger.logger = None
+			queueLogger.handler = None
+			queueLogger.target = None
+
+	return
+
+# Procedure for starting new listener in the forked child (listener thread doesn't survive fork)
+def restartQueueLogger():
+	queueLogger.lock = threading.Lock()
+
+	if queueLogger.handler != None:
+		queueLogger.handler.queue = queue.SimpleQueue()
+		queueLogger.listener = logging.handlers.QueueListener(queueLogger.handler.queue, queueLogger.target)
+		queueLogger.listener.start()
+
+	return
+
+os.register_at_fork(after_in_child = restartQueueLogger)
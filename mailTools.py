@@ -2,7 +2,7 @@
 
 # Mail tools
 #
-# by Magnetic-Fox, 13.07.2024 - 06.01.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
@@ -48,3 +48,12 @@ def tryDecodeHeader(header):
 		return decodeHeader(header)
 	except:
 		return None
+
+# Function for converting non-encoded payload (got from bytes parser) to the text using chosen encoding
+def payloadToText(payload, encoding = "utf-8"):
+	rawData = payload.encode("ascii", "surrogateescape")
+
+	try:
+		return rawData.decode(encoding, "replace")
+	except LookupError:
+		return rawData.decode("utf-8", "replace")
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+
+# Metrics tools (per-stage timing, page and byte counters, peak memory and running histograms)
+#
+# Every processed message gets its metrics object (activated for the current context, so the
+# conversion pipeline and worker threads can reach it by current()). When metrics are turned off,
+# a null object with the same interface is used, so measurement points cost just a method call.
+#
+# Metrics are exported after every message as:
+#   "prometheus" - text file for the node exporter's textfile collector (running totals and
+#                  histograms are kept in the state file next to it and merged under the lock),
+#   "jsonl"      - one JSON object per message appended to the file.
+#
+# Stages: ingest, parse, sniff, html, normalize, render_text, cut, split, convert_image, halftone, encode, blank, spool
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import json
+import time
+import fcntl
+import threading
+import tracemalloc
+import contextvars
+
+
+# Metric names prefix
+PREFIX = "mail2fax_"
+
+# Histogram buckets (upper bounds) for every histogram family
+BUCKETS = {
+	"message_seconds": [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120],
+	"stage_seconds": [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],
+	"message_pages": [1, 2, 3, 5, 10, 20, 50, 100],
+	"peak_memory_bytes": [1048576, 4194304, 16777216, 67108864, 268435456, 1073741824]
+}
+
+# Descriptions of the exported metrics
+HELP = {
+	"messages_total": "Processed messages by result.",
+	"pages_total": "Fax pages passed to the spool.",
+	"bytes_in_total": "Bytes of the received messages.",
+	"bytes_out_total": "Bytes of the fax pages passed to the spool.",
+	"message_seconds": "Wall time of the message processing.",
+	"stage_seconds": "Time spent in the processing stages (summed over worker threads).",
+	"message_pages": "Fax pages per message.",
+	"peak_memory_bytes": "Peak memory allocated by Python while processing the message.",
+	"halftone_pages_total": "Image pages by the bilevel conversion method.",
+	"halftone_bytes_total": "Bytes of the G3 encoded image pages by the bilevel conversion method."
+}
+
+
+# Stage timer class (context manager adding elapsed time to the stage)
+class StageTimer:
+	def __init__(self, metrics, name):
+		self.metrics = metrics
+		self.name = name
+		self.start = 0
+		return
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, exceptionType, exception, traceback):
+		self.metrics.addTime(self.name, time.perf_counter() - self.start)
+		return False
+
+# Messages traced at the moment (tracemalloc is process-wide, so its peak belongs to the message only if it's processed alone)
+tracedMessages = set()
+tracingLock = threading.Lock()
+
+# Procedure for starting memory tracing for the message (messages processed at the same time are marked as sharing the peak)
+def startTracing(metrics):
+	with tracingLock:
+		if tracedMessages == set():
+			tracemalloc.start()
+			tracemalloc.reset_peak()
+		else:
+			metrics.memoryShared = True
+
+			for other in tracedMessages:
+				other.memoryShared = True
+
+		tracedMessages.add(metrics)
+
+	return
+
+# Function for stopping memory tracing for the message (returns peak memory or None if it was shared with other messages)
+# Tracing is stopped when the last traced message finishes.
+def stopTracing(metrics):
+	with tracingLock:
+		peakMemory = None
+
+		if metrics in tracedMessages:
+			if not metrics.memoryShared:
+				peakMemory = tracemalloc.get_traced_memory()[1]
+
+			tracedMessages.discard(metrics)
+
+			if tracedMessages == set():
+				tracemalloc.stop()
+
+	return peakMemory
+
+# Message metrics class
+class MessageMetrics:
+	def __init__(self, traceMemory = False):
+		self.lock = threading.Lock()
+		self.started = time.perf_counter()
+		self.stages = {}
+		self.counters = {"pages": 0, "bytes_in": 0, "bytes_out": 0}
+		self.halftone = {}
+		self.traceMemory = traceMemory
+		self.peakMemory = None
+		self.memoryShared = False
+
+		if traceMemory:
+			startTracing(self)
+
+		return
+
+	# Function for measuring the stage (to be used with "with" statement)
+	def stage(self, name):
+		return StageTimer(self, name)
+
+	# Procedure for adding time to the stage
+	def addTime(self, name, seconds):
+		with self.lock:
+			self.stages[name] = self.stages.get(name, 0) + seconds
+
+		return
+
+	# Procedure for adding value to the counter
+	def add(self, name, value):
+		with self.lock:
+			self.counters[name] = self.counters.get(name, 0) + value
+
+		return
+
+	# Procedure for adding sizes of the files to the counter
+	def addFileSizes(self, name, fileNames):
+		self.add(name, sum(os.path.getsize(fileName) for fileName in fileNames))
+		return
+
+	# Procedure for counting image page converted to bilevel by the method (and its G3 encoded size)
+	def addHalftone(self, method, size):
+		with self.lock:
+			counters = self.halftone.setdefault(method, {"pages": 0, "bytes": 0})
+			counters["pages"] += 1
+			counters["bytes"] += size
+
+		return
+
+	# Generator measuring time spent on getting items from the iterator
+	def timeIterator(self, name, iterator):
+		iterator = iter(iterator)
+
+		while True:
+			start = time.perf_counter()
+
+			try:
+				item = next(iterator)
+			except StopIteration:
+				self.addTime(name, time.perf_counter() - start)
+				return
+
+			self.addTime(name, time.perf_counter() - start)
+			yield item
+
+	# Function for finishing measurement (returns record describing the message)
+	def finish(self, result = True, messageId = "", destination = ""):
+		if self.traceMemory:
+			self.peakMemory = stopTracing(self)
+
+		with self.lock:
+			record = {	"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+					"message_id": messageId,
+					"destination": destination,
+					"result": "ok" if result else "failed",
+					"wall_seconds": round(time.perf_counter() - self.started, 6),
+					"stages": {name: round(self.stages[name], 6) for name in self.stages},
+					"pages": self.counters["pages"],
+					"bytes_in": self.counters["bytes_in"],
+					"bytes_out": self.counters["bytes_out"]	}
+
+			if self.halftone != {}:
+				record["halftone"] = {method: dict(self.halftone[method]) for method in self.halftone}
+
+		if self.peakMemory != None:
+			record["peak_memory"] = self.peakMemory
+
+		return record
+
+# Null stage timer (does nothing)
+class NullTimer:
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exceptionType, exception, traceback):
+		return False
+
+# Null metrics class (used when metrics are turned off)
+class NullMetrics:
+	timer = NullTimer()
+
+	def stage(self, name):
+		return self.timer
+
+	def addTime(self, name, seconds):
+		return
+
+	def add(self, name, value):
+		return
+
+	def addFileSizes(self, name, fileNames):
+		return
+
+	def addHalftone(self, method, size):
+		return
+
+	def timeIterator(self, name, iterator):
+		return iterator
+
+	def finish(self, result = True, messageId = "", destination = ""):
+		return None
+
+NULL_METRICS = NullMetrics()
+
+# Metrics of the message processed in the current context
+currentMetrics = contextvars.ContextVar("currentMetrics", default = NULL_METRICS)
+
+
+# Function for starting metrics for the new message (null metrics if turned off)
+def startMessage(settings):
+	if not settings.METRICS_ENABLED:
+		return NULL_METRICS
+
+	return MessageMetrics(settings.METRICS_TRACE_MEMORY)
+
+# Function for activating metrics in the current context (returns token for deactivate)
+def activate(metrics):
+	return currentMetrics.set(metrics)
+
+# Procedure for deactivating metrics
+def deactivate(token):
+	currentMetrics.reset(token)
+	return
+
+# Function for getting metrics of the message processed in the current context
+def current():
+	return currentMetrics.get()
+
+
+# Function for preparing empty histogram
+def newHistogram(family):
+	return {"counts": [0] * len(BUCKETS[family]), "sum": 0, "count": 0}
+
+# Procedure for observing value in the histogram (bucket counts are not cumulative in the state)
+def observe(histogram, family, value):
+	for bucket in range(len(BUCKETS[family])):
+		if value <= BUCKETS[family][bucket]:
+			histogram["counts"][bucket] += 1
+			break
+
+	histogram["sum"] += value
+	histogram["count"] += 1
+	return
+
+# Procedure for merging message record into the running state
+def mergeRecord(state, record):
+	messages = state.setdefault("messages", {})
+	messages[record["result"]] = messages.get(record["result"], 0) + 1
+
+	for counter in ["pages", "bytes_in", "bytes_out"]:
+		state[counter] = state.get(counter, 0) + record[counter]
+
+	halftone = state.setdefault("halftone", {})
+
+	for method in record.get("halftone", {}):
+		counters = halftone.setdefault(method, {"pages": 0, "bytes": 0})
+		counters["pages"] += record["halftone"][method]["pages"]
+		counters["bytes"] += record["halftone"][method]["bytes"]
+
+	histograms = state.setdefault("histograms", {})
+
+	observe(histograms.setdefault("message_seconds", newHistogram("message_seconds")), "message_seconds", record["wall_seconds"])
+	observe(histograms.setdefault("message_pages", newHistogram("message_pages")), "message_pages", record["pages"])
+
+	if "peak_memory" in record:
+		observe(histograms.setdefault("peak_memory_bytes", newHistogram("peak_memory_bytes")), "peak_memory_bytes", record["peak_memory"])
+
+	stages = state.setdefault("stages", {})
+
+	for name in record["stages"]:
+		observe(stages.setdefault(name, newHistogram("stage_seconds")), "stage_seconds", record["stages"][name])
+
+	return
+
+# Function for formatting histogram lines in the Prometheus text format
+def histogramLines(name, family, histogram, labels = ""):
+	lines = []
+	cumulative = 0
+
+	for bucket in range(len(BUCKETS[family])):
+		cumulative += histogram["counts"][bucket]
+		lines += [PREFIX + name + "_bucket{" + labels + 'le="' + str(BUCKETS[family][bucket]) + '"} ' + str(cumulative)]
+
+	lines += [PREFIX + name + "_bucket{" + labels + 'le="+Inf"} ' + str(histogram["count"])]
+
+	if labels != "":
+		labels = "{" + labels.rstrip(",") + "}"
+
+	lines += [PREFIX + name + "_sum" + labels + " " + str(round(histogram["sum"], 6))]
+	lines += [PREFIX + name + "_count" + labels + " " + str(histogram["count"])]
+
+	return lines
+
+# Function for formatting running state in the Prometheus text format
+def prometheusText(state):
+	lines = []
+
+	def header(name, metricType):
+		lines.extend(["# HELP " + PREFIX + name + " " + HELP[name], "# TYPE " + PREFIX + name + " " + metricType])
+
+	header("messages_total", "counter")
+	for result in sorted(state.get("messages", {})):
+		lines += [PREFIX + 'messages_total{result="' + result + '"} ' + str(state["messages"][result])]
+
+	for counter in ["pages", "bytes_in", "bytes_out"]:
+		header(counter + "_total", "counter")
+		lines += [PREFIX + counter + "_total " + str(state.get(counter, 0))]
+
+	if state.get("halftone", {}) != {}:
+		for counter in ["pages", "bytes"]:
+			header("halftone_" + counter + "_total", "counter")
+
+			for method in sorted(state["halftone"]):
+				lines += [PREFIX + "halftone_" + counter + '_total{method="' + method + '"} ' + str(state["halftone"][method][counter])]
+
+	histograms = state.get("histograms", {})
+
+	for family in ["message_seconds", "message_pages", "peak_memory_bytes"]:
+		if family in histograms:
+			header(family, "histogram")
+			lines += histogramLines(family, family, histograms[family])
+
+	if state.get("stages", {}) != {}:
+		header("stage_seconds", "histogram")
+
+		for name in sorted(state["stages"]):
+			lines += histogramLines("stage_seconds", "stage_seconds", state["stages"][name], 'stage="' + name + '",')
+
+	return "\n".join(lines) + "\n"
+
+# Procedure for exporting message record to the Prometheus text file (state is merged under the lock)
+def exportPrometheus(record, fileName):
+	lock = open(fileName + ".lock", "a")
+
+	try:
+		fcntl.flock(lock, fcntl.LOCK_EX)
+
+		try:
+			stateFile = open(fileName + ".state", "r")
+			state = json.load(stateFile)
+			stateFile.close()
+
+		except (OSError, ValueError):
+			state = {}
+
+		mergeRecord(state, record)
+
+		# Both files are replaced at once, so collector never reads half-written file
+		for targetName, content in [(fileName + ".state", json.dumps(state)), (fileName, prometheusText(state))]:
+			outFile = open(targetName + ".tmp", "w")
+			outFile.write(content)
+			outFile.close()
+			os.replace(targetName + ".tmp", targetName)
+
+	finally:
+		lock.close()
+
+	return
+
+# Procedure for exporting message record as JSON line (one write, so lines of many relays don't mix)
+def exportJSONLine(record, fileName):
+	outFile = open(fileName, "a")
+	fcntl.flock(outFile, fcntl.LOCK_EX)
+
+	try:
+		outFile.write(json.dumps(record) + "\n")
+
+	finally:
+		outFile.close()
+
+	return
+
+# Procedure for exporting message record in the chosen format
+def export(record, settings):
+	if record == None:
+		return
+
+	directory = os.path.dirname(os.path.abspath(settings.METRICS_FILE))
+	os.makedirs(directory, exist_ok = True)
+
+	if settings.METRICS_FORMAT == "jsonl":
+		exportJSONLine(record, settings.METRICS_FILE)
+	else:
+		exportPrometheus(record, settings.METRICS_FILE)
+
+	return
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Packing tools (small images laid out together on shared fax pages)
+#
+# Every image normally gets its own page, resized to the page width - even a thumbnail or a signature logo,
+# which is just enlarged and sent as a whole page. Small images can be packed instead: each one keeps its
+# natural size (source pixels enlarged twice - fax resolution is about twice the screen one) and images are
+# laid out in the attachment order on shelves (rows), left to right and top to bottom, as many as fit the page.
+#
+# Image is small if its natural size takes no more than the chosen fraction of the page (between margins).
+# Bigger images may be shrunk to that fraction, but not below the chosen (still readable) scale.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import math
+import PIL.Image
+import tiffTools
+import halftoneTools
+
+
+# Fax pixels per source pixel of the packed image (204 DPI fax page versus about 100 DPI screen)
+NATURAL_SCALE = 2
+
+# Space between packed images (in pixels)
+GAP = 16
+
+
+# Placement class (packed image on the page: item number, position and size)
+class Placement:
+	def __init__(self, number, x, y, width, height):
+		self.number = number
+		self.x = x
+		self.y = y
+		self.width = width
+		self.height = height
+		return
+
+# Packed page class (page height and placements of the images on it)
+class PackedPage:
+	def __init__(self):
+		self.height = 0
+		self.placements = []
+		return
+
+# Function for calculating size of the packed image (or None if image is too big to be packed)
+# Minimum scale is relative to the natural size (0.5 - one fax pixel for every source pixel).
+def packedSize(width, height, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, minScale = 0.5, maxFraction = 0.5):
+	contentWidth = pageWidth - marginLeft - marginRight
+
+	# Natural size has to fit between margins and in the page height
+	scale = min(NATURAL_SCALE, contentWidth / width, pageHeight / height)
+
+	# Too big images are shrunk to the chosen fraction of the page
+	fraction = (width * scale) * (height * scale) / (contentWidth * pageHeight)
+
+	if fraction > maxFraction:
+		scale *= math.sqrt(maxFraction / fraction)
+
+	# Image would be too small to be read - it gets its own page
+	if scale < minScale * NATURAL_SCALE:
+		return None
+
+	return max(1, int(width * scale)), max(1, int(height * scale))
+
+# Function for laying out images of the chosen sizes on the pages (shelves; order of the images is kept)
+def shelfLayout(sizes, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, gap = GAP):
+	contentWidth = pageWidth - marginLeft - marginRight
+	pages = []
+	page = None
+	x = 0
+	shelfTop = 0
+	shelfHeight = 0
+
+	for number in range(len(sizes)):
+		width, height = sizes[number]
+
+		# Next shelf if image doesn't fit in the current one
+		if (page != None) and (x > 0) and (x + width > contentWidth):
+			shelfTop += shelfHeight + gap
+			x = 0
+			shelfHeight = 0
+
+		# Next page if image doesn't fit below the previous shelves
+		if (page == None) or (shelfTop + height > pageHeight):
+			page = PackedPage()
+			pages += [page]
+			x = 0
+			shelfTop = 0
+			shelfHeight = 0
+
+		page.placements += [Placement(number, marginLeft + x, shelfTop, width, height)]
+		page.height = max(page.height, shelfTop + height)
+		x += width + gap
+		shelfHeight = max(shelfHeight, height)
+
+	return pages
+
+# Function for rendering packed page (bilevel; every image is halftoned on its own, so logos and photos get their own methods)
+# Images are loaded by the given function (number -> image or None if it couldn't be loaded; loaded image is closed here).
+# Returns bilevel page and list of methods used (None for images which couldn't be loaded).
+def renderPackedPage(packedPage, loadImage, pageWidth = 1728, method = "auto", photoMethod = "floyd-steinberg"):
+	page = PIL.Image.new("1", (pageWidth, packedPage.height), 1)
+	methods = []
+
+	for placement in packedPage.placements:
+		img = loadImage(placement.number, (placement.width, placement.height))
+
+		if img == None:
+			methods += [None]
+			continue
+
+		try:
+			resized = tiffTools.resizeImage(tiffTools.flattenImage(img), (placement.width, placement.height))
+		finally:
+			img.close()
+
+		bilevel, used = halftoneTools.halftone(resized, method, photoMethod)
+		page.paste(bilevel, (placement.x, placement.y))
+		methods += [used]
+
+	return page, methods
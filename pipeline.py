@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+
+# Conversion pipeline for message parts (texts and images) to the G3 TIFF pages
+#
+# Pipeline doesn't change current working directory and doesn't use any global state,
+# so it's safe to call it from many threads at once. Part payloads and page rasters
+# are passed in memory - only the final pages are written to the chosen directory.
+#
+# Items to convert are tuples: (kind, payload, spoolFile), where:
+#   kind is "text" (payload is a string) or "image" (payload is bytes),
+#   spoolFile is a path to the file containing payload (or "" if payload is in memory)
+#
+# If packing is chosen, runs of small images (one after another) are converted together to shared pages.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import io
+import os
+import PIL.Image
+import cutter
+import tiffTools
+import halftoneTools
+import packingTools
+import textRenderer
+import conversionCache
+import metricsTools
+import additionalTools
+
+
+# Page geometry for images (in pixels; fine resolution)
+PAGE_WIDTH = 1728
+PAGE_HEIGHT = 2000
+MARGIN_LEFT = 32
+MARGIN_RIGHT = 32
+
+
+# Function for saving pages as final G3 TIFF files (returns list of file names)
+def savePages(pages, outputPrefix, resolution = 1):
+	metrics = metricsTools.current()
+	fileList = []
+	pageNumber = 1
+
+	for page in pages:
+		fileName = outputPrefix + "-" + str(pageNumber) + ".tiff"
+
+		with metrics.stage("encode"):
+			tiffTools.saveG3TIFF(page, fileName, resolution)
+
+		fileList += [fileName]
+		pageNumber += 1
+
+	return fileList
+
+# Function for writing cached G3 TIFF pages as final files (returns list of file names)
+def writePages(pages, outputPrefix):
+	fileList = []
+	pageNumber = 1
+
+	for page in pages:
+		fileName = outputPrefix + "-" + str(pageNumber) + ".tiff"
+		outFile = open(fileName, "wb")
+		outFile.write(page)
+		outFile.close()
+		fileList += [fileName]
+		pageNumber += 1
+
+	return fileList
+
+# Function for reading final G3 TIFF page file (to put it to the cache)
+def readPage(fileName):
+	inFile = open(fileName, "rb")
+	page = inFile.read()
+	inFile.close()
+	return page
+
+# Function for gathering every parameter affecting image conversion (part of the cache key)
+def imageParameters(settings):
+	return (PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT, 1, settings.UNPACK_MULTI_TIFF, settings.TILE_TALL_IMAGES, settings.TALL_IMAGE_MIN_PAGES, settings.TILE_OVERLAP, settings.HALFTONE_METHOD, settings.HALFTONE_PHOTO_METHOD, tiffTools.RENDERER_VERSION)
+
+# Function for checking if image of the given size is going to be tiled (according to the settings)
+def isTiled(width, height, settings):
+	return settings.TILE_TALL_IMAGES and tiffTools.isTallImage(width, height, PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT, settings.TALL_IMAGE_MIN_PAGES)
+
+# Generator yielding page tasks: (page number, image, tile), where tile is None if image is just fitted on one page
+# Tall images (if tiling is chosen) give one task for every tile, all of them sharing the same image.
+# Pages which couldn't be read (None) give a task with no image.
+def pageTasks(images, settings):
+	pageNumber = 1
+
+	for img in images:
+		if (img != None) and isTiled(img.width, img.height, settings):
+			for tile in tiffTools.imageTiles(img.width, img.height, PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT, settings.TILE_OVERLAP):
+				yield pageNumber, img, tile
+				pageNumber += 1
+
+		else:
+			yield pageNumber, img, None
+			pageNumber += 1
+
+	return
+
+# Text to pages converter using native renderer (falls back to paps and gs if no usable font was found)
+def textToPages(textData, outputPrefix, settings):
+	if settings.TEXT_RENDERER == "native":
+		pages = textRenderer.renderText(textData, settings.TEXT_FONT_NAME, settings.TEXT_FONT_SIZE, settings.TEXT_TOP_MARGIN)
+
+		if pages != None:
+			return pages
+
+	return textToPagesPaps(textData, outputPrefix, settings)
+
+# Text to pages converter (paps and gs render to the intermediate file, then pages are cut in memory)
+def textToPagesPaps(textData, outputPrefix, settings):
+	renderedFile = outputPrefix + "-text.tiff"
+	metrics = metricsTools.current()
+	pages = []
+
+	with metrics.stage("render_text"):
+		tiffTools.textToTIFF(renderedFile, textData, 1, settings.TEXT_FONT_NAME + " " + str(settings.TEXT_FONT_SIZE), settings.TEXT_TOP_MARGIN)
+
+	try:
+		for page in metrics.timeIterator("split", tiffTools.iterateTIFFPages(renderedFile)):
+			with metrics.stage("cut"):
+				cropped = cutter.cropImage(page)
+
+			if cropped == None:
+				cropped = page
+
+			pages += [cropped]
+
+	finally:
+		os.remove(renderedFile)
+
+	return pages
+
+# Image to page files converter (every page of multipage TIFF becomes a fax page if unpacking is chosen)
+# Pages are read lazily and each one is converted and saved as soon as it's read (by the chosen number of worker threads)
+# Tall images are tiled to many pages, converted and saved one page at a time.
+# Returns list of page files, with None for every page that couldn't be read or converted (other pages are kept).
+def imageToPageFiles(payload, spoolFile, outputPrefix, settings, pageWorkers = 1):
+	metrics = metricsTools.current()
+
+	# Page task (page which can't be converted gives None, so one bad page doesn't cost the other ones)
+	def pageTask(task):
+		try:
+			return convertPage(task)
+
+		except Exception:
+			return None
+
+	def convertPage(task):
+		pageNumber, page, tile = task
+		fileName = outputPrefix + "-" + str(pageNumber) + ".tiff"
+
+		if page == None:
+			return None
+
+		with metrics.stage("convert_image"):
+			if tile == None:
+				page = tiffTools.imageToPage(page, PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT)
+			else:
+				page = tiffTools.imageTileToPage(page, tile, PAGE_WIDTH, MARGIN_LEFT, MARGIN_RIGHT)
+
+		with metrics.stage("halftone"):
+			page, method = halftoneTools.halftone(page, settings.HALFTONE_METHOD, settings.HALFTONE_PHOTO_METHOD)
+
+		with metrics.stage("encode"):
+			tiffTools.saveG3TIFF(page, fileName)
+
+		# G3 size by the halftoning method (to see what each of them costs on the line)
+		metrics.addHalftone(method, os.path.getsize(fileName))
+
+		return fileName
+
+	if spoolFile != "":
+		source = spoolFile
+	else:
+		source = payload
+
+	# JPEGs are decoded already reduced to the size needed for the page (or for the tiles)
+	def draft(img):
+		tiffTools.draftForPage(img, PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT, isTiled(img.width, img.height, settings))
+		return
+
+	# Time of reading (and decoding) pages counts as splitting
+	pages = metrics.timeIterator("split", tiffTools.iterateTIFFPages(source, unpack = settings.UNPACK_MULTI_TIFF, draft = draft, skipBroken = True))
+
+	return additionalTools.mapIterator(pageTask, pageTasks(pages, settings), pageWorkers)
+
+# Function for checking result of the image conversion (image is taken as corrupted if none of its pages could be converted)
+def imageResult(fileList):
+	if (fileList != []) and (fileList.count(None) == len(fileList)):
+		return None
+
+	return fileList
+
+# Function for converting one item to the final G3 TIFF pages (pages of the image converted by the chosen number of worker threads)
+# Returns list of page files (None for image pages that couldn't be converted) or None for images that couldn't be read at all
+# (text conversion errors are raised)
+def convertItem(item, outputPrefix, settings, pageWorkers = 1):
+	kind, payload, spoolFile = item
+
+	if kind == "text":
+		return savePages(textToPages(payload, outputPrefix, settings), outputPrefix)
+
+	try:
+		cache = conversionCache.getCache(settings)
+
+		if cache == None:
+			return imageResult(imageToPageFiles(payload, spoolFile, outputPrefix, settings, pageWorkers))
+
+		key = conversionCache.cacheKey(payload, spoolFile, imageParameters(settings))
+		cachedPages = cache.get(key)
+
+		if cachedPages != None:
+			return writePages(cachedPages, outputPrefix)
+
+		fileList = imageToPageFiles(payload, spoolFile, outputPrefix, settings, pageWorkers)
+
+		# Images with pages that couldn't be converted are not cached
+		if None not in fileList:
+			cache.put(key, [readPage(fileName) for fileName in fileList])
+
+		return imageResult(fileList)
+
+	except Exception:
+		return None
+
+# Function for opening image item (payload in memory or spooled to the file)
+def openImage(item):
+	kind, payload, spoolFile = item
+
+	if spoolFile != "":
+		return PIL.Image.open(spoolFile)
+
+	return PIL.Image.open(io.BytesIO(payload))
+
+# Function for getting size of the image item packed with others (None if it's not going to be packed)
+# Only the image header is read. Multipage TIFFs (if unpacked) and images which can't be read are never packed.
+def packedImageSize(item, settings):
+	if item[0] != "image":
+		return None
+
+	try:
+		img = openImage(item)
+
+		try:
+			if settings.UNPACK_MULTI_TIFF and (getattr(img, "n_frames", 1) > 1):
+				return None
+
+			width, height = img.size
+
+		finally:
+			img.close()
+
+	except Exception:
+		return None
+
+	return packingTools.packedSize(width, height, PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT, settings.PACK_MIN_SCALE, settings.PACK_MAX_FRACTION)
+
+# Function for dividing items to conversion units: lists of (item number, packed size or None)
+# Runs of at least two small images become one unit, every other item is a unit on its own.
+def conversionUnits(items, settings):
+	units = []
+	run = []
+
+	for itemNumber in range(len(items)):
+		size = None
+
+		if settings.PACK_SMALL_IMAGES:
+			size = packedImageSize(items[itemNumber], settings)
+
+		if size != None:
+			run += [(itemNumber, size)]
+			continue
+
+		if len(run) == 1:
+			run[0] = (run[0][0], None)
+
+		if run != []:
+			units += [run]
+
+		units += [[(itemNumber, None)]]
+		run = []
+
+	if len(run) == 1:
+		run[0] = (run[0][0], None)
+
+	if run != []:
+		units += [run]
+
+	return units
+
+# Function for gathering every parameter affecting packing (part of the cache key)
+def packingParameters(settings):
+	return (imageParameters(settings), settings.PACK_MIN_SCALE, settings.PACK_MAX_FRACTION, packingTools.NATURAL_SCALE, packingTools.GAP)
+
+# Function for converting packed images to the page files
+# Returns list of results for every image: list of page files (all of them for the first image), [] or None (image couldn't be read)
+def packedToPageFiles(group, outputPrefix, settings):
+	metrics = metricsTools.current()
+	failed = set()
+	fileList = []
+
+	def loadImage(number, size):
+		try:
+			img = openImage(group[number][0])
+		except Exception:
+			failed.add(number)
+			return None
+
+		try:
+			tiffTools.draftForSize(img, size)
+			img.load()
+			return img
+
+		except Exception:
+			img.close()
+			failed.add(number)
+			return None
+
+	# Images are decoded once before the layout (and closed), so the ones that can't be read don't leave holes on the pages
+	with metrics.stage("convert_image"):
+		for number in range(len(group)):
+			img = loadImage(number, group[number][1])
+
+			if img != None:
+				img.close()
+
+	numbers = [number for number in range(len(group)) if number not in failed]
+	pages = packingTools.shelfLayout([group[number][1] for number in numbers], PAGE_WIDTH, PAGE_HEIGHT, MARGIN_LEFT, MARGIN_RIGHT)
+
+	for packedPage in pages:
+		fileName = outputPrefix + "-" + str(len(fileList) + 1) + ".tiff"
+
+		# Placements are numbered within the images that could be read
+		with metrics.stage("convert_image"):
+			page, methods = packingTools.renderPackedPage(packedPage, lambda number, size: loadImage(numbers[number], size), PAGE_WIDTH, settings.HALFTONE_METHOD, settings.HALFTONE_PHOTO_METHOD)
+
+		# Page is not sent if none of its images could be read after all
+		if all(method == None for method in methods):
+			continue
+
+		with metrics.stage("encode"):
+			tiffTools.saveG3TIFF(page, fileName)
+
+		# Pages with images halftoned in different ways are counted as "mixed"
+		methods = set(method for method in methods if method != None)
+
+		if len(methods) == 1:
+			metrics.addHalftone(methods.pop(), os.path.getsize(fileName))
+		elif len(methods) > 1:
+			metrics.addHalftone("mixed", os.path.getsize(fileName))
+
+		fileList += [fileName]
+
+	# Pages are given with the first image that could be read (order of the pages is kept that way)
+	results = []
+
+	for number in range(len(group)):
+		if number in failed:
+			results += [None]
+		else:
+			results += [fileList]
+			fileList = []
+
+	return results
+
+# Function for converting packed images (using the conversion cache, if it's turned on)
+def convertPacked(group, outputPrefix, settings):
+	cache = conversionCache.getCache(settings)
+
+	if cache == None:
+		return packedToPageFiles(group, outputPrefix, settings)
+
+	parameters = packingParameters(settings)
+	key = conversionCache.cacheKey(b"", "", (tuple(conversionCache.cacheKey(item[1], item[2], parameters) for item, size in group), parameters))
+	cachedPages = cache.get(key)
+
+	if cachedPages != None:
+		return [writePages(cachedPages, outputPrefix)] + [[] for number in range(len(group) - 1)]
+
+	results = packedToPageFiles(group, outputPrefix, settings)
+
+	# Results with images that couldn't be read are not cached
+	if None not in results:
+		cache.put(key, [readPage(fileName) for fileName in results[0]])
+
+	return results
+
+# Function for choosing worker threads for items and for pages of the images: (item workers, page workers)
+# Worker threads are never nested (that would make up to workers squared threads): if there's more than
+# one image unit to convert, units are converted in parallel and pages of every image one after another,
+# otherwise units are converted one after another and pages of the only image in parallel.
+def workerSplit(units, items, settings):
+	imageUnits = len([unit for unit in units if items[unit[0][0]][0] == "image"])
+
+	if imageUnits > 1:
+		return settings.CONVERSION_WORKERS, 1
+
+	return 1, settings.CONVERSION_WORKERS
+
+# Function for converting all the items (using worker threads if set; results are in the items order)
+# Pages of packed images are given as a result of the first of them (others get empty lists)
+def convertItems(items, workDir, settings):
+	units = conversionUnits(items, settings)
+	itemWorkers, pageWorkers = workerSplit(units, items, settings)
+
+	def convertTask(unit):
+		outputPrefix = os.path.join(workDir, str(unit[0][0]))
+
+		if len(unit) == 1:
+			return [convertItem(items[unit[0][0]], outputPrefix, settings, pageWorkers)]
+
+		try:
+			return convertPacked([(items[itemNumber], size) for itemNumber, size in unit], outputPrefix, settings)
+
+		# Packing failed - convert images one by one as usual
+		except Exception:
+			return [convertItem(items[itemNumber], os.path.join(workDir, str(itemNumber)), settings, pageWorkers) for itemNumber, size in unit]
+
+	results = []
+
+	for unitResults in additionalTools.mapInOrder(convertTask, units, itemWorkers):
+		results += unitResults
+
+	return results
@@ -22,241 +22,283 @@
 import tempfile
 import sys
 import os
-import subprocess
+import logging
+import threading
 import base64
-import configparser
-import mimetypes
 import email
 import email.quoprimime
 import StringTable
-import cutter
-import tiffTools
+import pipeline
+import archiveTools
+import settingsTools
+import conversionCache
 import htmlTools
 import textTools
 import imageTools
 import dataTools
 import loggerTools
+import metricsTools
+import spoolTools
+import blankPageTools
+import streamParser
 import additionalTools
 import mailTools
 
 
-# Global variable for logger (to be replaced by logging class someday...)
+# Global logger (records are written to the system logger by the queue listener thread)
 preparedLogger = None
 
 # Global settings class (with default settings applied)
 Settings = additionalTools.Settings()
 
-# Simple procedure for preparing system logger to use globally in this script (to be changed to the logging class someday...)
-def prepareGlobalLogger():
+# Lock for preparing global logger (getAndProcess may be called from many threads)
+loggerLock = threading.Lock()
+
+# Simple procedure for preparing system logger to use globally in this script (done once, level is updated every time)
+def prepareGlobalLogger(settings = None):
 	global preparedLogger
 
-	if preparedLogger == None:
-		preparedLogger = loggerTools.prepareLogger(loggerAddress = Settings.DEFAULT_LOGGER_ADDRESS)
+	if settings == None:
+		settings = Settings
+
+	with loggerLock:
+		preparedLogger = loggerTools.prepareQueueLogger(loggerAddress = settings.DEFAULT_LOGGER_ADDRESS, level = loggerTools.LEVELS.get(settings.LOGGER_LEVEL, logging.INFO))
 
 	return
 
-# Simple procedure for passing error messages to the system log
-def logError(errorString):
-	loggerTools.logInfo(logger = preparedLogger, prefix = StringTable.LOGGER_ERROR, message = errorString)
+# Simple procedure for passing error messages to the system log (parts are joined only if message is really logged)
+def logError(*parts):
+	loggerTools.logParts(preparedLogger, logging.ERROR, StringTable.LOGGER_ERROR, parts)
 	return
 
 # Simple procedure for passing warnings to the system log
-def logWarning(warningString):
-	loggerTools.logInfo(logger = preparedLogger, prefix = StringTable.LOGGER_WARNING, message = warningString)
+def logWarning(*parts):
+	loggerTools.logParts(preparedLogger, logging.WARNING, StringTable.LOGGER_WARNING, parts)
 	return
 
 # Simple procedure for passing notices to the system log
-def logNotice(noticeString):
-	loggerTools.logInfo(logger = preparedLogger, prefix = StringTable.LOGGER_NOTICE, message = noticeString)
+def logNotice(*parts):
+	loggerTools.logParts(preparedLogger, logging.INFO, StringTable.LOGGER_NOTICE, parts)
 	return
 
-# Procedure for loading settings from the INI file
-def loadSettings(whichFax = "", settingsFile = Settings.SETTINGS_FILE):
-	config = configparser.ConfigParser(interpolation = None)
-
-	if config.read(settingsFile) == []:
-		try:
-			# Try finding file in the script's path
-			settingsFile = os.path.dirname(os.path.realpath(__file__)) + "/" + settingsFile
-			config.read(settingsFile)
-
-		except:
-			pass
-
-	# Load main settings if possible (or defaults, if not)
-
-	# Header strings
-	Settings.NO_DATA = config.get("strings", "no_data", fallback = Settings.NO_DATA).replace('"', '')
-	Settings.SENDER = config.get("strings", "sender", fallback = Settings.SENDER).replace('"', '')
-	Settings.SUBJECT = config.get("strings", "subject", fallback = Settings.SUBJECT).replace('"', '')
-	Settings.DATE = config.get("strings", "date", fallback = Settings.DATE).replace('"', '')
-
-	# Message settings
-	Settings.MESSAGE_TRIGGER = config.get("message", "message_trigger", fallback = Settings.MESSAGE_TRIGGER).replace('"', '')
-	Settings.STANDARD_TRIGGER = config.get("message", "standard_trigger", fallback = Settings.STANDARD_TRIGGER).replace('"', '')
-	Settings.DELETE_SUBJECT_TRIGGER = config.getboolean("message", "delete_subject_trigger", fallback = Settings.DELETE_SUBJECT_TRIGGER)
-	Settings.DELETE_MESSAGE_TRIGGER = config.getboolean("message", "delete_message_trigger", fallback = Settings.DELETE_MESSAGE_TRIGGER)
-	Settings.DELETE_STANDARD_TRIGGER = config.getboolean("message", "delete_standard_trigger", fallback = Settings.DELETE_STANDARD_TRIGGER)
-	Settings.USE_STANDARD_TRIGGER = config.getboolean("message", "use_standard_trigger", fallback = Settings.USE_STANDARD_TRIGGER)
-	Settings.USE_PLAIN = config.getboolean("message", "use_plain", fallback = Settings.USE_PLAIN)
-	Settings.MSPACES_TONL = config.getboolean("message", "multispaces_to_new_lines", fallback = Settings.MSPACES_TONL)
-	Settings.AMPS_CHANGE = config.getboolean("message", "convert_amp_characters", fallback = Settings.AMPS_CHANGE)
-	Settings.STRIP_BE_NLS = config.getboolean("message", "strip_new_lines_on_startend", fallback = Settings.STRIP_BE_NLS)
-	Settings.STRIP_INTEXT_NLS = config.getboolean("message", "strip_intext_new_lines", fallback = Settings.STRIP_INTEXT_NLS)
-
-	# Logger settings
-	Settings.DEFAULT_LOGGER_ADDRESS = config.get("logger", "address", fallback = Settings.DEFAULT_LOGGER_ADDRESS).replace('"', '')
-
-	# Rendering settings
-	Settings.TEXT_FONT_NAME = config.get("rendering", "text_font_name", fallback = Settings.TEXT_FONT_NAME).replace('"', '')
-	Settings.TEXT_FONT_SIZE = config.getint("rendering", "text_font_size", fallback = Settings.TEXT_FONT_SIZE)
-	Settings.TEXT_TOP_MARGIN = config.getint("rendering", "text_top_margin", fallback = Settings.TEXT_TOP_MARGIN)
-
-	# Default settings
-	Settings.DEFAULT_SETTINGS = config.get("default", "default_settings", fallback = Settings.DEFAULT_SETTINGS).replace('"', '')
-	Settings.USE_DEFAULT_SETTINGS_ON_WRONG_PARAM = config.getboolean("default", "use_default_on_wrong_parameter", fallback = Settings.USE_DEFAULT_SETTINGS_ON_WRONG_PARAM)
-	Settings.LOG_MESSAGE_TO_FILE = config.getboolean("default", "log_message_to_file", fallback = Settings.LOG_MESSAGE_TO_FILE)
-	Settings.MESSAGE_LOG_FILE = config.get("default", "message_log_file", fallback = Settings.MESSAGE_LOG_FILE).replace('"', '')
-	Settings.DATE_TIMEZONE = config.get("default", "date_timezone", fallback = Settings.DATE_TIMEZONE).replace('"', '')
-	Settings.DATE_FORMAT = config.get("default", "date_format", fallback = Settings.DATE_FORMAT).replace('"', '')
-	Settings.UNPACK_MULTI_TIFF = config.getboolean("default", "unpack_multipage_tiffs", fallback = Settings.UNPACK_MULTI_TIFF)
-
-	# Prepare global logger after loading user settings (and logger address too)
-	prepareGlobalLogger()
+# Procedure for writing all the queued log records (to be called before exiting)
+def stopLogger():
+	loggerTools.stopQueueLogger()
+	return
 
+# Procedure for applying settings of the chosen fax section (or default one, if chosen is not set or doesn't exist)
+def applySection(compiled, whichFax, settings):
 	# Chosen fax section
 	# Check if settings section for chosen fax exists (or set it to default)
-	if (whichFax == "") or (not config.has_section(whichFax)):
+	if (whichFax == "") or (whichFax not in compiled.sections):
 		if whichFax == "":
 			logNotice(StringTable.NO_PARAMETER_SET)
 		else:
-			logNotice(StringTable.NO_SECTION + whichFax)
+			logNotice(StringTable.NO_SECTION, whichFax)
 
-		if Settings.USE_DEFAULT_SETTINGS_ON_WRONG_PARAM:
-			whichFax = Settings.DEFAULT_SETTINGS
-			logNotice(StringTable.USING_DEFAULT + whichFax)
+		if settings.USE_DEFAULT_SETTINGS_ON_WRONG_PARAM:
+			whichFax = settings.DEFAULT_SETTINGS
+			logNotice(StringTable.USING_DEFAULT, whichFax)
 		else:
 			logNotice(StringTable.NOT_USING_DEFAULT)
 
-	# Get phone number and subject trigger for chosen fax
-	Settings.PHONE_NUMBER = config.get(whichFax, "phone_number", fallback = Settings.PHONE_NUMBER).replace('"', '')
-	Settings.SUBJECT_TRIGGER = config.get(whichFax, "subject_trigger", fallback = Settings.SUBJECT_TRIGGER).replace('"', '')
-
-	# Get timezone for chosen fax
-	if config.has_option(whichFax, "date_timezone"):
-		Settings.DATE_TIMEZONE = config.get(whichFax, "date_timezone", fallback = Settings.DATE_TIMEZONE).replace('"', '')
-		logNotice(StringTable.USING_TIMEZONE + Settings.DATE_TIMEZONE)
-
-	# Get date format for chosen fax
-	if config.has_option(whichFax, "date_format"):
-		Settings.DATE_FORMAT = config.get(whichFax, "date_format", fallback = Settings.DATE_FORMAT).replace('"', '')
-		logNotice(StringTable.USING_DATE_FORMAT + Settings.DATE_FORMAT)
-
-	# Get setting for turning on/off logging a message to the file for chosen fax
-	if config.has_option(whichFax, "log_message_to_file"):
-		Settings.LOG_MESSAGE_TO_FILE = config.getboolean(whichFax, "log_message_to_file", fallback = Settings.LOG_MESSAGE_TO_FILE)
-		logNotice("Logging message to a file setting overriden for " + whichFax + ": " + str(Settings.LOG_MESSAGE_TO_FILE))
-
-	# Get file name for logging a message to for chosen fax
-	if config.has_option(whichFax, "message_log_file"):
-		Settings.MESSAGE_LOG_FILE = config.get(whichFax, "message_log_file", fallback = Settings.MESSAGE_LOG_FILE).replace('"', '')
-		logNotice("Message log file setting overriden for " + whichFax + ": " + Settings.MESSAGE_LOG_FILE)
-
-	# Replace loaded phone number if route is set
-	if config.has_option(whichFax, "route_to"):
-		Settings.ROUTE_TO_FAX = config.get(whichFax, "route_to", fallback = Settings.ROUTE_TO_FAX).replace('"', '')
-		if Settings.ROUTE_TO_FAX == whichFax:
-			logWarning(StringTable.ROUTE_SAME_1 + Settings.ROUTE_TO_FAX + StringTable.ROUTE_SAME_2)
-
-		elif config.has_section(Settings.ROUTE_TO_FAX):
-			try:
-				Settings.PHONE_NUMBER = config.get(Settings.ROUTE_TO_FAX, "phone_number")
-				logNotice(StringTable.USING_ROUTE + whichFax + StringTable.ROUTE_FROM_TO + Settings.ROUTE_TO_FAX)
-				if config.has_option(Settings.ROUTE_TO_FAX, "route_to"):
-					logWarning(StringTable.ROUTE_TO_NO_FOLLOW_1 + Settings.ROUTE_TO_FAX + StringTable.ROUTE_TO_NO_FOLLOW_2 + Settings.PHONE_NUMBER)
-			except:
-				logNotice(StringTable.ROUTE_NO_SETTINGS_1 + Settings.ROUTE_TO_FAX + StringTable.ROUTE_NO_SETTINGS_2 + whichFax + StringTable.ROUTE_NO_SETTINGS_3)
+	# Apply effective settings of chosen fax (phone number, subject trigger, overriden options and resolved route)
+	section = compiled.getSection(whichFax)
+	settingsTools.applyValues(settings, section.values)
 
-		else:
-			logNotice(StringTable.ROUTE_NO_SETTINGS_1 + Settings.ROUTE_TO_FAX + StringTable.ROUTE_NO_SETTINGS_2 + whichFax + StringTable.ROUTE_NO_SETTINGS_3)
+	for notice in section.notices:
+		logNotice(notice)
+
+	return
+
+# Function for choosing fax section by the message subject (the longest matching subject trigger wins)
+# Returns False if no trigger matches (message is not sent to any fax then, not even the default one).
+def dispatchBySubject(message, settings):
+	compiled = settingsTools.getCompiledSettings(settings.SETTINGS_FILE, os.path.dirname(os.path.realpath(__file__)))
+	subject = mailTools.tryDecodeHeader(message["Subject"])
+	whichFax = None
+
+	if subject != None:
+		whichFax = compiled.subjectIndex.match(subject)
+
+	settings.DISPATCH_PENDING = False
+
+	if whichFax == None:
+		logNotice(StringTable.DISPATCH_NO_MATCH)
+		return False
+
+	logNotice(StringTable.DISPATCHED_BY_SUBJECT, whichFax)
+	applySection(compiled, whichFax, settings)
+
+	return True
+
+# Procedure for loading settings from the INI file (to the global settings or to the chosen settings object)
+def loadSettings(whichFax = "", settingsFile = Settings.SETTINGS_FILE, settings = None):
+	if settings == None:
+		settings = Settings
+
+	# Get compiled settings (file is parsed again only if it has changed)
+	compiled = settingsTools.getCompiledSettings(settingsFile, os.path.dirname(os.path.realpath(__file__)))
+
+	# Load main settings if possible (or defaults, if not)
+	settingsTools.applyValues(settings, compiled.globalValues)
+
+	# Prepare global logger after loading user settings (and logger address too)
+	prepareGlobalLogger(settings)
+
+	# Report problems found while compiling settings (routes and so on; once per compilation)
+	for error in compiled.takeErrors():
+		logWarning(error)
+
+	# Remember settings file (section may be chosen later, when the message subject is known)
+	settings.SETTINGS_FILE = settingsFile
+
+	if (whichFax == "") and settings.DISPATCH_BY_SUBJECT:
+		settings.DISPATCH_PENDING = True
+		settingsTools.applyValues(settings, compiled.noSection.values)
+		logNotice(StringTable.DISPATCH_DEFERRED)
+
+	else:
+		settings.DISPATCH_PENDING = False
+		applySection(compiled, whichFax, settings)
 
 	# Indicate that settings were reloaded
-	Settings.SETTINGS_RELOADED = True
+	settings.SETTINGS_RELOADED = True
 
 	return
 
 # Function for gathering main headers from message ("From", "Subject" and "Date")
-def getMailInfo(message):
+def getMailInfo(message, settings = None):
+	if settings == None:
+		settings = Settings
+
 	s_from = mailTools.tryDecodeHeader(message["From"])
 	if s_from == None:
-		s_from = Settings.NO_DATA
+		s_from = settings.NO_DATA
 
 	s_subj = mailTools.tryDecodeHeader(message["Subject"])
 	if s_subj == None:
-		s_subj = Settings.NO_DATA
-	elif (s_subj[0:len(Settings.SUBJECT_TRIGGER)] == Settings.SUBJECT_TRIGGER) and (len(s_subj) > len(Settings.SUBJECT_TRIGGER)):
-		if Settings.DELETE_SUBJECT_TRIGGER:
-			s_subj = s_subj[len(Settings.SUBJECT_TRIGGER):]
+		s_subj = settings.NO_DATA
+	elif (s_subj[0:len(settings.SUBJECT_TRIGGER)] == settings.SUBJECT_TRIGGER) and (len(s_subj) > len(settings.SUBJECT_TRIGGER)):
+		if settings.DELETE_SUBJECT_TRIGGER:
+			s_subj = s_subj[len(settings.SUBJECT_TRIGGER):]
 
-	s_date = mailTools.mailDateToFormat(mailTools.tryDecodeHeader(message["Date"]), Settings.DATE_TIMEZONE, Settings.DATE_FORMAT)
+	s_date = mailTools.mailDateToFormat(mailTools.tryDecodeHeader(message["Date"]), settings.DATE_TIMEZONE, settings.DATE_FORMAT)
 	if s_date == None:
-		s_date = Settings.NO_DATA
+		s_date = settings.NO_DATA
 
 	return s_from, s_subj, s_date
 
 # Function for preparing header to save as a text file
-def prepareTextHeader(s_from, s_subj, s_date, addReturns = True):
-	textHeader = Settings.SENDER + s_from + "\n"
-	textHeader += Settings.SUBJECT + s_subj + "\n"
-	textHeader += Settings.DATE + s_date
+def prepareTextHeader(s_from, s_subj, s_date, addReturns = True, settings = None):
+	if settings == None:
+		settings = Settings
+
+	textHeader = settings.SENDER + s_from + "\n"
+	textHeader += settings.SUBJECT + s_subj + "\n"
+	textHeader += settings.DATE + s_date
 
 	if addReturns:
 		textHeader += "\n\n"
 
 	return textHeader
 
-# One function to save data to make code more readable
-def saveMessagePart(binary, outFile, data, counter, s_subj, s_from):
-	# Check if mode is correct according to the data
-	if binary:
-		# Change mode to non-binary if data is string
-		if isinstance(data, str):
-			binary = False
-			outFile = str(counter) + ".txt"
-			logNotice(StringTable.SAVE_IMAGE_1 + s_subj + StringTable.SAVE_IMAGE_2 + s_from + StringTable.SAVE_IMAGE_3)
+# Function for getting image format of the message part data (also if it was spooled to the file)
+def partImageFormat(data, spoolFile = ""):
+	if spoolFile != "":
+		return imageTools.quickImageFileFormat(spoolFile)
 
-	else:
-		# Change mode to binary if data is binary
-		if isinstance(data, bytes):
-			binary = True
+	return imageTools.quickImageFormat(data)
 
-			if imageTools.quickImageFormat(data) == "":
-				# Let's say JPG is a default extension in such situation (should be harmless)
-				outFile = str(counter) + ".jpg"
-			else:
-				outFile = str(counter) + "." + imageTools.quickImageFormat(data)
+# Generator giving the message in chunks (from stdin, provided file object or provided data)
+def messageChunks(passBuffer = None):
+	if passBuffer == None:
+		passBuffer = sys.stdin.buffer
 
-			logNotice(StringTable.SAVE_TEXT_1 + s_subj + StringTable.SAVE_TEXT_2 + s_from + StringTable.SAVE_TEXT_3)
+	if hasattr(passBuffer, "read"):
+		while True:
+			chunk = passBuffer.read(dataTools.CHUNK_SIZE)
+			if chunk == b"":
+				break
+			yield chunk
 
-	if binary:
-		fl = open(outFile, "wb")
 	else:
-		fl = open(outFile, "w")
+		if isinstance(passBuffer, str):
+			passBuffer = passBuffer.encode()
+
+		for position in range(0, len(passBuffer), dataTools.CHUNK_SIZE):
+			yield passBuffer[position:position + dataTools.CHUNK_SIZE]
+
+	return
 
-	fl.write(data)
-	fl.close()
+# Function for reading message from chunks into the parser (and to the GZIP file at the same time if chosen)
+# Big encoded part bodies are decoded to the work directory while parsing (see streamParser).
+# Returns message, archive spool (or None) and parser (to find spooled parts of the message).
+def readMessage(workDirectory, passBuffer = None, settings = None):
+	if settings == None:
+		settings = Settings
 
-	return outFile
+	parser = streamParser.StreamParser(workDirectory, settings.SPOOL_THRESHOLD)
+	metrics = metricsTools.current()
+	spool = None
+
+	# Spool raw message for archiving it (if section is not known yet, it's decided after choosing it)
+	if settings.LOG_MESSAGE_TO_FILE or settings.DISPATCH_PENDING:
+		try:
+			spool = archiveTools.openSpool(settings.MESSAGE_LOG_FILE)
+		except:
+			logError(StringTable.LOGGING_MESSAGE_FAILED)
+
+	for chunk in metrics.timeIterator("ingest", messageChunks(passBuffer)):
+		metrics.add("bytes_in", len(chunk))
+
+		with metrics.stage("parse"):
+			parser.feed(chunk)
+
+		if spool != None:
+			try:
+				with metrics.stage("ingest"):
+					spool.write(chunk)
+			except:
+				logError(StringTable.LOGGING_MESSAGE_FAILED)
+				spool.discard()
+				spool = None
+
+	with metrics.stage("parse"):
+		message = parser.close()
+
+	return message, spool, parser
+
+# Function for getting header value as a string for the archive index ("" if header is missing)
+def headerText(header):
+	if header == None:
+		return ""
+
+	return str(header).strip()
+
+# Procedure for archiving spooled message according to the settings (compressed and written in background if chosen)
+def archiveSpooledMessage(message, spool, settings):
+	if not settings.LOG_MESSAGE_TO_FILE:
+		spool.discard()
+		return
+
+	try:
+		archiveTools.archiveMessage(spool, settings.MESSAGE_LOG_FILE, headerText(message["Message-ID"]), headerText(message["Date"]), settings.PHONE_NUMBER, settings.ARCHIVE_ROTATION, settings.ARCHIVE_MAX_SIZE, settings.ARCHIVE_COMPRESSION_LEVEL, settings.ARCHIVE_BACKGROUND, logError)
+
+	except:
+		logError(StringTable.LOGGING_MESSAGE_FAILED)
+		spool.discard()
+
+	return
 
 # Main program procedure for gathering mail data and process it
-def getAndProcess(passBuffer = None, whichFax = ""):
-	oldDir = os.getcwd()
-	dir = tempfile.TemporaryDirectory()
-	os.chdir(dir.name)
-	outFile = ""
-	buffer = ""
+# (working directory is not changed, so it's safe to call it from many threads with separate settings objects)
+# Message is read from stdin, if not passed as data or binary file object (read in chunks, as stdin is).
+def getAndProcess(passBuffer = None, whichFax = "", settings = None):
 	counter = 1	# let's start from 1 at this point
+	items = []
 	fileList = []
+	pageFiles = []
 	first = True
 	anything = False
 	wasTextInMessage = False
@@ -265,43 +307,70 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 	standardTriggered = False
 	everythingOK = True
 
+	if settings == None:
+		settings = Settings
+
 	# Prepare global logger if needed
-	prepareGlobalLogger()
+	prepareGlobalLogger(settings)
 
-	if whichFax != "":
-		if len(sys.argv) > 1:
-			whichFax = sys.argv[1]
-		else:
-			whichFax = ""
+	# Fax section from the command line (only when reading from stdin)
+	if (whichFax == "") and (passBuffer == None) and (len(sys.argv) > 1):
+		whichFax = sys.argv[1]
 
-	if not Settings.SETTINGS_RELOADED:
-		loadSettings(whichFax = whichFax)
+	if not settings.SETTINGS_RELOADED:
+		loadSettings(whichFax = whichFax, settings = settings)
 
 	# Stop further processing - there are not any phone number specified for faxing!
-	if (Settings.PHONE_NUMBER == "") or (Settings.PHONE_NUMBER == None):
+	# (if section is going to be chosen by the subject, it's checked after reading the message)
+	if (not settings.DISPATCH_PENDING) and ((settings.PHONE_NUMBER == "") or (settings.PHONE_NUMBER == None)):
 		logError(StringTable.NO_PHONE_NUMBER)
 		return False
 
+	# Work directory for spooled payloads and final pages
+	dir = tempfile.TemporaryDirectory()
+	spool = None
+	messageId = ""
+	contextToken = loggerTools.setContext(stage = "read")
+
+	# Measure processing stages of this message (null metrics, doing nothing, if turned off)
+	metrics = metricsTools.startMessage(settings)
+	metricsToken = metricsTools.activate(metrics)
+
 	try:
-		# According to the situation (if parameter passed or not)
-		if passBuffer == None:
-			# Read the message from stdin
-			for line in sys.stdin:
-				buffer += line
-		else:
-			# Read the message from provided data
-			buffer = passBuffer
+		# Read the message (from stdin or provided data) in chunks and spool it for archiving
+		message, spool, parser = readMessage(dir.name, passBuffer, settings)
+		messageId = headerText(message["Message-ID"])
+		loggerTools.setContext(messageId = messageId or None)
 
-		# Log message to the GZIP file
-		if Settings.LOG_MESSAGE_TO_FILE:
-			try:
-				loggerTools.logToCompressedFile(Settings.MESSAGE_LOG_FILE, buffer)
-			except:
-				logError(StringTable.LOGGING_MESSAGE_FAILED)
+		# Choose fax section by the subject (if there was no section parameter)
+		dispatched = settings.DISPATCH_PENDING
+		matched = False
 
-		# Import message and get main information from headers
-		message = email.message_from_string(buffer)
-		s_from, s_subj, s_date = getMailInfo(message)
+		if dispatched:
+			matched = dispatchBySubject(message, settings)
+
+		# Archive the message (to the GZIP file; in background if chosen)
+		if spool != None:
+			archiveSpooledMessage(message, spool, settings)
+			spool = None
+
+		if dispatched:
+			# Message not meant for any fax (no trigger matches) - rejected, nothing is converted nor spooled
+			if not matched:
+				logError(StringTable.DISPATCH_REJECTED)
+				everythingOK = False
+				return everythingOK
+
+			if (settings.PHONE_NUMBER == "") or (settings.PHONE_NUMBER == None):
+				logError(StringTable.NO_PHONE_NUMBER)
+				everythingOK = False
+				return everythingOK
+
+		# Get main information from headers
+		loggerTools.setContext(destination = settings.PHONE_NUMBER, stage = "parts")
+
+		with metrics.stage("parse"):
+			s_from, s_subj, s_date = getMailInfo(message, settings)
 
 		if message.is_multipart():
 			parts = message.get_payload()
@@ -309,14 +378,16 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 			parts = [message]
 
 		# First plain or non-plain decision
-		additionalTools.decidePlainOrHTML(parts, Settings)
+		additionalTools.decidePlainOrHTML(parts, settings)
 
 		for part in parts:
+			loggerTools.setContext(part = counter)
+
 			# Unpack text from multipart (plain and html decision)
 			if part.is_multipart():
 				# Second plain or non-plain decision
 				parts2 = part.get_payload()
-				additionalTools.decidePlainOrHTML(parts2, Settings)
+				additionalTools.decidePlainOrHTML(parts2, settings)
 
 				# Should not be more parts on the list at this point (so get the only one)
 				part = parts2[0]
@@ -329,35 +400,35 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 				encoding = "utf-8"
 
 			# Decode non plain-text data (Base64 or Quoted-Printable)
-			if part["Content-Transfer-Encoding"] == "base64":
-				data = base64.b64decode(part.get_payload())
-			elif part["Content-Transfer-Encoding"] == "quoted-printable":
-				data = email.quoprimime.body_decode(part.get_payload()).encode("latin1").decode(encoding)
-			else:
-				data = part.get_payload()
-
-			# Get file name properties (to extract extension) and also try to
-			# decode a filename (big thanks to MarX, who accidentally found that part missing!)
-			filename = mailTools.decodeHeader(part.get_filename())
-			if filename == None:
-				fN = ""
-				fExt = ""
-			else:
-				fN, fExt = os.path.splitext(filename)
+			spoolFile = ""
+
+			with metrics.stage("parse"):
+				spooled = parser.spooledPart(part)
+
+				# Big payloads were decoded directly to the file while reading the message (only leading bytes are kept in memory)
+				if spooled != None:
+					spoolFile = spooled.fileName
+					data = spooled.head
+				elif part["Content-Transfer-Encoding"] == "base64":
+					data = base64.b64decode(part.get_payload())
+				elif part["Content-Transfer-Encoding"] == "quoted-printable":
+					data = email.quoprimime.body_decode(part.get_payload()).encode("latin1").decode(encoding)
+				else:
+					data = mailTools.payloadToText(part.get_payload(), encoding)
+
+			# Encoded payload is not needed anymore
+			part.set_payload("")
 
 			# If there is nothing interesting in here, go to the next part
 			if len(data) == 0:
 				continue
 
 			# Determine and store attachment's type information in temporary variables to make further code look better
-			contentMimeType = dataTools.determineMimeType(data)
+			with metrics.stage("sniff"):
+				contentMimeType = dataTools.determineMimeType(data)
+
 			contentMainType = dataTools.getMainType(contentMimeType)
 			contentSubType = dataTools.getSubType(contentMimeType)
-			contentExtension = mimetypes.guess_extension(contentMimeType)
-
-			# Change extension to this from mail if guessing failed
-			if contentExtension == "":
-				contentExtension = fExt
 
 			# If guessed mime type doesn't match with what is in the mail
 			if contentMimeType != part.get_content_type():
@@ -366,26 +437,30 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 					contentMimeType = part.get_content_type()
 					contentMainType = part.get_content_maintype()
 					contentSubType = part.get_content_subtype()
-					# File extension doesn't matter
 				else:
 					# Otherwise, log mime type override
-					logNotice(StringTable.MIMETYPE_OVERRIDE_1 + s_subj + StringTable.MIMETYPE_OVERRIDE_2 + s_from + StringTable.MIMETYPE_OVERRIDE_3 + contentMimeType + StringTable.MIMETYPE_OVERRIDE_4 + part.get_content_type() + StringTable.MIMETYPE_OVERRIDE_5)
+					logNotice(StringTable.MIMETYPE_OVERRIDE_1, s_subj, StringTable.MIMETYPE_OVERRIDE_2, s_from, StringTable.MIMETYPE_OVERRIDE_3, contentMimeType, StringTable.MIMETYPE_OVERRIDE_4, part.get_content_type(), StringTable.MIMETYPE_OVERRIDE_5)
 
 			# Additional (old) tests
 			# Let's check if text/plain isn't in fact an image...
-			if (contentMainType == "text") and isinstance(data, bytes) and imageTools.quickImageTest(data):
+			if (contentMainType == "text") and isinstance(data, bytes) and (partImageFormat(data, spoolFile) != ""):
 				contentMainType = "image"
-				logNotice(StringTable.SAVE_TEXT_1 + s_subj + StringTable.SAVE_TEXT_2 + s_from + StringTable.SAVE_TEXT_3)
+				logNotice(StringTable.SAVE_TEXT_1, s_subj, StringTable.SAVE_TEXT_2, s_from, StringTable.SAVE_TEXT_3)
 
 			# Let's check if image/* isn't in fact a text...
 			if (contentMainType == "image") and isinstance(data, str) and not imageTools.quickImageTest(data):
 				contentMainType = "text"
-				logNotice(StringTable.SAVE_IMAGE_1 + s_subj + StringTable.SAVE_IMAGE_2 + s_from + StringTable.SAVE_IMAGE_3)
+				logNotice(StringTable.SAVE_IMAGE_1, s_subj, StringTable.SAVE_IMAGE_2, s_from, StringTable.SAVE_IMAGE_3)
 
 			if contentMainType == "text":
 				# This will avoid discarding text attachments...
 				messageTriggered = False
 
+				# Spooled text has to be read back to the memory
+				if spoolFile != "":
+					data = dataTools.readAndRemove(spoolFile)
+					spoolFile = ""
+
 				# Get rid of "bytes" type if needed
 				try:
 					data = str(data, encoding)
@@ -393,42 +468,40 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 					data = str(data)
 
 				if contentSubType == "html":
-					# Convert HTML to plain text
-					data = htmlTools.HTMLToText(data)
+					with metrics.stage("html"):
+						# Convert HTML to plain text
+						data = htmlTools.HTMLToText(data)
 
-				else:
-					# Multispaces to new lines option
-					if Settings.MSPACES_TONL:
-						data = textTools.multiSpacesToReturns(data)
-					# Changing amp characters option
-					if Settings.AMPS_CHANGE:
-						data = textTools.changeAmpChars(data)
+						# Convert any CR+LF to just LF (big thanks to MariuszK, who accidentally found that part missing!)
+						data = data.replace("\r\n", "\n")
 
-				# Convert any CR+LF to just LF (big thanks to MariuszK, who accidentally found that part missing!)
-				data = data.replace("\r\n", "\n")
+				else:
+					# Multispaces to new lines and changing amp characters options (and CR+LF to LF) in one stage
+					with metrics.stage("normalize"):
+						data = textTools.normalizeText(data, settings.MSPACES_TONL, settings.AMPS_CHANGE)
 
 				# Things to be done/checked once (in the first text part of the message)
 				if first:
 					# Add header to the text part (if possible)
 					if len(data) == 0:
-						data = prepareTextHeader(s_from, s_subj, s_date, False)
+						data = prepareTextHeader(s_from, s_subj, s_date, False, settings)
 					else:
-						data = prepareTextHeader(s_from, s_subj, s_date) + data
+						data = prepareTextHeader(s_from, s_subj, s_date, True, settings) + data
 
 					# Are we going to use message triggers?
-					if Settings.DELETE_MESSAGE_TRIGGER:
+					if settings.DELETE_MESSAGE_TRIGGER:
 						# Is message triggered?
-						messageTriggered = (data.find(Settings.MESSAGE_TRIGGER) != -1)
+						messageTriggered = (data.find(settings.MESSAGE_TRIGGER) != -1)
 
 					# Are we going to use standard resolution trigger?
-					if Settings.USE_STANDARD_TRIGGER:
+					if settings.USE_STANDARD_TRIGGER:
 						# Is message meant to be sent in the standard resolution?
-						standardTriggered = (data.find(Settings.STANDARD_TRIGGER) != -1)
+						standardTriggered = (data.find(settings.STANDARD_TRIGGER) != -1)
 
 					# Is standard trigger has to be removed (only in first text part)?
-					if Settings.DELETE_STANDARD_TRIGGER:
+					if settings.DELETE_STANDARD_TRIGGER:
 						# Delete it
-						data=data.replace(Settings.STANDARD_TRIGGER, "")
+						data=data.replace(settings.STANDARD_TRIGGER, "")
 
 					# "First-text-part-time" checks done; flag it
 					first = False
@@ -438,187 +511,121 @@ def getAndProcess(passBuffer = None, whichFax = ""):
 				# at the end), but will avoid situations, where there are huge amount of lines
 				# with "!STANDARD!" trigger that will be changed to the empty lines and then not stripped
 
-				# Remove leading and trailing new lines option
-				if Settings.STRIP_BE_NLS:
-					data = data.strip('\n')
-
-				# Remove in-text more-than-two new lines option
-				if Settings.STRIP_INTEXT_NLS:
-					data = textTools.removeDuplicatedNewLines(data)
+				# Remove leading and trailing new lines and in-text more-than-two new lines options
+				with metrics.stage("normalize"):
+					data = textTools.finishText(data, settings.STRIP_BE_NLS, settings.STRIP_INTEXT_NLS)
 
-				# Save text to temporary file
+				# Add text to the items to convert
 				if not messageTriggered:
-					outFile = str(counter) + ".txt"
-
-					try:
-						outFile = saveMessagePart(False, outFile, data, counter, s_subj, s_from)
-					except:
-						outFile = ""
-						logNotice(StringTable.SAVE_TEXT_ERROR_1 + s_subj + StringTable.SAVE_TEXT_ERROR_2 + s_from + StringTable.SAVE_TEXT_ERROR_3)
+					items += [("text", data, "")]
 
 				else:
-					outFile = ""
-					logNotice(StringTable.TEXT_DISCARDED_1 + s_subj + StringTable.TEXT_DISCARDED_2 + s_from + StringTable.TEXT_DISCARDED_3)
+					logNotice(StringTable.TEXT_DISCARDED_1, s_subj, StringTable.TEXT_DISCARDED_2, s_from, StringTable.TEXT_DISCARDED_3)
 
 				wasTextInMessage = True
 
 			elif contentMainType == "image":
-				if(contentExtension != ""):
-					# Additional test if attachment has correct extension (for too quick locally sent messages with image attachments)
-					if contentExtension.lower() == ".txt":
-						if imageTools.quickImageFormat(data) == "":
-							# Let's say JPG is a default extension if it is unknown
-							contentExtension = ".jpg"
-						else:
-							contentExtension = "." + imageTools.quickImageFormat(data)
-
-					outFile = str(counter) + contentExtension
-
-				elif(imageTools.quickImageFormat(data) != ""):
-					# Try to guess image format
-					contentExtension = "." + imageTools.quickImageFormat(data)
-					# Update filename (again, big thanks to MarX, who accidentally found that part missing!)
-					outFile = str(counter) + contentExtension
-
-				else:
-					# Try default image extension (using simply .jpg should be harmless)
-					contentExtension = ".jpg"
-					outFile = str(counter) + contentExtension
-
-				try:
-					# Very simple workaround for TIFF attachments (to leave space for converting files to .tiff without overwriting)
-					if contentExtension.lower() == ".tiff":
-						contentExtension = ".tif"
-						outFile = str(counter) + contentExtension
-
-					# Save it too
-					outFile = saveMessagePart(True, outFile, data, counter, s_subj, s_from)
-
-					# It's not a typo - extension here will be TIF (not TIFF!)
-					if (Settings.UNPACK_MULTI_TIFF) and (contentExtension.lower() == ".tif"):
-						imageCount = tiffTools.getImageCount(outFile)
-						if imageCount > 1:
-							fileList += tiffTools.unpackMultipageTIFF(dir.name + "/" + outFile, True, counter)
-							counter += imageCount - 1
-							outFile = ""
-
-				except:
-					outFile = ""
-					logNotice(StringTable.SAVE_IMAGE_ERROR_1 + s_subj + StringTable.SAVE_IMAGE_ERROR_2 + s_from + StringTable.SAVE_IMAGE_ERROR_3)
+				# Add image to the items to convert (format is detected from the data itself and multipage TIFFs are unpacked while converting)
+				items += [("image", data, spoolFile)]
 
 			else:
 				# If part of a message is not a text nor an image, then discard it (as it may be vulnerable)
-				outFile = ""
-				logNotice(StringTable.ATTACHMENT_DISCARDED_1 + s_subj + StringTable.ATTACHMENT_DISCARDED_2 + s_from + StringTable.ATTACHMENT_DISCARDED_3 + " (" + contentMimeType + ")")
+				if spoolFile != "":
+					os.remove(spoolFile)
+
+				logNotice(StringTable.ATTACHMENT_DISCARDED_1, s_subj, StringTable.ATTACHMENT_DISCARDED_2, s_from, StringTable.ATTACHMENT_DISCARDED_3, " (", contentMimeType, ")")
 
-			# Increase the file counter and add file to the list (if there is any)
+			# Increase the part counter
 			counter += 1
-			if outFile != "":
-				fileList += [outFile]
 
 		# If message had no text part, then just add only a header
 		if not wasTextInMessage:
-			try:
-				# The most ugly condition in this code (sorry to all for that)...
-				if (fileList == []) and (s_from == Settings.NO_DATA) and (s_subj == Settings.NO_DATA) and (s_date == Settings.NO_DATA):
-					logNotice(StringTable.NOTHING_TO_FAX)
-					nothingUseful = True
-				else:
-					# Write '0.txt' file containing just headers and add it at the very beginning of the file list
-					outFile = saveMessagePart(False, "0.txt", prepareTextHeader(s_from, s_subj, s_date, False), 0, s_subj, s_from)
-					fileList = [outFile] + fileList
-
-			except:
-				logNotice(StringTable.HEADER_SAVE_ERROR_1 + s_subj + StringTable.HEADER_SAVE_ERROR_2 + s_from + StringTable.HEADER_SAVE_ERROR_3)
-
-		# Iteration start
-		fileNumber = 0
-
-		# Now convert all the saved files (text and images) to the TIFFs
-		while(fileNumber < len(fileList)):
-			# Unpack file name and extension
-			fN, fExt = os.path.splitext(fileList[fileNumber])
-
-			# Text files
-			if fExt == ".txt":
-				# Convert text files to G3 TIFFs
-				tiffTools.textFileToTIFF(fN + ".tiff", fileList[fileNumber], 1, Settings.TEXT_FONT_NAME + " " + str(Settings.TEXT_FONT_SIZE), Settings.TEXT_TOP_MARGIN)
-
-				# Update the file name on the list
-				fileList[fileNumber] = fN + ".tiff"
-
-				# Get TIFF subpage count
-				textImageCount = tiffTools.getImageCount(fileList[fileNumber])
-
-				# Unpack multipage TIFF if text file was long
-				if textImageCount > 1:
-					# Set temporary files prefix like x0000 (where x = fileNumber + 1)
-					tempFileList = tiffTools.unpackMultipageTIFF(dir.name + "/" + fileList[fileNumber], True, (fileNumber + 1) * 10000)
+			# The most ugly condition in this code (sorry to all for that)...
+			if (items == []) and (s_from == settings.NO_DATA) and (s_subj == settings.NO_DATA) and (s_date == settings.NO_DATA):
+				logNotice(StringTable.NOTHING_TO_FAX)
+				nothingUseful = True
+			else:
+				# Add text containing just headers at the very beginning of the items list
+				items = [("text", prepareTextHeader(s_from, s_subj, s_date, False, settings), "")] + items
 
-					# Apply cutter to all the pages
-					for tempFile in tempFileList:
-						cutter.loadAndCrop(tempFile)
+		loggerTools.setContext(stage = "convert", part = None)
 
-					# Update file list
-					fileList.pop(fileNumber)
-					fileList[fileNumber:fileNumber] = tempFileList
+		# Count conversion cache lookups of this message only (cache is shared by the messages of the process)
+		cacheCounters = conversionCache.countMessage()
 
-					# Update iterator
-					fileNumber += textImageCount - 1
+		# Now convert all the items (text and images) to the G3 TIFF pages (using worker threads if set)
+		for convertedFiles in pipeline.convertItems(items, dir.name, settings):
+			if convertedFiles == None:
+				# Probably corrupted image
+				logNotice(StringTable.IMAGE_CORRUPTED_ERROR_1, s_subj, StringTable.IMAGE_CORRUPTED_ERROR_2, s_from, StringTable.IMAGE_CORRUPTED_ERROR_3)
+				continue
 
-				# Simply process if there was a one-page TIFF
+			# Corrupted pages of the image are skipped (other pages are still sent)
+			for pageNumber in range(len(convertedFiles)):
+				if convertedFiles[pageNumber] == None:
+					logNotice(StringTable.PAGE_CORRUPTED_ERROR_1, pageNumber + 1, StringTable.PAGE_CORRUPTED_ERROR_2, s_subj, StringTable.PAGE_CORRUPTED_ERROR_3, s_from, StringTable.PAGE_CORRUPTED_ERROR_4)
 				else:
-					# Apply cutter to the single file
-					cutter.loadAndCrop(fileList[fileNumber])
-
-			# Image files
-			else:
-				try:
-					# Try to convert an image (if possible)
-					tiffTools.imageFileToG3TIFF(fileList[fileNumber], fN + ".tiff", 1, 1728, 2000, 32, 32)
-
-					# Update the file name on the list
-					fileList[fileNumber] = fN + ".tiff"
+					fileList += [convertedFiles[pageNumber]]
 
-				except:
-					# Probably corrupted image
-					logNotice(StringTable.IMAGE_CORRUPTED_ERROR_1 + s_subj + StringTable.IMAGE_CORRUPTED_ERROR_2 + s_from + StringTable.IMAGE_CORRUPTED_ERROR_3)
-
-			# Go to the next position on the list
-			fileNumber += 1
+		# Report conversion cache counters of this message
+		if settings.CACHE_ENABLED:
+			logNotice(StringTable.CACHE_STATISTICS_1, cacheCounters["memory_hits"], StringTable.CACHE_STATISTICS_2, cacheCounters["disk_hits"], StringTable.CACHE_STATISTICS_3, cacheCounters["misses"])
 
-		# Now prepare the faxspool command
-		if standardTriggered:
-			command = ["faxspool", "-n", Settings.PHONE_NUMBER]
-		else:
-			command = ["faxspool", Settings.PHONE_NUMBER]
+		# Now prepare pages to spool (in order)
+		loggerTools.setContext(stage = "spool")
 
 		for file in fileList:
-			# Add only TIFFs to the command (additional safety condition)
+			# Add only TIFFs to the spooled pages (additional safety condition)
 			if ".tiff" in file:
 				if not anything:
 					anything=True
-				command += [file]
+				pageFiles += [file]
+
+		# Remove blank (and almost blank) pages - every page sent costs seconds of the line
+		if anything and (settings.BLANK_PAGE_COVERAGE > 0):
+			with metrics.stage("blank"):
+				pageFiles, removed, savedTime = blankPageTools.removeBlankPages(pageFiles, settings.BLANK_PAGE_COVERAGE, settings.FAX_LINE_SPEED, settings.CONVERSION_WORKERS)
 
-		# Run faxspool command only if there are anything to fax
+			if removed > 0:
+				logNotice(StringTable.BLANK_PAGES_REMOVED_1, removed, StringTable.BLANK_PAGES_REMOVED_2, s_subj, StringTable.BLANK_PAGES_REMOVED_3, s_from, StringTable.BLANK_PAGES_REMOVED_4, round(savedTime), StringTable.BLANK_PAGES_REMOVED_5)
+
+			anything = pageFiles != []
+
+		# Spool pages (faxspool command or other backend chosen) only if there are anything to fax
 		if anything:
 			if standardTriggered:
-				logNotice(StringTable.STANDARD_RESOLUTION_1 + s_subj + StringTable.STANDARD_RESOLUTION_2 + s_from + StringTable.STANDARD_RESOLUTION_3)
+				logNotice(StringTable.STANDARD_RESOLUTION_1, s_subj, StringTable.STANDARD_RESOLUTION_2, s_from, StringTable.STANDARD_RESOLUTION_3)
 
-			subprocess.check_output(command)
+			metrics.add("pages", len(pageFiles))
+			metrics.addFileSizes("bytes_out", pageFiles)
+
+			with metrics.stage("spool"):
+				spoolTools.spoolFax(settings, settings.PHONE_NUMBER, pageFiles, standardTriggered, messageId)
 
 		else:
 			if not nothingUseful:
-				logNotice(StringTable.NOTHING_TO_FAX_I_1 + s_subj + StringTable.NOTHING_TO_FAX_I_2 + s_from + StringTable.NOTHING_TO_FAX_I_3)
+				logNotice(StringTable.NOTHING_TO_FAX_I_1, s_subj, StringTable.NOTHING_TO_FAX_I_2, s_from, StringTable.NOTHING_TO_FAX_I_3)
 
 	except Exception as e:
 		logError(str(e))
 		everythingOK = False
 
 	finally:
-		os.chdir(oldDir)
+		# Spooled message left (if processing failed before archiving it)
+		if spool != None:
+			spool.discard()
+
 		dir.cleanup()
 
+		# Export metrics of the message (if turned on)
+		try:
+			metricsTools.export(metrics.finish(everythingOK, messageId, settings.PHONE_NUMBER), settings)
+		except Exception as e:
+			logWarning(StringTable.METRICS_EXPORT_FAILED, str(e))
+
+		metricsTools.deactivate(metricsToken)
+		loggerTools.resetContext(contextToken)
+
 	return everythingOK
 
 
@@ -646,5 +653,14 @@ if __name__ == "__main__":
 		logError(str(e))
 		exitCode = 1
 
+	# Wait for the message archive writer
+	try:
+		archiveTools.flush()
+	except Exception as e:
+		logError(str(e))
+
+	# Write all the queued log records
+	stopLogger()
+
 	# And finally return exit code to the system
 	os._exit(exitCode)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+# Batch (backlog) mode for E-Mail to Fax Relay Utility
+#
+# Processes every message of the mbox file or Maildir directory in one warm process
+# (settings, system logger and conversion cache are loaded once and shared), with chosen
+# number of messages processed at the same time. Every successfully processed message is
+# marked as done in the state file as soon as it's finished, so interrupted (or partially
+# failed) run can be just started again - done messages are skipped.
+#
+# Messages are identified by Maildir unique names or by SHA-1 of the message (mbox).
+# Mailbox itself is only read, never changed.
+#
+# Usage: relayBatch.py mboxFileOrMaildir [faxSection] [concurrency]
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import time
+import hashlib
+import mailbox
+import threading
+import StringTable
+import relay
+import archiveTools
+import additionalTools
+
+
+# State file name (placed in the Maildir or next to the mbox file, if not chosen in the settings)
+STATE_SUFFIX = ".mail2fax-done"
+
+
+# Batch state class (keys of done messages; appended and synced after every message)
+class BatchState:
+	def __init__(self, stateFile):
+		self.stateFile = stateFile
+		self.done = set()
+		self.lock = threading.Lock()
+
+		if os.path.exists(stateFile):
+			inFile = open(stateFile, "r")
+
+			for line in inFile:
+				if line.strip() != "":
+					self.done.add(line.split("\t")[0].strip())
+
+			inFile.close()
+
+		self.file = open(stateFile, "a")
+		return
+
+	# Function for checking if message is already done
+	def isDone(self, key):
+		return key in self.done
+
+	# Procedure for marking message as done (it's on the disk before returning)
+	def markDone(self, key):
+		with self.lock:
+			self.done.add(key)
+			self.file.write(key + "\t" + time.strftime("%Y-%m-%d %H:%M:%S") + "\n")
+			self.file.flush()
+			os.fsync(self.file.fileno())
+
+		return
+
+	def close(self):
+		self.file.close()
+		return
+
+# Function for opening mailbox (Maildir if it's a directory, mbox otherwise)
+def openMailbox(source):
+	if os.path.isdir(source):
+		return mailbox.Maildir(source, factory = None, create = False), True
+
+	if not os.path.isfile(source):
+		raise FileNotFoundError(source)
+
+	return mailbox.mbox(source, create = False), False
+
+# Function for getting default state file for the mailbox
+def stateFileName(source, isMaildir):
+	if isMaildir:
+		return os.path.join(source, STATE_SUFFIX)
+
+	return source + STATE_SUFFIX
+
+# Generator giving messages not done yet: (key, raw message)
+# Messages are read one by one in the calling thread (mailbox objects are not thread safe)
+def pendingMessages(box, isMaildir, state, counters):
+	for boxKey in box.iterkeys():
+		data = box.get_bytes(boxKey)
+
+		if isMaildir:
+			key = boxKey
+		else:
+			key = hashlib.sha1(data).hexdigest()
+
+		if state.isDone(key):
+			counters["skipped"] += 1
+			continue
+
+		yield key, data
+
+# Main batch procedure (returns True if every message was processed successfully)
+def processMailbox(source, whichFax = "", concurrency = 0):
+	# Load settings once (this also prepares global logger)
+	relay.loadSettings(whichFax = whichFax)
+	settingsFile = relay.Settings.SETTINGS_FILE
+
+	if concurrency <= 0:
+		concurrency = relay.Settings.BATCH_CONCURRENCY
+
+	box, isMaildir = openMailbox(source)
+	stateFile = relay.Settings.BATCH_STATE_FILE
+
+	if stateFile == "":
+		stateFile = stateFileName(source, isMaildir)
+
+	state = BatchState(stateFile)
+	counters = {"processed": 0, "failed": 0, "skipped": 0}
+	countersLock = threading.Lock()
+
+	relay.logNotice(StringTable.BATCH_STARTED_1, source, StringTable.BATCH_STARTED_2, concurrency)
+
+	# Peak memory is process-wide, so it can't be measured for messages processed concurrently
+	traceMemory = relay.Settings.METRICS_TRACE_MEMORY and (concurrency <= 1)
+
+	if relay.Settings.METRICS_TRACE_MEMORY and not traceMemory:
+		relay.logWarning(StringTable.TRACE_MEMORY_DISABLED)
+
+	# Every message gets its own settings object (section may be chosen by its subject)
+	def messageTask(message):
+		key, data = message
+		settings = additionalTools.Settings()
+
+		try:
+			relay.loadSettings(whichFax = whichFax, settingsFile = settingsFile, settings = settings)
+			settings.METRICS_TRACE_MEMORY = settings.METRICS_TRACE_MEMORY and traceMemory
+			everythingOK = relay.getAndProcess(passBuffer = data, whichFax = whichFax, settings = settings)
+
+		except Exception as e:
+			relay.logError(str(e))
+			everythingOK = False
+
+		if everythingOK:
+			state.markDone(key)
+
+		with countersLock:
+			if everythingOK:
+				counters["processed"] += 1
+			else:
+				counters["failed"] += 1
+
+		return everythingOK
+
+	try:
+		additionalTools.mapIterator(messageTask, pendingMessages(box, isMaildir, state, counters), concurrency)
+
+	finally:
+		box.close()
+		state.close()
+
+		# Wait for the message archive writer
+		try:
+			archiveTools.flush()
+		except Exception as e:
+			relay.logError(str(e))
+
+		relay.logNotice(StringTable.BATCH_FINISHED_1, counters["processed"], StringTable.BATCH_FINISHED_2, counters["failed"], StringTable.BATCH_FINISHED_3, counters["skipped"])
+		print(StringTable.BATCH_FINISHED_1 + str(counters["processed"]) + StringTable.BATCH_FINISHED_2 + str(counters["failed"]) + StringTable.BATCH_FINISHED_3 + str(counters["skipped"]))
+
+	return counters["failed"] == 0
+
+
+# Autorun part
+if __name__ == "__main__":
+	exitCode = 0
+
+	try:
+		if len(sys.argv) == 2:
+			everythingOK = processMailbox(sys.argv[1])
+		elif len(sys.argv) == 3:
+			everythingOK = processMailbox(sys.argv[1], sys.argv[2])
+		elif len(sys.argv) == 4:
+			everythingOK = processMailbox(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+		else:
+			print("Usage: relayBatch.py mboxFileOrMaildir [faxSection] [concurrency]")
+			everythingOK = False
+
+		if not everythingOK:
+			exitCode = 1
+
+	except KeyboardInterrupt:
+		exitCode = 1
+
+	except Exception as e:
+		relay.logError(str(e))
+		print(str(e))
+		exitCode = 1
+
+	# Write all the queued log records
+	relay.stopLogger()
+
+	exit(exitCode)
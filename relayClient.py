@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# Tiny client shim for the relay daemon (to be used in procmail recipes
+# the same way as relay.py: "| relayClient.py FAX")
+#
+# If the daemon can't be reached, the message is processed in-process
+# (which is exactly what relay.py does).
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import dataTools
+import settingsTools
+import additionalTools
+
+
+# Function for getting main settings from the settings file (the same file relay.py and the daemon use)
+def configuredSettings(settingsFile = additionalTools.Settings.SETTINGS_FILE):
+	return settingsTools.getCompiledSettings(settingsFile, os.path.dirname(os.path.realpath(__file__))).globalValues
+
+# Function for getting daemon socket path from the settings file
+def configuredSocket(settingsFile = additionalTools.Settings.SETTINGS_FILE):
+	return configuredSettings(settingsFile)["DAEMON_SOCKET"]
+
+# Function for passing the message to the daemon (returns True, False or None if daemon is unreachable)
+# Message is sent in chunks as it's read and copied to the spool file at the same time, so it can be
+# still processed in-process if the daemon can't take it.
+def sendToDaemon(inputFile, spoolFile, whichFax = "", socketPath = None):
+	if socketPath == None:
+		socketPath = configuredSocket()
+
+	try:
+		client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		client.connect(socketPath)
+
+	except OSError:
+		return None
+
+	try:
+		try:
+			client.sendall(whichFax.encode() + b"\n")
+
+			while True:
+				chunk = inputFile.read(dataTools.CHUNK_SIZE)
+				if chunk == b"":
+					break
+
+				spoolFile.write(chunk)
+				client.sendall(chunk)
+
+			client.shutdown(socket.SHUT_WR)
+
+		# Daemon went away before taking the whole message
+		except OSError:
+			return None
+
+		reply = b""
+		while True:
+			chunk = client.recv(64)
+			if chunk == b"":
+				break
+			reply += chunk
+
+	finally:
+		client.close()
+
+	return reply.strip() == b"OK"
+
+# Fallback: process the message without daemon (the rest of the message is spooled too, then it's read back from the start)
+def processInProcess(inputFile, spoolFile, whichFax = ""):
+	import relay
+	import StringTable
+	import archiveTools
+
+	relay.loadSettings(whichFax = whichFax)
+	relay.logNotice(StringTable.DAEMON_UNREACHABLE, relay.Settings.DAEMON_SOCKET)
+
+	shutil.copyfileobj(inputFile, spoolFile, dataTools.CHUNK_SIZE)
+	spoolFile.seek(0)
+
+	try:
+		return relay.getAndProcess(passBuffer = spoolFile)
+
+	finally:
+		archiveTools.flush()
+		relay.stopLogger()
+
+
+# Autorun part
+if __name__ == "__main__":
+	exitCode = 0
+	socketPath = None
+	arguments = sys.argv[1:]
+
+	try:
+		# Optional socket path
+		if (len(arguments) >= 2) and (arguments[0] == "--socket"):
+			socketPath = arguments[1]
+			arguments = arguments[2:]
+
+		if len(arguments) > 1:
+			print("Usage: relayClient.py [--socket socketPath] [faxSection]")
+			exitCode = 1
+
+		else:
+			if len(arguments) == 1:
+				whichFax = arguments[0]
+			else:
+				whichFax = ""
+
+			# Message is spooled while it's sent (in memory if it's small, in the temporary file otherwise)
+			with tempfile.SpooledTemporaryFile(max_size = configuredSettings()["SPOOL_THRESHOLD"]) as spoolFile:
+				result = sendToDaemon(sys.stdin.buffer, spoolFile, whichFax, socketPath)
+
+				if result == None:
+					result = processInProcess(sys.stdin.buffer, spoolFile, whichFax)
+
+			if not result:
+				exitCode = 1
+
+	except Exception:
+		exitCode = 1
+
+	os._exit(exitCode)
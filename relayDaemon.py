@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Resident (daemon) mode for E-Mail to Fax Relay Utility
+#
+# Keeps interpreter, imported modules, settings and system logger warm
+# and takes messages over a local Unix socket (see relayClient.py).
+# Every connection is processed in a forked child, so the number of
+# messages processed at the same time is bounded by max_children setting.
+#
+# Protocol (one message per connection):
+#   client -> daemon: fax section name, new line, raw message (until EOF)
+#   daemon -> client: "OK" or "FAIL" line
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import sys
+import signal
+import socketserver
+import StringTable
+import relay
+import archiveTools
+
+
+# Reply lines sent back to the client
+REPLY_OK = b"OK\n"
+REPLY_FAIL = b"FAIL\n"
+
+
+# Connection handler (runs in the forked child)
+class RelayRequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		everythingOK = False
+
+		try:
+			# First line is the fax section name, the rest is a message (read in chunks while it's parsed)
+			whichFax = self.rfile.readline().decode().strip()
+
+			# Settings are reloaded per connection (as sections may differ)
+			relay.loadSettings(whichFax = whichFax)
+			everythingOK = relay.getAndProcess(passBuffer = self.rfile)
+
+		except Exception as e:
+			relay.logError(StringTable.DAEMON_REQUEST_FAILED, str(e))
+
+		# Child exits right after handling the connection, so wait for the message archive writer
+		try:
+			archiveTools.flush()
+		except Exception as e:
+			relay.logError(str(e))
+
+		if everythingOK:
+			self.wfile.write(REPLY_OK)
+		else:
+			self.wfile.write(REPLY_FAIL)
+
+		# Write all the queued log records before child exits
+		relay.stopLogger()
+
+		return
+
+# Forking Unix socket server (max_children bounds the concurrency)
+class RelayServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+	pass
+
+# Procedure for removing stale socket file (if any)
+def removeSocket(socketPath):
+	try:
+		os.unlink(socketPath)
+	except FileNotFoundError:
+		pass
+
+	return
+
+# Main daemon procedure
+def serve(socketPath = "", maxChildren = 0):
+	# Load settings once (this also prepares global logger)
+	relay.loadSettings()
+
+	if socketPath == "":
+		socketPath = relay.Settings.DAEMON_SOCKET
+
+	if maxChildren <= 0:
+		maxChildren = relay.Settings.DAEMON_MAX_CHILDREN
+
+	removeSocket(socketPath)
+
+	server = RelayServer(socketPath, RelayRequestHandler)
+	server.max_children = maxChildren
+	os.chmod(socketPath, 0o660)
+
+	# Make SIGTERM stop the daemon the same way as Ctrl+C does
+	signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+	relay.logNotice(StringTable.DAEMON_STARTED, socketPath)
+
+	try:
+		server.serve_forever()
+
+	except KeyboardInterrupt:
+		pass
+
+	finally:
+		server.server_close()
+		removeSocket(socketPath)
+		relay.logNotice(StringTable.DAEMON_STOPPED)
+		relay.stopLogger()
+
+	return
+
+
+# Autorun part
+if __name__ == "__main__":
+	exitCode = 0
+
+	try:
+		if len(sys.argv) == 1:
+			serve()
+		elif len(sys.argv) == 2:
+			serve(sys.argv[1])
+		elif len(sys.argv) == 3:
+			serve(sys.argv[1], int(sys.argv[2]))
+		else:
+			print("Usage: relayDaemon.py [socketPath] [maxChildren]")
+			exitCode = 1
+
+	except Exception as e:
+		relay.logError(str(e))
+		exitCode = 1
+
+	exit(exitCode)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+# Compiled settings (INI file parsed once into a snapshot of every section's effective settings)
+#
+# Snapshot is compiled again only when the settings file changes (modification time, size or inode),
+# so getting settings for a message is just a dictionary lookup. Routes (route_to) are resolved and
+# checked at compile time - problems are reported once per compilation instead of on every message.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import threading
+import configparser
+import StringTable
+import additionalTools
+
+
+# Global options: (attribute, section, key, type)
+GLOBAL_OPTIONS = [
+	("NO_DATA", "strings", "no_data", "string"),
+	("SENDER", "strings", "sender", "string"),
+	("SUBJECT", "strings", "subject", "string"),
+	("DATE", "strings", "date", "string"),
+	("MESSAGE_TRIGGER", "message", "message_trigger", "string"),
+	("STANDARD_TRIGGER", "message", "standard_trigger", "string"),
+	("DELETE_SUBJECT_TRIGGER", "message", "delete_subject_trigger", "boolean"),
+	("DELETE_MESSAGE_TRIGGER", "message", "delete_message_trigger", "boolean"),
+	("DELETE_STANDARD_TRIGGER", "message", "delete_standard_trigger", "boolean"),
+	("USE_STANDARD_TRIGGER", "message", "use_standard_trigger", "boolean"),
+	("USE_PLAIN", "message", "use_plain", "boolean"),
+	("MSPACES_TONL", "message", "multispaces_to_new_lines", "boolean"),
+	("AMPS_CHANGE", "message", "convert_amp_characters", "boolean"),
+	("STRIP_BE_NLS", "message", "strip_new_lines_on_startend", "boolean"),
+	("STRIP_INTEXT_NLS", "message", "strip_intext_new_lines", "boolean"),
+	("DEFAULT_LOGGER_ADDRESS", "logger", "address", "string"),
+	("LOGGER_LEVEL", "logger", "level", "string"),
+	("DAEMON_SOCKET", "daemon", "socket", "string"),
+	("DAEMON_MAX_CHILDREN", "daemon", "max_children", "integer"),
+	("SPOOL_BACKEND", "spool", "backend", "string"),
+	("SPOOL_QUEUE_DIRECTORY", "spool", "queue_directory", "string"),
+	("BATCH_CONCURRENCY", "batch", "concurrency", "integer"),
+	("BATCH_STATE_FILE", "batch", "state_file", "string"),
+	("CACHE_ENABLED", "cache", "enabled", "boolean"),
+	("CACHE_MEMORY_SIZE", "cache", "memory_size", "integer"),
+	("CACHE_DIRECTORY", "cache", "directory", "string"),
+	("CACHE_DISK_SIZE", "cache", "disk_size", "integer"),
+	("TEXT_FONT_NAME", "rendering", "text_font_name", "string"),
+	("TEXT_FONT_SIZE", "rendering", "text_font_size", "integer"),
+	("TEXT_TOP_MARGIN", "rendering", "text_top_margin", "integer"),
+	("TEXT_RENDERER", "rendering", "text_renderer", "string"),
+	("TILE_TALL_IMAGES", "rendering", "tile_tall_images", "boolean"),
+	("TALL_IMAGE_MIN_PAGES", "rendering", "tall_image_min_pages", "integer"),
+	("TILE_OVERLAP", "rendering", "tile_overlap", "integer"),
+	("HALFTONE_METHOD", "rendering", "halftone", "string"),
+	("HALFTONE_PHOTO_METHOD", "rendering", "halftone_photo", "string"),
+	("PACK_SMALL_IMAGES", "rendering", "pack_small_images", "boolean"),
+	("PACK_MIN_SCALE", "rendering", "pack_min_scale", "float"),
+	("PACK_MAX_FRACTION", "rendering", "pack_max_fraction", "float"),
+	("DEFAULT_SETTINGS", "default", "default_settings", "string"),
+	("USE_DEFAULT_SETTINGS_ON_WRONG_PARAM", "default", "use_default_on_wrong_parameter", "boolean"),
+	("LOG_MESSAGE_TO_FILE", "default", "log_message_to_file", "boolean"),
+	("MESSAGE_LOG_FILE", "default", "message_log_file", "string"),
+	("DATE_TIMEZONE", "default", "date_timezone", "string"),
+	("DATE_FORMAT", "default", "date_format", "string"),
+	("UNPACK_MULTI_TIFF", "default", "unpack_multipage_tiffs", "boolean"),
+	("CONVERSION_WORKERS", "default", "conversion_workers", "integer"),
+	("SPOOL_THRESHOLD", "default", "spool_threshold", "integer"),
+	("BLANK_PAGE_COVERAGE", "default", "blank_page_coverage", "float"),
+	("FAX_LINE_SPEED", "default", "fax_line_speed", "integer"),
+	("DISPATCH_BY_SUBJECT", "default", "dispatch_by_subject", "boolean"),
+	("ARCHIVE_ROTATION", "archive", "rotation", "string"),
+	("ARCHIVE_MAX_SIZE", "archive", "max_size", "integer"),
+	("ARCHIVE_COMPRESSION_LEVEL", "archive", "compression_level", "integer"),
+	("ARCHIVE_BACKGROUND", "archive", "background_writer", "boolean"),
+	("METRICS_ENABLED", "metrics", "enabled", "boolean"),
+	("METRICS_FORMAT", "metrics", "format", "string"),
+	("METRICS_FILE", "metrics", "file", "string"),
+	("METRICS_TRACE_MEMORY", "metrics", "trace_memory", "boolean")
+]
+
+# Fax section options: (attribute, key, type, notice logged when overriden (or None), add section name to the notice)
+SECTION_OPTIONS = [
+	("PHONE_NUMBER", "phone_number", "string", None, False),
+	("SUBJECT_TRIGGER", "subject_trigger", "string", None, False),
+	("DATE_TIMEZONE", "date_timezone", "string", StringTable.USING_TIMEZONE, False),
+	("DATE_FORMAT", "date_format", "string", StringTable.USING_DATE_FORMAT, False),
+	("LOG_MESSAGE_TO_FILE", "log_message_to_file", "boolean", StringTable.LOG_TO_FILE_OVERRIDEN, True),
+	("MESSAGE_LOG_FILE", "message_log_file", "string", StringTable.LOG_FILE_OVERRIDEN, True),
+	("CACHE_ENABLED", "conversion_cache", "boolean", StringTable.CACHE_OVERRIDEN, True),
+	("BLANK_PAGE_COVERAGE", "blank_page_coverage", "float", StringTable.BLANK_PAGE_OVERRIDEN, True),
+	("FAX_LINE_SPEED", "fax_line_speed", "integer", None, False),
+	("PACK_SMALL_IMAGES", "pack_small_images", "boolean", StringTable.PACKING_OVERRIDEN, True),
+	("PACK_MIN_SCALE", "pack_min_scale", "float", None, False),
+	("PACK_MAX_FRACTION", "pack_max_fraction", "float", None, False)
+]
+
+
+# Function for getting one option's value from the config (strings are unquoted)
+def getOption(config, section, key, valueType):
+	if valueType == "boolean":
+		return config.getboolean(section, key)
+
+	elif valueType == "integer":
+		return config.getint(section, key)
+
+	elif valueType == "float":
+		return config.getfloat(section, key)
+
+	return config.get(section, key).replace('"', '')
+
+# Subject triggers index (prefix tree; the longest trigger the subject starts with wins)
+# Looking up takes time depending on the trigger length only, not on the number of sections.
+class SubjectIndex:
+	def __init__(self):
+		self.root = {}
+		return
+
+	# Function for adding trigger (returns section already using the same trigger or None)
+	def add(self, trigger, whichFax):
+		node = self.root
+
+		for character in trigger:
+			node = node.setdefault(character, {})
+
+		if None in node:
+			return node[None]
+
+		# None key marks the end of the trigger
+		node[None] = whichFax
+
+		return None
+
+	# Function for finding section by the subject (returns None if there's no matching trigger)
+	def match(self, subject):
+		node = self.root
+		found = None
+
+		for character in subject:
+			node = node.get(character)
+
+			if node == None:
+				break
+
+			if None in node:
+				found = node[None]
+
+		return found
+
+# Compiled section class (effective settings and notices to log when section is used)
+class CompiledSection:
+	def __init__(self, values, notices = None):
+		if notices == None:
+			notices = []
+
+		self.values = values
+		self.notices = notices
+		return
+
+# Compiled settings class
+class CompiledSettings:
+	def __init__(self, settingsFile = "", stamp = None):
+		self.settingsFile = settingsFile
+		self.stamp = stamp
+		self.globalValues = {}
+		self.sections = {}
+		self.noSection = None
+		self.subjectIndex = SubjectIndex()
+		self.errors = []
+		self.errorsReported = False
+		self.lock = threading.Lock()
+		return
+
+	# Function for getting compiled section (or settings for no section if it doesn't exist)
+	def getSection(self, whichFax):
+		return self.sections.get(whichFax, self.noSection)
+
+	# Function for taking compile time errors (only once per compilation)
+	def takeErrors(self):
+		with self.lock:
+			if self.errorsReported:
+				return []
+
+			self.errorsReported = True
+
+		return self.errors
+
+# Function for compiling settings of one fax section (route is resolved later)
+def compileSection(config, whichFax, globalValues):
+	values = dict(globalValues)
+	notices = []
+
+	for attribute, key, valueType, notice, withSection in SECTION_OPTIONS:
+		if config.has_option(whichFax, key):
+			values[attribute] = getOption(config, whichFax, key, valueType)
+
+			if notice != None:
+				if withSection:
+					notices += [notice + whichFax + ": " + str(values[attribute])]
+				else:
+					notices += [notice + str(values[attribute])]
+
+	return CompiledSection(values, notices)
+
+# Procedure for resolving route of the section (errors are gathered in the compiled settings)
+def resolveRoute(config, whichFax, compiled):
+	section = compiled.sections[whichFax]
+	routeTo = config.get(whichFax, "route_to").replace('"', '')
+	section.values["ROUTE_TO_FAX"] = routeTo
+
+	if routeTo == whichFax:
+		compiled.errors += [StringTable.ROUTE_SAME_1 + routeTo + StringTable.ROUTE_SAME_2]
+
+	elif config.has_section(routeTo) and config.has_option(routeTo, "phone_number"):
+		section.values["PHONE_NUMBER"] = config.get(routeTo, "phone_number")
+		section.notices += [StringTable.USING_ROUTE + whichFax + StringTable.ROUTE_FROM_TO + routeTo]
+
+		if config.has_option(routeTo, "route_to"):
+			compiled.errors += [StringTable.ROUTE_TO_NO_FOLLOW_1 + routeTo + StringTable.ROUTE_TO_NO_FOLLOW_2 + section.values["PHONE_NUMBER"]]
+
+	else:
+		compiled.errors += [StringTable.ROUTE_NO_SETTINGS_1 + routeTo + StringTable.ROUTE_NO_SETTINGS_2 + whichFax + StringTable.ROUTE_NO_SETTINGS_3]
+
+	return
+
+# Function for compiling settings file (defaults from the Settings class are used for missing options)
+def compileSettings(settingsFile, stamp = None):
+	defaults = additionalTools.Settings
+	config = configparser.ConfigParser(interpolation = None)
+	compiled = CompiledSettings(settingsFile, stamp)
+
+	if settingsFile != "":
+		config.read(settingsFile)
+
+	for attribute, section, key, valueType in GLOBAL_OPTIONS:
+		if config.has_option(section, key):
+			compiled.globalValues[attribute] = getOption(config, section, key, valueType)
+		else:
+			compiled.globalValues[attribute] = getattr(defaults, attribute)
+
+	# Settings used if there's no section chosen
+	noSectionValues = dict(compiled.globalValues)
+	noSectionValues["PHONE_NUMBER"] = defaults.PHONE_NUMBER
+	noSectionValues["SUBJECT_TRIGGER"] = defaults.SUBJECT_TRIGGER
+	noSectionValues["ROUTE_TO_FAX"] = defaults.ROUTE_TO_FAX
+	compiled.noSection = CompiledSection(noSectionValues)
+
+	for whichFax in config.sections():
+		compiled.sections[whichFax] = compileSection(config, whichFax, noSectionValues)
+
+	# Index of explicitly set subject triggers (for dispatching messages by the subject)
+	for whichFax in config.sections():
+		if config.has_option(whichFax, "subject_trigger"):
+			trigger = compiled.sections[whichFax].values["SUBJECT_TRIGGER"]
+
+			if trigger == "":
+				continue
+
+			previous = compiled.subjectIndex.add(trigger, whichFax)
+
+			if previous != None:
+				compiled.errors += [StringTable.TRIGGER_DUPLICATED_1 + trigger + StringTable.TRIGGER_DUPLICATED_2 + previous + StringTable.TRIGGER_DUPLICATED_3 + whichFax]
+
+	# Routes are resolved using phone numbers from the config (routes are not followed further)
+	for whichFax in config.sections():
+		if config.has_option(whichFax, "route_to"):
+			resolveRoute(config, whichFax, compiled)
+
+	return compiled
+
+
+# Compiled settings cache (settings file name -> compiled settings)
+compiledCache = {}
+compiledLock = threading.Lock()
+
+# Function for finding settings file (in the current directory first, then in the chosen one; returns "" if not found)
+def findSettingsFile(settingsFile, scriptDirectory = ""):
+	if os.path.isfile(settingsFile):
+		return settingsFile
+
+	settingsFile = os.path.join(scriptDirectory, settingsFile)
+
+	if os.path.isfile(settingsFile):
+		return settingsFile
+
+	return ""
+
+# Function for getting stamp of the settings file (to check if it has changed)
+def fileStamp(settingsFile):
+	try:
+		status = os.stat(settingsFile)
+		return (status.st_mtime_ns, status.st_size, status.st_ino)
+
+	except OSError:
+		return None
+
+# Function for getting compiled settings (compiled again only if settings file has changed)
+def getCompiledSettings(settingsFile, scriptDirectory = ""):
+	foundFile = findSettingsFile(settingsFile, scriptDirectory)
+	stamp = fileStamp(foundFile)
+
+	with compiledLock:
+		compiled = compiledCache.get(settingsFile)
+
+		if (compiled != None) and (compiled.settingsFile == foundFile) and (compiled.stamp == stamp):
+			return compiled
+
+	compiled = compileSettings(foundFile, stamp)
+
+	with compiledLock:
+		compiledCache[settingsFile] = compiled
+
+	return compiled
+
+# Procedure for applying compiled values to the settings object
+def applyValues(settings, values):
+	for attribute in values:
+		setattr(settings, attribute, values[attribute])
+
+	return
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# Spool backends (last step: passing finished G3 TIFF pages to the fax queue)
+#
+# Backends (chosen by the backend key in the [spool] section):
+#   "faxspool" - faxspool command (as always; it does its own conversions and copies),
+#   "queue"    - pages and JOB file written directly to the mgetty-fax outgoing queue directory
+#                (job directory is prepared under a hidden name and renamed when complete,
+#                 so faxrunq never sees a half-written job),
+#   "stub"     - nothing is sent; jobs are collected in memory (dry run, benchmarks and tests)
+#
+# Pages always keep their order and standard resolution ("-n" of faxspool) is passed on.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import pwd
+import errno
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import collections
+import StringTable
+
+
+# Maximum number of jobs kept by the stub backend (the oldest ones are dropped)
+STUB_MAX_JOBS = 1000
+
+
+# Faxspool backend class (calls faxspool command)
+class FaxspoolBackend:
+	def spool(self, phoneNumber, pageFiles, standardResolution = False, messageId = ""):
+		if standardResolution:
+			command = ["faxspool", "-n", phoneNumber]
+		else:
+			command = ["faxspool", phoneNumber]
+
+		subprocess.check_output(command + pageFiles)
+		return
+
+# Queue backend class (writes job directly to the mgetty-fax outgoing queue directory)
+class QueueBackend:
+	def __init__(self, directory):
+		self.directory = directory
+		self.lock = threading.Lock()
+		self.counter = 0
+		return
+
+	# Function for getting new job directory name (unique in this process; pid keeps processes apart)
+	def jobName(self):
+		with self.lock:
+			self.counter += 1
+			return "F" + time.strftime("%Y%m%d%H%M%S") + "-" + str(os.getpid()) + "-" + str(self.counter)
+
+	# Function for preparing JOB file contents (the same keys faxspool writes)
+	def jobText(self, phoneNumber, pageNames, standardResolution):
+		try:
+			user = pwd.getpwuid(os.getuid()).pw_name
+		except KeyError:
+			user = str(os.getuid())
+
+		lines = ["phone " + phoneNumber, "user " + user, "mail " + user]
+
+		if standardResolution:
+			lines += ["normal_res"]
+
+		lines += ["pages " + " ".join(pageNames)]
+
+		return "\n".join(lines) + "\n"
+
+	def spool(self, phoneNumber, pageFiles, standardResolution = False, messageId = ""):
+		os.makedirs(self.directory, exist_ok = True)
+
+		# Hidden directory is not picked up by faxrunq (it looks for */JOB)
+		temporary = tempfile.mkdtemp(prefix = ".job-", dir = self.directory)
+
+		try:
+			pageNames = []
+
+			for pageFile in pageFiles:
+				pageNames += ["f" + str(len(pageNames) + 1) + ".tiff"]
+				shutil.copyfile(pageFile, os.path.join(temporary, pageNames[-1]))
+				os.chmod(os.path.join(temporary, pageNames[-1]), 0o644)
+
+			jobFile = open(os.path.join(temporary, "JOB"), "w")
+			jobFile.write(self.jobText(phoneNumber, pageNames, standardResolution))
+			jobFile.flush()
+			os.fsync(jobFile.fileno())
+			jobFile.close()
+			os.chmod(os.path.join(temporary, "JOB"), 0o644)
+			os.chmod(temporary, 0o755)
+
+			# Rename fails if such (non-empty) directory exists, so try the next name then
+			while True:
+				try:
+					os.rename(temporary, os.path.join(self.directory, self.jobName()))
+					break
+				except OSError as e:
+					if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+						raise
+
+		except:
+			shutil.rmtree(temporary, ignore_errors = True)
+			raise
+
+		return
+
+# Stub job class (what would be spooled)
+class StubJob:
+	def __init__(self, phoneNumber, pages, standardResolution, messageId):
+		self.phoneNumber = phoneNumber
+		self.pages = pages
+		self.standardResolution = standardResolution
+		self.messageId = messageId
+		return
+
+# Stub backend class (pages are read to the memory, nothing is sent)
+class StubBackend:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.jobs = collections.deque(maxlen = STUB_MAX_JOBS)
+		return
+
+	def spool(self, phoneNumber, pageFiles, standardResolution = False, messageId = ""):
+		pages = []
+
+		for pageFile in pageFiles:
+			inFile = open(pageFile, "rb")
+			pages += [inFile.read()]
+			inFile.close()
+
+		with self.lock:
+			self.jobs.append(StubJob(phoneNumber, pages, standardResolution, messageId))
+
+		return
+
+	# Function for taking collected jobs (list of StubJob objects; collected jobs are cleared)
+	def takeJobs(self):
+		with self.lock:
+			jobs = list(self.jobs)
+			self.jobs.clear()
+
+		return jobs
+
+
+# Backends shared by the whole process
+faxspoolBackend = FaxspoolBackend()
+stubBackend = StubBackend()
+queueBackends = {}
+queueLock = threading.Lock()
+
+# Function for getting backend chosen in the settings
+def getBackend(settings):
+	if settings.SPOOL_BACKEND == "faxspool":
+		return faxspoolBackend
+
+	elif settings.SPOOL_BACKEND == "stub":
+		return stubBackend
+
+	elif settings.SPOOL_BACKEND == "queue":
+		with queueLock:
+			if settings.SPOOL_QUEUE_DIRECTORY not in queueBackends:
+				queueBackends[settings.SPOOL_QUEUE_DIRECTORY] = QueueBackend(settings.SPOOL_QUEUE_DIRECTORY)
+
+			return queueBackends[settings.SPOOL_QUEUE_DIRECTORY]
+
+	raise ValueError(StringTable.UNKNOWN_SPOOL_BACKEND + settings.SPOOL_BACKEND)
+
+# Procedure for spooling fax pages (in the given order) using backend chosen in the settings
+def spoolFax(settings, phoneNumber, pageFiles, standardResolution = False, messageId = ""):
+	getBackend(settings).spool(phoneNumber, pageFiles, standardResolution, messageId)
+	return
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Stream parser (message parsed from chunks, big encoded part bodies decoded straight to the files)
+#
+# BytesFeedParser keeps the whole encoded body of every part in memory until the message is closed,
+# so lines are passed to it through the MIME splitter following boundaries of the multipart entities.
+# Bodies of the parts encoded as Base64 or Quoted-Printable are held back until they turn out to be
+# small (then they're passed to the parser as they are) or bigger than the threshold - then they're
+# decoded line by line to the file in the work directory and the parser gets just a random token
+# instead of the body. Other bodies (not encoded ones) are passed to the parser right away.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import secrets
+import email.parser
+import email.policy
+import dataTools
+
+
+# Splitter states
+HEADERS = 0	# headers of the entity (message, part or attached message)
+PASS = 1	# body passed to the parser (not encoded body, preamble or epilogue of multipart)
+HOLD = 2	# encoded body held back (until it's known if it's small)
+SPOOL = 3	# encoded body decoded to the file
+
+# Transfer encodings of the bodies which can be spooled
+SPOOLED_ENCODINGS = ["base64", "quoted-printable"]
+
+
+# Spooled part class (file containing decoded body and its leading bytes)
+class SpooledPart:
+	def __init__(self, fileName, head):
+		self.fileName = fileName
+		self.head = head
+		return
+
+# Stream parser class (feed() and close() the same way as BytesFeedParser)
+class StreamParser:
+	def __init__(self, workDirectory, threshold, policy = email.policy.compat32):
+		self.parser = email.parser.BytesFeedParser(policy = policy)
+		self.policy = policy
+		self.workDirectory = workDirectory
+		self.threshold = threshold
+		self.token = secrets.token_hex(16)
+		self.spooled = {}
+		self.boundaries = []
+		self.partial = b""
+		self.state = HEADERS
+		self.headerLines = []
+		self.transferEncoding = ""
+		self.held = []
+		self.heldSize = 0
+		self.spool = None
+		self.spoolToken = ""
+		return
+
+	# Procedure for feeding next chunk of the message
+	def feed(self, chunk):
+		lines = (self.partial + chunk).split(b"\n")
+		self.partial = lines.pop()
+
+		for line in lines:
+			self.line(line + b"\n")
+
+		return
+
+	# Function for finishing parsing (returns parsed message)
+	def close(self):
+		if self.partial != b"":
+			self.line(self.partial)
+			self.partial = b""
+
+		self.endBody()
+
+		return self.parser.close()
+
+	# Function for getting spooled part for the parsed part (or None if its body was not spooled)
+	def spooledPart(self, part):
+		payload = part.get_payload()
+
+		if not isinstance(payload, str):
+			return None
+
+		return self.spooled.get(payload.strip())
+
+	# Function for checking if line is a boundary of any open multipart (returns (index, closing) or None)
+	def boundary(self, line):
+		if (self.boundaries == []) or not line.startswith(b"--"):
+			return None
+
+		line = line.rstrip(b"\r\n").rstrip(b" \t")
+
+		for index in range(len(self.boundaries) - 1, -1, -1):
+			if line == self.boundaries[index]:
+				return index, False
+
+			if line == self.boundaries[index] + b"--":
+				return index, True
+
+		return None
+
+	# Procedure for handling one line of the message
+	def line(self, line):
+		found = self.boundary(line)
+
+		if found != None:
+			index, closing = found
+			self.endBody()
+			del self.boundaries[index + 1:]
+			self.parser.feed(line)
+
+			if closing:
+				self.boundaries.pop()
+				self.state = PASS
+			else:
+				self.state = HEADERS
+				self.headerLines = []
+
+		elif self.state == HEADERS:
+			self.parser.feed(line)
+			self.headerLines += [line]
+
+			if line.strip() == b"":
+				self.endHeaders()
+
+		elif self.state == PASS:
+			self.parser.feed(line)
+
+		elif self.state == HOLD:
+			self.held += [line]
+			self.heldSize += len(line)
+
+			if self.heldSize > self.threshold:
+				self.startSpool()
+
+		else:
+			self.spool.write(line)
+
+		return
+
+	# Procedure for choosing what to do with the body (headers of the entity are complete)
+	def endHeaders(self):
+		entity = email.parser.BytesHeaderParser(policy = self.policy).parsebytes(b"".join(self.headerLines))
+		self.headerLines = []
+		self.state = PASS
+
+		if entity.get_content_maintype() == "multipart":
+			boundary = entity.get_boundary()
+
+			if boundary != None:
+				self.boundaries += [b"--" + boundary.encode("ascii", "surrogateescape")]
+
+		# Attached message starts with its own headers
+		elif entity.get_content_type() == "message/rfc822":
+			self.state = HEADERS
+
+		elif str(entity.get("Content-Transfer-Encoding", "")).strip().lower() in SPOOLED_ENCODINGS:
+			self.transferEncoding = str(entity["Content-Transfer-Encoding"]).strip().lower()
+			self.held = []
+			self.heldSize = 0
+			self.state = HOLD
+
+		return
+
+	# Procedure for starting decoding of the held body to the file (parser gets the token instead of the body)
+	def startSpool(self):
+		self.spoolToken = self.token + "-" + str(len(self.spooled) + 1)
+		self.spool = dataTools.DecodingSpool(os.path.join(self.workDirectory, self.spoolToken + ".part"), self.transferEncoding)
+
+		for line in self.held:
+			self.spool.write(line)
+
+		self.held = []
+		self.heldSize = 0
+		self.state = SPOOL
+		self.parser.feed(self.spoolToken.encode() + b"\n")
+
+		return
+
+	# Procedure for finishing body of the entity (held body is passed to the parser, spooled one is finished)
+	def endBody(self):
+		if self.state == HOLD:
+			self.parser.feed(b"".join(self.held))
+			self.held = []
+			self.heldSize = 0
+
+		elif self.state == SPOOL:
+			fileName = self.spool.fileName
+			self.spooled[self.spoolToken] = SpooledPart(fileName, self.spool.close())
+			self.spool = None
+
+		self.state = PASS
+
+		return
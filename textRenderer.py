@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# Native text to fax page renderer (monospace font, Pillow) with glyph cache
+#
+# Page geometry follows the paps + gs + cutter chain: 1728 pixels wide pages,
+# 36 point side margins, chosen top margin and text ending 94 pixels (cutter's
+# default margin) above 2000 pixels (fine resolution) height.
+#
+# by Magnetic-Fox, 18.10.2026
+#
+# (C)2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
+
+import os
+import math
+import threading
+import subprocess
+import PIL.Image
+import PIL.ImageDraw
+import PIL.ImageFont
+import cutter
+import tiffTools
+import metricsTools
+
+
+# Page geometry (in pixels or points)
+PAGE_WIDTH = 1728
+PAGE_HEIGHT = 2000
+SIDE_MARGIN = 36
+HORIZONTAL_DPI = 204
+TAB_SIZE = 8
+
+# Font files to try if font name couldn't be resolved
+FALLBACK_FONTS = [	"/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+			"/usr/share/fonts/TTF/DejaVuSansMono.ttf",
+			"/usr/share/fonts/dejavu/DejaVuSansMono.ttf",
+			"/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf"	]
+
+# Maximum number of cached glyphs (cache is simply cleared when exceeded)
+GLYPH_CACHE_SIZE = 8192
+
+
+# Caches shared between pages and messages (and threads)
+cacheLock = threading.Lock()
+fontFiles = {}
+fonts = {}
+glyphs = {}
+
+
+# Function for finding font file for chosen font name (using fontconfig if possible; returns None if not found)
+def findFontFile(fontName):
+	with cacheLock:
+		if fontName in fontFiles:
+			return fontFiles[fontName]
+
+	fontFile = None
+
+	if os.path.isfile(fontName):
+		fontFile = fontName
+
+	else:
+		try:
+			output = subprocess.run(["fc-match", "-f", "%{file}", fontName], stdout = subprocess.PIPE, stderr = subprocess.DEVNULL).stdout.decode()
+			if os.path.isfile(output):
+				fontFile = output
+		except OSError:
+			pass
+
+		if fontFile == None:
+			for fallbackFont in FALLBACK_FONTS:
+				if os.path.isfile(fallbackFont):
+					fontFile = fallbackFont
+					break
+
+	with cacheLock:
+		fontFiles[fontName] = fontFile
+
+	return fontFile
+
+# Function for getting (cached) font object
+def getFont(fontFile, pixelSize):
+	key = (fontFile, pixelSize)
+
+	with cacheLock:
+		if key in fonts:
+			return fonts[key]
+
+	font = PIL.ImageFont.truetype(fontFile, pixelSize)
+
+	with cacheLock:
+		fonts[key] = font
+
+	return font
+
+# Text layout class (font metrics and page geometry for chosen font and resolution)
+class TextLayout:
+	def __init__(self, fontFile, fontSize = 10, topMargin = 6, resolution = 1):
+		self.fontFile = fontFile
+		self.verticalDPI = tiffTools.verticalDPI(resolution)
+
+		# Font is rendered for vertical resolution and stretched to the horizontal one
+		self.pixelSize = max(1, round(fontSize * self.verticalDPI / 72))
+		self.xScale = HORIZONTAL_DPI / self.verticalDPI
+		self.font = getFont(fontFile, self.pixelSize)
+
+		ascent, descent = self.font.getmetrics()
+		self.ascent = ascent
+		self.lineHeight = ascent + descent
+		self.cellWidth = max(1, round(self.font.getlength("M") * self.xScale))
+
+		# Page geometry in pixels
+		self.pageHeight = round(PAGE_HEIGHT * self.verticalDPI / 196)
+		self.leave = cutter.calculateCutMargin(resolution)
+		self.left = round(SIDE_MARGIN * HORIZONTAL_DPI / 72)
+		self.top = round(topMargin * self.verticalDPI / 72)
+		self.columns = max(1, (PAGE_WIDTH - (2 * self.left)) // self.cellWidth)
+		self.linesPerPage = max(1, (self.pageHeight - self.leave - self.top) // self.lineHeight)
+
+		return
+
+# Function for getting (cached) bilevel glyph mask
+def getGlyph(layout, character):
+	key = (layout.fontFile, layout.pixelSize, layout.xScale, character)
+
+	with cacheLock:
+		if key in glyphs:
+			return glyphs[key]
+
+	# Render glyph in the vertical resolution cell and stretch it horizontally
+	naturalWidth = max(1, math.ceil(layout.cellWidth / layout.xScale))
+	cell = PIL.Image.new("L", (naturalWidth, layout.lineHeight), 0)
+	PIL.ImageDraw.Draw(cell).text((0, 0), character, fill = 255, font = layout.font)
+	cell = cell.resize((layout.cellWidth, layout.lineHeight), PIL.Image.Resampling.BILINEAR)
+	glyph = cell.point(lambda value: 255 if value >= 128 else 0, "1")
+
+	# Empty glyphs (like spaces) are not drawn at all
+	if glyph.getbbox() == None:
+		glyph = None
+
+	with cacheLock:
+		if len(glyphs) >= GLYPH_CACHE_SIZE:
+			glyphs.clear()
+		glyphs[key] = glyph
+
+	return glyph
+
+# Function for splitting text to the page lines (tabs expanded, long lines wrapped on spaces if possible)
+# Form feed character forces a new page (None is used on the list as a page break)
+def layoutLines(textData, columns):
+	lines = []
+
+	for line in textData.split("\n"):
+		pageParts = line.split("\f")
+
+		for partNumber in range(len(pageParts)):
+			if partNumber > 0:
+				lines += [None]
+
+			part = "".join(character for character in pageParts[partNumber].expandtabs(TAB_SIZE) if character >= " ")
+
+			while len(part) > columns:
+				breakPosition = part.rfind(" ", 0, columns + 1)
+
+				if breakPosition <= 0:
+					lines += [part[:columns]]
+					part = part[columns:]
+				else:
+					lines += [part[:breakPosition]]
+					part = part[breakPosition + 1:]
+
+			lines += [part]
+
+	return lines
+
+# Function for drawing one page of lines
+def renderPage(layout, lines):
+	page = PIL.Image.new("1", (PAGE_WIDTH, layout.pageHeight), 255)
+	y = layout.top
+
+	for line in lines:
+		x = layout.left
+
+		for character in line:
+			glyph = getGlyph(layout, character)
+
+			if glyph != None:
+				page.paste(0, (x, y), glyph)
+
+			x += layout.cellWidth
+
+		y += layout.lineHeight
+
+	return page
+
+# Text to pages renderer (returns list of cut bilevel pages or None if no usable font was found)
+def renderText(textData, fontName = "Monospace", fontSize = 10, topMargin = 6, resolution = 1):
+	fontFile = findFontFile(fontName)
+
+	if fontFile == None:
+		return None
+
+	layout = TextLayout(fontFile, fontSize, topMargin, resolution)
+	metrics = metricsTools.current()
+	pages = []
+	pageLines = []
+
+	with metrics.stage("render_text"):
+		lines = layoutLines(textData, layout.columns)
+
+	for line in lines + [None]:
+		if (line == None) or (len(pageLines) == layout.linesPerPage):
+			with metrics.stage("render_text"):
+				page = renderPage(layout, pageLines)
+
+			with metrics.stage("cut"):
+				cropped = cutter.cropImage(page, layout.leave)
+
+			if cropped == None:
+				cropped = page
+
+			pages += [cropped]
+			pageLines = []
+
+		if line != None:
+			pageLines += [line]
+
+	return pages
@@ -2,13 +2,27 @@
 
 # Text tools (for better experience on plain text)
 #
-# by Magnetic-Fox, 13.07.2024 - 06.01.2026
+# by Magnetic-Fox, 13.07.2024 - 18.10.2026
 #
 # (C)2024-2026 Bartłomiej "Magnetic-Fox" Węgrzyn!
 
+import re
 import htmlTools
 
 
+# Patterns for fused normalization stages
+MULTI_SPACES = re.compile(" {2,}")
+MULTI_SPACES_AND_CRLF = re.compile("\r?( {2,})|\r\n")
+MULTI_NEW_LINES = re.compile("\n{3,}")
+
+# HTML-style amp character sequence (from the amp character to the nearest semicolon, as findAmpChar finds it)
+AMP_CHARS = re.compile("&[^;]*;")
+
+# Every normalization stage at once: spaces run (after optional CR), CR+LF or run of amp character sequences
+# (with CR before and LF or spaces run after them, as converted sequences may give CR or LF joining those ones)
+NORMALIZE = re.compile("\r?( {2,})|\r\n|(\r?(?:&[^;]*;)+(?: {2,}|\n)?)")
+
+
 # Simple new line characters counter
 def countNewLines(data, position):
 	count = 0
@@ -62,7 +76,7 @@ def changeAmpChars(string):
 	position = 0
 
 	while(findAmpChar(string, position) != ""):
-		converter = htmlTools.HTMLFilter()
+		converter = htmlTools.HTMLFilterLegacy()
 		converter.feed(findAmpChar(string))
 		string = string.replace(findAmpChar(string), converter.text)
 		position = string.find("&", position + 1)
@@ -71,3 +85,91 @@ def changeAmpChars(string):
 			break
 
 	return string
+
+
+# Fused normalization (every stage is done in one linear scan; output is identical to the functions above, except
+# for amp characters: every sequence is converted once, from left to right, so converted text is not converted again):
+
+# Function for converting HTML-style amp character sequence (the same way changeAmpChars does; results are cached)
+def convertAmpChar(token, cache):
+	if token not in cache:
+		converter = htmlTools.HTMLFilterLegacy()
+		converter.feed(token)
+		cache[token] = converter.text
+
+	return cache[token]
+
+# Amp characters converter class (callback for re.sub; every sequence is converted once)
+# If a sequence can't be converted, the text wouldn't change anymore (changeAmpChars stops there),
+# so sequences after it are given unchanged.
+class AmpConverter:
+	def __init__(self):
+		self.cache = {}
+		self.stopped = False
+		return
+
+	def __call__(self, match):
+		token = match.group(0)
+
+		if self.stopped:
+			return token
+
+		converted = convertAmpChar(token, self.cache)
+
+		if converted == token:
+			self.stopped = True
+
+		return converted
+
+# Function for changing all HTML-style amp characters (in one linear scan)
+def changeAmpCharsFast(string):
+	return AMP_CHARS.sub(AmpConverter(), string)
+
+# Function for changing matched spaces run to new lines (one less than spaces)
+def spacesToReturns(match):
+	return "\n" * (len(match.group(0)) - 1)
+
+# Function for changing matched spaces run or CR+LF to new lines (spaces run after CR becomes CR+LF, and then just LF)
+def spacesAndCRLFToReturns(match):
+	if match.group(1) == None:
+		return "\n"
+
+	return "\n" * (len(match.group(1)) - 1)
+
+# Function for normalizing plain text before adding header (multi spaces to new lines, amp characters and CR+LF to LF)
+# Everything is done in one scan (in the same order as separate stages would do: spaces, amp characters, CR+LF).
+def normalizeText(data, multiSpaces = False, amps = False):
+	if not amps:
+		if multiSpaces:
+			return MULTI_SPACES_AND_CRLF.sub(spacesAndCRLFToReturns, data)
+
+		return data.replace("\r\n", "\n")
+
+	converter = AmpConverter()
+
+	def normalize(match):
+		# Amp character sequences (spaces inside them are changed first)
+		if match.group(2) != None:
+			text = match.group(2)
+
+			if multiSpaces:
+				text = MULTI_SPACES.sub(spacesToReturns, text)
+
+			return AMP_CHARS.sub(converter, text).replace("\r\n", "\n")
+
+		if multiSpaces or (match.group(1) == None):
+			return spacesAndCRLFToReturns(match)
+
+		return match.group(0)
+
+	return NORMALIZE.sub(normalize, data)
+
+# Function for finishing text (stripping leading and trailing new lines and leaving no more than two new lines in a row)
+def finishText(data, stripEnds = True, stripInText = True):
+	if stripEnds:
+		data = data.strip("\n")
+
+	if stripInText:
+		data = MULTI_NEW_LINES.sub("\n\n", data)
+
+	return data
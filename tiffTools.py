@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 
-# TIFF tools utilizing paps, gs, convert, tiffset, Pillow (PIL) and more
+# TIFF tools utilizing Pillow (PIL), paps, gs, convert, tiffset and more
 #
-# by Magnetic-Fox, 19.04.2025 - 06.01.2026
+# by Magnetic-Fox, 19.04.2025 - 18.10.2026
 #
 # (C)2025-2026 Bartłomiej "Magnetic-Fox" Węgrzyn
 
-import os
 import io
 import math
-import shutil
-import tempfile
 import subprocess
 import PIL.Image
 
 
+# Version of the in-process page renderer (to be changed when output changes; part of the conversion cache keys)
+RENDERER_VERSION = 3
+
+# Reduction ratio from which images are reduced by the cheap box filter first (and then resampled by Lanczos)
+LARGE_REDUCTION = 3
+
+# JPEG signature (for decoding size hint in the legacy chain)
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+
 # Get image size function
 def getImageSize(imageData):
 	img = PIL.Image.open(io.BytesIO(imageData))
@@ -35,8 +42,16 @@ def imageDataToTIFF(imageData, pageWidth = 1728, marginLeft = 32, marginRight =
 	# Get image size to test if image has to be rotated
 	width, height = getImageSize(imageData)
 
-	# Prepare command
-	convertCommand = ["convert", "-"]
+	# Prepare command (JPEG is decoded already reduced to the twice the final size, not to the full size)
+	convertCommand = ["convert"]
+
+	if imageData[:len(JPEG_SIGNATURE)] == JPEG_SIGNATURE:
+		scale = 2 * (pageWidth - marginLeft - marginRight) / min(width, height)
+
+		if scale < 1:
+			convertCommand += ["-define", "jpeg:size=" + str(math.ceil(width * scale)) + "x" + str(math.ceil(height * scale))]
+
+	convertCommand += ["-"]
 
 	# Set to rotate if needed
 	if width > height:
@@ -253,12 +268,9 @@ def TIFFtoG3(tiffFile, G3File):
 
 	return
 
-# Note for imageToG3TIFF - why default page height is 2000 pixels?
-# It's because of MGetty's internal height value. If the image is less or equal 2000 pixels,
-# then it won't be scaled, which of course means best possible quality while sending fax.
-
-# Image data to G3 TIFF file converter (resolution data to apply: 0 - standard, 1 - fine, 2 - super fine)
-def imageToG3TIFF(imageData, tiffFileName, resolution = 1, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
+# Image data to G3 TIFF file converter using external tools (resolution data to apply: 0 - standard, 1 - fine, 2 - super fine)
+# Old subprocess chain kept as a reference for the in-process engine below
+def imageToG3TIFFLegacy(imageData, tiffFileName, resolution = 1, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
 	# Initial convert (with rotation)
 	nonG3TIFFData = imageDataToTIFF(imageData, pageWidth, marginLeft, marginRight)
 
@@ -309,6 +321,201 @@ def imageToG3TIFF(imageData, tiffFileName, resolution = 1, pageWidth = 1728, pag
 
 	return
 
+# Function for getting vertical DPI value for chosen resolution (0 - standard, 1 - fine, 2 - super fine)
+def verticalDPI(resolution = 1):
+	if resolution == 0:
+		return 98
+
+	elif resolution == 2:
+		return 391
+
+	else:
+		return 196
+
+# Function for flattening any image to the 8-bit grayscale (transparent parts become white)
+def flattenImage(img):
+	if (img.mode in ("RGBA", "LA", "PA")) or ((img.mode == "P") and ("transparency" in img.info)):
+		img = img.convert("RGBA")
+		background = PIL.Image.new("RGBA", img.size, "white")
+		background.alpha_composite(img)
+		img = background
+
+	if img.mode != "L":
+		img = img.convert("L")
+
+	return img
+
+# Function for calculating height of the image resized to the width between margins
+def contentHeightFor(width, height, pageWidth = 1728, marginLeft = 32, marginRight = 32):
+	return max(1, int(height * (pageWidth - marginLeft - marginRight) / width + 0.5))
+
+# Function for checking if image is tall enough to be tiled (more than minPages pages tall at the width between margins)
+# Wide images (banners, logos) are never tiled - they're rotated and fitted on one page as always.
+def isTallImage(width, height, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, minPages = 2):
+	if width > height:
+		return False
+
+	return contentHeightFor(width, height, pageWidth, marginLeft, marginRight) > pageHeight * minPages
+
+# Function for calculating size of the image placed on the page (in the image's orientation, before rotating)
+# Tiled images are not scaled to the page height (they're only resized to the width between margins).
+def pageImageSize(width, height, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, tile = False):
+	rotate = width > height
+
+	if rotate:
+		width, height = height, width
+
+	contentWidth = pageWidth - marginLeft - marginRight
+	contentHeight = max(1, int(height * contentWidth / width + 0.5))
+
+	# Image too tall is scaled to the page height
+	if (contentHeight > pageHeight) and (not tile):
+		contentWidth = max(1, int(contentWidth * pageHeight / contentHeight + 0.5))
+		contentHeight = pageHeight
+
+	if rotate:
+		return contentHeight, contentWidth
+
+	return contentWidth, contentHeight
+
+# Procedure for setting reduced decoding of JPEG images (DCT scaling to the smallest size not less than needed for the page)
+# Has to be called before image data is loaded. Color JPEGs are decoded directly to grayscale.
+def draftForPage(img, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, tile = False):
+	draftForSize(img, pageImageSize(img.width, img.height, pageWidth, pageHeight, marginLeft, marginRight, tile))
+	return
+
+# Procedure for setting reduced decoding of JPEG images to the chosen size (see draftForPage)
+def draftForSize(img, size):
+	if img.format != "JPEG":
+		return
+
+	if img.mode == "RGB":
+		mode = "L"
+	else:
+		mode = img.mode
+
+	img.draft(mode, size)
+
+	return
+
+# Function for resizing image or its chosen region (big reductions are done by the box filter first, leaving Lanczos only the last step)
+def resizeImage(img, size, box = None):
+	if box == None:
+		box = (0, 0, img.width, img.height)
+
+	if (box[2] - box[0] >= LARGE_REDUCTION * size[0]) and (box[3] - box[1] >= LARGE_REDUCTION * size[1]):
+		return img.resize(size, PIL.Image.Resampling.LANCZOS, box, reducing_gap = 2.0)
+
+	return img.resize(size, PIL.Image.Resampling.LANCZOS, box)
+
+# Image to page raster converter (in-process version of the convert chain: rotation, resize, margins and height fitting)
+#
+# Geometry is the same as before: image is rotated if it's wider than taller, resized to fit between margins
+# and, if it's taller than chosen page height, scaled (together with margins) to page height and centered.
+# Both resizes are done here at once, so the image is resampled only one time.
+def imageToPage(img, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
+	img = flattenImage(img)
+
+	# Set to rotate if needed (90 degrees clockwise, as "convert -rotate 90" does)
+	if img.width > img.height:
+		img = img.transpose(PIL.Image.Transpose.ROTATE_270)
+
+	# Size after resizing to the width between margins (on default values: 1664x)
+	contentWidth = pageWidth - marginLeft - marginRight
+	contentHeight = max(1, int(img.height * contentWidth / img.width + 0.5))
+
+	# Image fits on the page - just resize and add margins
+	if contentHeight <= pageHeight:
+		page = PIL.Image.new("L", (pageWidth, contentHeight), 255)
+		page.paste(resizeImage(img, (contentWidth, contentHeight)), (marginLeft, 0))
+
+	# Image is too tall - scale it with margins to page height and center it horizontally
+	else:
+		factor = pageHeight / contentHeight
+		scaledPageWidth = max(1, int(pageWidth * factor + 0.5))
+		scaledWidth = max(1, int(contentWidth * factor + 0.5))
+		positionX = ((pageWidth - scaledPageWidth) // 2) + int(marginLeft * factor + 0.5)
+
+		page = PIL.Image.new("L", (pageWidth, pageHeight), 255)
+		page.paste(resizeImage(img, (scaledWidth, pageHeight)), (positionX, 0))
+
+	return page
+
+# Function for calculating tiles of the tall image: list of (top, bottom) rows of the image resized to the width between margins
+# Every tile is one page (no more than page height) and overlaps the previous one by the chosen number of rows,
+# so a line of text cut by the page border can be read whole on one of the pages.
+def imageTiles(width, height, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32, overlap = 100):
+	contentHeight = contentHeightFor(width, height, pageWidth, marginLeft, marginRight)
+	step = max(1, pageHeight - overlap)
+	tiles = []
+	top = 0
+
+	while True:
+		bottom = min(top + pageHeight, contentHeight)
+		tiles += [(top, bottom)]
+
+		if bottom >= contentHeight:
+			break
+
+		top += step
+
+	return tiles
+
+# Tile of the tall image to page raster converter (see imageTiles)
+#
+# Only the strip of the image under the tile (with a few rows around it needed by the resampling filter,
+# so pages join without seams) is flattened and resized - never the whole image at once.
+def imageTileToPage(img, tile, pageWidth = 1728, marginLeft = 32, marginRight = 32):
+	top, bottom = tile
+	contentWidth = pageWidth - marginLeft - marginRight
+	factor = img.height / contentHeightFor(img.width, img.height, pageWidth, marginLeft, marginRight)
+	sourceTop = top * factor
+	sourceBottom = bottom * factor
+
+	# Lanczos needs 3 source rows per output row on both sides (box reduction may round the region up a bit more)
+	support = math.ceil(4 * max(factor, 1)) + 2
+	stripTop = max(0, int(sourceTop) - support)
+	stripBottom = min(img.height, math.ceil(sourceBottom) + support)
+
+	strip = flattenImage(img.crop((0, stripTop, img.width, stripBottom)))
+
+	page = PIL.Image.new("L", (pageWidth, bottom - top), 255)
+	page.paste(resizeImage(strip, (contentWidth, bottom - top), (0, sourceTop - stripTop, strip.width, sourceBottom - stripTop)), (marginLeft, 0))
+
+	return page
+
+# Image data to page raster converter (wrapper)
+def imageDataToPage(imageData, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
+	img = PIL.Image.open(io.BytesIO(imageData))
+
+	try:
+		draftForPage(img, pageWidth, pageHeight, marginLeft, marginRight)
+		page = imageToPage(img, pageWidth, pageHeight, marginLeft, marginRight)
+	finally:
+		img.close()
+
+	return page
+
+# Page raster to G3 TIFF saver (bilevel conversion, group3 compression and 204 x 98/196/391 DPI information at once)
+def saveG3TIFF(page, tiffFile, resolution = 1):
+	# Floyd-Steinberg dithering (the same as default pgmtopbm one)
+	if page.mode != "1":
+		page = page.convert("1")
+
+	page.save(tiffFile, format = "TIFF", compression = "group3", dpi = (204, verticalDPI(resolution)))
+
+	return
+
+# Note for imageToG3TIFF - why default page height is 2000 pixels?
+# It's because of MGetty's internal height value. If the image is less or equal 2000 pixels,
+# then it won't be scaled, which of course means best possible quality while sending fax.
+
+# Image data to G3 TIFF file converter (resolution data to apply: 0 - standard, 1 - fine, 2 - super fine)
+def imageToG3TIFF(imageData, tiffFileName, resolution = 1, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
+	page = imageDataToPage(imageData, pageWidth, pageHeight, marginLeft, marginRight)
+	saveG3TIFF(page, tiffFileName, resolution)
+	return
+
 # Image file to G3 TIFF file converter (wrapper)
 def imageFileToG3TIFF(imageFileName, tiffFileName, resolution = 1, pageWidth = 1728, pageHeight = 2000, marginLeft = 32, marginRight = 32):
 	imageFile = open(imageFileName, "rb")
@@ -317,52 +524,73 @@ def imageFileToG3TIFF(imageFileName, tiffFileName, resolution = 1, pageWidth = 1
 	imageToG3TIFF(imageData, tiffFileName, resolution, pageWidth, pageHeight, marginLeft, marginRight)
 	return
 
-# Function for unpacking multipage TIFF files and place them in the current working directory
-def unpackMultipageTIFF(filename, toFile = False, counter = 1):
-	newFileList = []
-	tiffList = []
+# Function for encoding one frame as a single page TIFF data (original compression and DPI are kept if possible)
+def encodeFrame(frame, compression = "raw", dpi = None):
+	output = io.BytesIO()
+	options = {}
+
+	if dpi != None:
+		options["dpi"] = dpi
 
 	try:
-		# Prepare another temporary directory and change directory to it
-		oldDir = os.getcwd()
-		dir = tempfile.TemporaryDirectory()
-		os.chdir(dir.name)
-
-		# Split TIFF image
-		tiffSplitCommand = ["tiffsplit", filename]
-		subprocess.run(tiffSplitCommand)
-
-		# Get and sort single TIFF files
-		fileList = os.listdir(".")
-		fileList.sort()
-
-		# If chosen to export to files, then move unpacked TIFFs to to current working directory
-		if toFile:
-			# Rename files according to the counter and move to the main temporary directory
-			for file in fileList:
-				shutil.move(file, oldDir + "/" + str(counter) + ".tiff")
-				newFileList += [str(counter) + ".tiff"]
-				counter += 1
-
-		# Otherwise
-		else:
-			# Read all files to the memory (do not move)
-			for file in fileList:
-				tiffFile = open(file, "rb")
-				tiffList += [tiffFile.read()]
-				tiffFile.close()
+		frame.save(output, format = "TIFF", compression = compression, **options)
+
+	except (OSError, ValueError):
+		# Compression not possible for this frame (for example G3 for non-bilevel image)
+		output = io.BytesIO()
+		frame.save(output, format = "TIFF", **options)
+
+	return output.getvalue()
+
+# Generator yielding pages of (multipage) TIFF file or data lazily (other images and not unpacked TIFFs give one page)
+# IFD chain is followed only as far as needed, so the first page is available before the last one is even read.
+# Pages are yielded as images (independent copies) or, if encoded is True, as single page TIFF data.
+# Draft function (if given) is called with the opened image before anything is decoded (see draftForPage).
+# If skipBroken is True, pages which can't be decoded are yielded as None and the next ones are still read
+# (if the IFD chain itself is broken, None is the last page yielded).
+def iterateTIFFPages(source, encoded = False, unpack = True, draft = None, skipBroken = False):
+	if isinstance(source, bytes):
+		img = PIL.Image.open(io.BytesIO(source))
+	else:
+		img = PIL.Image.open(source)
 
-	finally:
-		# Change back directory and clean up temporary directory
-		os.chdir(oldDir)
-		dir.cleanup()
+	try:
+		if draft != None:
+			draft(img)
 
-	# If chosen to export to files
-	if toFile:
-		# Return list of additional files
-		return newFileList
+		frameNumber = 0
 
-	# Otherwise
-	else:
-		# Return list of TIFF files data
-		return tiffList
+		while (frameNumber == 0) or (unpack and (img.format == "TIFF")):
+			try:
+				img.seek(frameNumber)
+
+			except EOFError:
+				break
+
+			except Exception:
+				if not skipBroken:
+					raise
+
+				yield None
+				break
+
+			try:
+				frame = img.copy()
+
+				if encoded:
+					frame = encodeFrame(frame, img.info.get("compression", "raw"), img.info.get("dpi"))
+
+			except Exception:
+				if not skipBroken:
+					raise
+
+				frame = None
+
+			yield frame
+
+			frameNumber += 1
+
+	finally:
+		img.close()
+
+	return